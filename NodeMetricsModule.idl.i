@@ -4,13 +4,37 @@ module NodeMetricsModule {
         float memory_usage;
         float battery_level;
         float load_avg;
-        string node_id;
-        float timestamp;  // Uncomment this if you want to track the timestamp
+        @key string node_id;
+        double timestamp;  // Uncomment this if you want to track the timestamp
+        unsigned short running_tasks;   // Node task executor state
+        unsigned short queue_length;
+        unsigned short task_capacity;  // Workers + queue slots; 0: not reported
     };
 
-    struct TaskAssignment {
-        string task ;
-        string node_id;
-       // Timestamp for task creation
+    struct TaskBatch {
+        @key string node_id;  // One instance per target node
+        sequence<unsigned long long> task_ids;
+        sequence<string> tasks;  // tasks[i] has id task_ids[i]
+    };
+
+    struct TaskAck {
+        @key string node_id;
+        sequence<unsigned long long> task_ids;  // Tasks completed by node_id
+        double completed_at;
+        sequence<unsigned long long> rejected_task_ids;  // Refused, task queue full
+    };
+
+    struct RegionSummary {
+        @key string region;  // One instance per regional aggregator
+        unsigned long node_count;  // Nodes in the region's shard
+        sequence<string> node_ids;  // Top-k candidates, best first
+        sequence<float> cpu_load;  // cpu_load[i] belongs to node_ids[i], and so on
+        sequence<float> memory_usage;
+        sequence<float> battery_level;
+        sequence<float> load_avg;
+        sequence<double> timestamps;
+        sequence<unsigned short> running_tasks;
+        sequence<unsigned short> queue_length;
+        sequence<unsigned short> task_capacity;
     };
 };
@@ -1,13 +1,15 @@
 import time
-import psutil
 import threading
-import json
-import os
+import wire_codec
 import zenoh
+from metrics_sampler import MetricsSampler, read_system_metrics
+from task_executor import NodeTaskExecutor
 
 class NodeSimulator:
-    def __init__(self, node_id):
+    def __init__(self, node_id, codec="binary", max_workers=None, max_queue=None,
+                 sample_interval=0.25, heartbeat_interval=60.0):
         self.node_id = node_id
+        self.codec = wire_codec.get_codec(codec)  # Use "json" for aggregators that predate wire_codec
         print(f"Initializing Zenoh Participant for node {self.node_id}")
 
         # Zenoh session with configuration
@@ -16,75 +18,86 @@ class NodeSimulator:
 
         # Zenoh Topics
         self.metrics_topic = "zenoh/node_metrics"
-        self.task_topic = "zenoh/task_assignments"
+        self.task_topic = f"zenoh/task_assignments/{self.node_id}"  # Only this node's tasks
+        self.ack_topic = "zenoh/task_acks"
 
         # Zenoh Publisher for sending metrics
         self.metrics_publisher = self.zenoh_session.declare_publisher(self.metrics_topic)
+        # Zenoh Publisher for task completion acks
+        self.ack_publisher = self.zenoh_session.declare_publisher(self.ack_topic)
+        # Liveliness token: the aggregator sees it vanish when this session closes or is lost
+        self.liveliness_token = self.zenoh_session.liveliness().declare_token(f"zenoh/node_liveliness/{self.node_id}")
 
-        # Start background threads for publishing and task listening
-        threading.Thread(target=self.send_metrics, daemon=True).start()
+        # Tasks run in a process pool (one worker per core) with a bounded queue
+        self.executor = NodeTaskExecutor(self.report_completion, max_workers, max_queue,
+                                         on_saturation_change=self.report_saturation)
+
+        # Background psutil sampler; publishes smoothed metrics on significant change, else every heartbeat
+        self.sampler = MetricsSampler(self.send_metrics, poll_interval=sample_interval,
+                                      heartbeat_interval=heartbeat_interval)
+
+        # Start metrics sampling and task listening
+        self.sampler.start()
         threading.Thread(target=self.listen_for_task_assignments, daemon=True).start()
 
-    def send_metrics(self):
-        """Publishes system metrics every 60 seconds."""
-        while True:
-            start_time = time.time()
-            metrics = self.get_system_metrics()
-            
-            # Convert metrics to JSON and publish
-            self.metrics_publisher.put(json.dumps(metrics))
-            print(f"Node {self.node_id} sent metrics: {metrics}")
-
-            # Maintain a strict 60-second interval
-            elapsed = time.time() - start_time
-            if elapsed < 60:
-                time.sleep(60 - elapsed)
+    def send_metrics(self, cpu_load, memory_usage, battery_level, load_avg, timestamp):
+        """Publishes smoothed system metrics (called from the sampler)."""
+        metrics = self.make_metrics(cpu_load, memory_usage, battery_level, load_avg, timestamp)
+        self.publish_metrics(metrics)
+        print(f"Node {self.node_id} sent metrics: {metrics}")
 
     def listen_for_task_assignments(self):
         """Listens for task assignments from the aggregator."""
         print(f"Node {self.node_id} listening for task assignments...")
 
         def callback(sample):
-            task_data = json.loads(sample.payload.decode())
-            if task_data["node_id"] == self.node_id:
-                print(f"Node {self.node_id} received task: {task_data['task']}")
-                self.execute_task(task_data["task"])
-
-        # Subscribe to task assignments
-        self.zenoh_session.declare_subscriber(self.task_topic, callback)
-
-    def execute_task(self, task_type):
-        """Executes the assigned task based on system metrics."""
-        if task_type == "load_task":
-            self.simulate_load_task()
-        else:
-            print(f"Node {self.node_id} received unknown task type: {task_type}")
-
-    def simulate_load_task(self):
-        """Simulates a CPU-intensive task."""
-        print(f"Node {self.node_id} starting load task...")
-        for _ in range(1000):
-            _ = sum(i * i for i in range(1000))  # Heavy computation
-        print(f"Node {self.node_id} completed load task.")
-
-    def get_system_metrics(self):
-        """Retrieve system metrics using psutil."""
-        cpu_load = psutil.cpu_percent(interval=1)  # CPU usage percentage
-        memory = psutil.virtual_memory()  # Memory statistics
-        memory_usage = memory.percent  # Memory usage percentage
-        battery = psutil.sensors_battery()  # Battery statistics
-        battery_level = battery.percent if battery else 100.0  # Assume 100% if no battery
-        load_avg = os.getloadavg()[0]  # 1-minute load average
-
+            _, tasks = wire_codec.decode_task_batch(sample.payload.to_bytes())
+            rejected = []
+            for task_id, task in tasks:
+                print(f"Node {self.node_id} received task: {task}")
+                if not self.executor.submit(task_id, task):
+                    rejected.append(task_id)
+            if rejected:
+                # Queue full; the aggregator requeues these for other nodes
+                print(f"Node {self.node_id} rejected tasks {rejected}: queue full")
+                self.ack_publisher.put(self.codec.encode_task_ack(self.node_id, [], time.time(), rejected))
+
+        # Subscribe to this node's task key expression; the router filters the rest
+        self.task_subscriber = self.zenoh_session.declare_subscriber(self.task_topic, callback)
+
+    def report_completion(self, task_id, known_task):
+        """Acknowledge a finished task (called from the executor)."""
+        if not known_task:
+            print(f"Node {self.node_id} received unknown task type for task {task_id}")
+        self.ack_publisher.put(self.codec.encode_task_ack(self.node_id, [task_id], time.time()))
+
+    def report_saturation(self, saturated):
+        """Republish the latest metrics as soon as the task queue fills up or frees up."""
+        print(f"Node {self.node_id} task queue {'full' if saturated else 'has room again'}")
+        self.sampler.publish_now()
+
+    def publish_metrics(self, metrics):
+        """Encode metrics plus the executor's current state with the configured codec and publish."""
+        self.metrics_publisher.put(self.codec.encode_metrics(
+            metrics["node_id"], metrics["cpu_load"], metrics["memory_usage"],
+            metrics["battery_level"], metrics["load_avg"], metrics["timestamp"],
+            self.executor.running_tasks, self.executor.queue_length, self.executor.task_capacity))
+
+    def make_metrics(self, cpu_load, memory_usage, battery_level, load_avg, timestamp):
         return {
             "cpu_load": cpu_load,
             "memory_usage": memory_usage,
             "battery_level": battery_level,
             "load_avg": load_avg,
             "node_id": self.node_id,
-            "timestamp": time.time()
+            "timestamp": timestamp
         }
 
+    def get_system_metrics(self):
+        """Latest smoothed system metrics from the sampler; never blocks."""
+        values = self.sampler.latest() or read_system_metrics()
+        return self.make_metrics(*values, time.time())
+
 if __name__ == "__main__":
     print("Starting Node2 Simulator with System Metrics...")
 
@@ -0,0 +1,1005 @@
+"""Single-writer aggregator core shared by the DDS and Zenoh aggregators.
+
+All aggregator state (registry, selector, coalescer, best node, task
+queue, latency and throughput windows, logs) is owned by one asyncio event
+loop running on its own thread. Nothing outside that thread mutates it, so
+there is no metrics_lock:
+
+  transport threads --post_sample()--> BoundedInbox
+      -> ingest stage   registry upsert, coalescing
+      -> score_queue -> scoring stage   rescore, best node, snapshot
+  producers --submit_task()--> BoundedInbox of pending tasks
+      -> dispatch stage   one scheduling round: assign each task with the
+                          dispatch policy (dispatch_policy.py), then
+                          publish_tasks(node_id, [(task_id, task), ...])
+                          once per node
+      -> log_queue -> logging stage   CSV row + decision history per task
+  transport threads --post_ack(), post_summary(), post_liveliness_lost()-->
+      BoundedInbox of messages -> message stage   task completion latency /
+                          throughput (rejected tasks go back to pending),
+                          summary merges, liveliness
+
+Both inboxes drop and count what arrives while they are full, so a storm of
+samples or acks cannot grow the loop's queues without bound.
+
+Nodes report their executor's running tasks, queue length and task
+capacity (workers + queue slots) with their metrics (see task_executor.py).
+A node is excluded from selection while it has as many unacknowledged
+tasks as its capacity, or while its latest sample or a rejection says its
+queue is full, so tasks are only sent where they can be accepted.
+
+With scoring_mode="predictive", nodes are scored on a short-horizon
+forecast of their metrics (metric_forecast.py: the latest sample,
+penalized by its Holt trend over a ring buffer of recent samples) instead
+of their latest sample. The ring buffer is filled in either mode, so
+switching modes at runtime refits the forecasts from recent history.
+
+In a sharded deployment (sharded_aggregation.py) regional aggregators
+export their top_candidates() and the root core merges them with
+post_summary() instead of ingesting raw samples. A node that drops out of
+its region's latest summary, or whose region stops reporting for
+region_timeout seconds, is withdrawn from selection until it is listed
+again.
+
+With checkpoint_path set, the registry, scores, forecaster state, settings
+and outstanding/pending tasks are written to a memory-mapped checkpoint
+(state_checkpoint.py) every checkpoint_interval seconds and on stop(), and
+restored by the constructor, so a restarted aggregator can decide right
+away. Restored nodes count as seen when their latest sample was taken.
+
+Liveness: a node is dead, and excluded from selection, once the transport
+reports its liveliness lost (DDS Liveliness QoS, Zenoh liveliness tokens;
+see post_liveliness_lost()) or it has sent no sample for liveness_timeout
+seconds, and alive again with its next sample. Tasks outstanding on a node
+that dies are requeued for other nodes. The timeouts run on a hashed timer
+wheel (timer_wheel.py) advanced by the ticker, with one timer per node
+that is only re-armed when it fires, so samples do not touch the wheel.
+With staleness_penalty set, a node's score also grows by staleness_penalty
+for every staleness_interval seconds its latest sample has aged.
+
+Every assignment also updates the fairness statistics (fairness_stats.py:
+per-node metric mean/variance, assignment entropy and Gini coefficient).
+
+Every scoring decision also submits decision_task, so a fleet with no
+other producer still gets one task per decision as before. Tasks that are
+not acknowledged within task_timeout seconds are counted as timed out.
+
+A ticker runs the coalesced scoring rounds and the task throughput window.
+Readers use snapshots.current (see aggregator_snapshot.py); its latency and
+throughput windows are task completion latency (ms) and completed tasks per
+second. Commands such as set_selection_criteria() are executed on the loop
+via call(). Each stage has its own queue depth gauge, processed counter and
+timing histogram on the telemetry registry.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+import traceback
+from collections import deque, namedtuple
+from concurrent import futures
+
+import numpy as np
+
+import scoring
+from dispatch_policy import InFlightTracker, get_policy
+from fairness_stats import FairnessStats
+from aggregator_snapshot import SnapshotPublisher
+from csv_log_writer import BatchedCsvWriter
+from decision_history import DecisionHistory
+from ingest_coalescer import LatestValueCoalescer
+from instrumentation import MetricsRegistry
+from metric_forecast import MetricForecaster
+from node_registry import NodeRegistry
+from node_selector import BestNodeSelector
+from scoring import DEFAULT_WEIGHTS
+from state_checkpoint import pack_strings, read_checkpoint, unpack_strings, write_checkpoint
+from timer_wheel import TimerWheel
+
+CRITERIA_MAP = {"1": "CPU", "2": "Memory", "3": "Battery", "4": "Load", "5": "ALL"}
+SCORING_MODES = ("reactive", "predictive")
+
+Decision = namedtuple("Decision", ["node_id", "score", "record", "decided_at"])
+PendingTask = namedtuple("PendingTask", ["task_id", "task", "submitted_at"])
+OutstandingTask = namedtuple("OutstandingTask", ["slot", "node_id", "task", "submitted_at", "dispatched_at"])
+
+class BoundedInbox:
+    """Bounded hand-off of items from other threads to the event loop.
+
+    post() appends to a deque and wakes the loop only when no wake-up is
+    already pending, so a burst of items costs one call_soon_threadsafe.
+    When maxsize items are waiting, new ones are dropped and counted.
+    """
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.maxsize = maxsize
+        self.items = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self._wake_pending = False
+
+    def __len__(self):
+        return len(self.items)
+
+    def post(self, item):
+        if len(self.items) >= self.maxsize:
+            self.dropped += 1
+            return False
+        self.items.append(item)
+        if not self._wake_pending:
+            self._wake_pending = True
+            self.loop.call_soon_threadsafe(self.ready.set)
+        return True
+
+    async def get_batch(self, max_batch):
+        while not self.items:
+            await self.ready.wait()
+            self.ready.clear()
+            self._wake_pending = False
+        batch = []
+        items = self.items
+        while items and len(batch) < max_batch:
+            batch.append(items.popleft())
+        return batch
+
+class AggregatorCore:
+    def __init__(self, publish_tasks, csv_file_path, selection_criteria="CPU", weights=None,
+                 score_interval=1.0, min_node_interval=0.0, inbox_size=10000, message_inbox_size=10000,
+                 stage_queue_size=1024, max_batch=256, dispatch_policy="argmin",
+                 in_flight_penalty=0.0, in_flight_ttl=10.0, decision_task="Perform task",
+                 max_pending_tasks=10000, max_tasks_per_round=256, dispatch_interval=0.0,
+                 task_timeout=60.0, capture_directory=None, scoring_mode="reactive",
+                 forecast_horizon=2.0, forecast_alpha=0.5, forecast_beta=0.05, forecast_window=16,
+                 region_timeout=5.0, checkpoint_path=None, checkpoint_interval=5.0, liveness_timeout=180.0,
+                 staleness_penalty=0.0, staleness_interval=60.0, liveness_tick=0.5):
+        if scoring_mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode {scoring_mode!r}; expected one of {list(SCORING_MODES)}")
+        self.publish_tasks = publish_tasks
+        self.selection_criteria = selection_criteria
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.max_batch = max_batch
+        self.decision_task = decision_task
+        self.max_tasks_per_round = max_tasks_per_round
+        self.dispatch_interval = dispatch_interval
+        self.task_timeout = task_timeout
+        self.region_timeout = region_timeout
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.liveness_timeout = liveness_timeout
+        self.staleness_penalty = staleness_penalty
+        self.staleness_interval = staleness_interval
+
+        # State owned by the loop thread
+        self.node_metrics = NodeRegistry()
+        self.scoring_mode = scoring_mode
+        self.forecaster = MetricForecaster(window=forecast_window, alpha=forecast_alpha,
+                                           beta=forecast_beta, horizon=forecast_horizon)
+        self.node_selector = BestNodeSelector(self.node_metrics, self._score_record)
+        self.coalescer = LatestValueCoalescer(self.node_metrics, score_interval, min_node_interval)
+        self.snapshots = SnapshotPublisher(self.node_metrics)
+        # Which node gets each task, and the score penalty per task in flight
+        self.dispatch_policy = get_policy(dispatch_policy)
+        self.in_flight = InFlightTracker(self.node_selector, in_flight_penalty, in_flight_ttl)
+        self.outstanding = {}  # task_id -> OutstandingTask, in dispatch order
+        self.node_capacity = {}     # slot -> task_capacity reported by the node
+        self.node_tasks = {}        # slot -> (running_tasks, queue_length) reported by the node
+        self.node_outstanding = {}  # slot -> tasks dispatched to it and not yet acknowledged
+        self.reported_full = set()  # slots whose latest sample or ack said the queue is full
+        self.saturated = set()      # slots excluded from selection for either reason
+        # Sharded mode: candidates listed in each region's latest summary
+        self.region_candidates = {}  # region -> set of slots
+        self.region_seen = {}        # region -> time its latest summary was merged
+        self.withdrawn = set()       # slots no longer listed by their region
+        # Liveness: the wheel's timers check a node's last sample time when they fire
+        self.liveness = TimerWheel(tick=liveness_tick, clock=time.time)
+        self.last_seen = {}        # slot -> time its latest sample was ingested
+        self.liveness_timers = {}  # slot -> pending liveness Timer; none while dead
+        self.staleness = {}        # slot -> staleness_interval steps its latest sample has aged, if any
+        self.dead = set()          # slots that lost liveliness or timed out
+        self._task_ids = itertools.count(1)
+        self.fairness = FairnessStats()
+        self.latencies = deque(maxlen=60)        # Task completion latency (ms)
+        self.throughput_data = deque(maxlen=60)  # Completed tasks per second
+        self.best_node = None
+        self.optimal_value = float('inf')
+        self.tasks_completed_in_window = 0
+        self.start_time = time.time()
+
+        # Instrumentation exported on /metrics in Prometheus text format
+        self.telemetry = telemetry = MetricsRegistry(prefix="aggregator")
+        self.receive_latency = telemetry.histogram("receive_latency_seconds", "Latency from node publish to aggregator receive")
+        self.ingest_time = telemetry.histogram("ingest_seconds", "Time to ingest one batch of samples")
+        self.scoring_time = telemetry.histogram("scoring_seconds", "Time to rescore the nodes updated by one decision")
+        self.selection_time = telemetry.histogram("selection_seconds", "Time to read the best node from the heap")
+        self.csv_write_time = telemetry.histogram("csv_write_seconds", "Time to write one batch of CSV rows")
+        self.scheduling_time = telemetry.histogram("scheduling_seconds", "Time to assign the tasks of one scheduling round")
+        self.task_publish_time = telemetry.histogram("task_publish_seconds", "Time to publish one node's task batch")
+        self.task_latency = telemetry.histogram("task_completion_latency_seconds", "Time from task submission to its acknowledgement")
+        self.decision_latency = telemetry.histogram("decision_latency_seconds", "Time from a node publishing a sample to the decision that scored it")
+        self.log_time = telemetry.histogram("log_seconds", "Time to hand one decision to the CSV and history logs")
+        self.samples_total = telemetry.counter("samples_total", "Metrics samples ingested")
+        self.decisions_total = telemetry.counter("decisions_total", "Best-node decisions made")
+        self.tasks_submitted = telemetry.counter("tasks_submitted_total", "Tasks taken from the pending queue")
+        self.tasks_dispatched = telemetry.counter("tasks_dispatched_total", "Tasks published to a node")
+        self.task_batches = telemetry.counter("task_batches_total", "Task batch messages published")
+        self.tasks_completed = telemetry.counter("tasks_completed_total", "Tasks acknowledged as completed")
+        self.tasks_rejected = telemetry.counter("tasks_rejected_total", "Tasks refused by a node with a full queue and requeued")
+        self.tasks_timed_out = telemetry.counter("tasks_timed_out_total", "Tasks not acknowledged within task_timeout")
+        self.unknown_acks = telemetry.counter("unknown_acks_total", "Acknowledgements for unknown or timed-out tasks")
+        self.stale_acks = telemetry.counter("stale_acks_total", "Acknowledgements from a node a requeued task is no longer assigned to")
+        self.logged_total = telemetry.counter("logged_total", "Task assignments handed to the logs")
+        self.summaries_merged = telemetry.counter("summaries_merged_total", "Regional top-k summaries merged")
+        self.liveliness_lost = telemetry.counter("liveliness_lost_total", "Nodes reported dead by the transport's liveliness")
+        self.liveness_timeouts = telemetry.counter("liveness_timeouts_total", "Nodes declared dead after liveness_timeout without a sample")
+        self.tasks_reassigned = telemetry.counter("tasks_reassigned_total", "Outstanding tasks of dead nodes requeued for other nodes")
+        self.checkpoints_written = telemetry.counter("checkpoints_total", "State checkpoints written")
+        self.checkpoint_time = telemetry.histogram("checkpoint_write_seconds", "Time to write one state checkpoint")
+        self.node_samples = telemetry.labeled_counter("node_samples_total", "Metrics samples ingested per node", "node_id")
+        self.node_assignments = telemetry.labeled_counter("node_assignments_total", "Tasks assigned per node", "node_id")
+
+        # Logging sinks
+        self.csv_log = BatchedCsvWriter(csv_file_path, write_histogram=self.csv_write_time)
+        self.decision_history = DecisionHistory(csv_file_path.rsplit('.', 1)[0] + '_history')
+        # Optional capture of every ingested sample, in the decision history's format
+        # with a NaN score, for offline replay (see trace_replay.py)
+        self.sample_capture = None if capture_directory is None else DecisionHistory(capture_directory, chunk_rows=4096)
+
+        # Stage queues; asyncio primitives bind to self.loop on first use
+        self.loop = asyncio.new_event_loop()
+        self.inbox = BoundedInbox(self.loop, inbox_size)
+        self.task_inbox = BoundedInbox(self.loop, max_pending_tasks)
+        self.message_inbox = BoundedInbox(self.loop, message_inbox_size)  # (handler, args) from transports
+        self.capacity_freed = asyncio.Event()
+        self.score_queue = asyncio.Queue(stage_queue_size)
+        self.log_queue = asyncio.Queue(stage_queue_size)
+        self._thread = None
+        self._started = threading.Event()
+        self._checkpoint_executor = None
+        self._checkpoint_write = None  # Future of the checkpoint being written, if any
+        self._checkpointed_at = time.time()
+        self.checkpoint_bytes = 0
+        self.restore_report = None
+
+        telemetry.gauge("nodes", "Nodes in the registry", lambda: len(self.node_metrics))
+        telemetry.gauge("pending_nodes", "Nodes with coalesced samples waiting for a scoring round", lambda: len(self.coalescer.dirty))
+        telemetry.gauge("tasks_in_flight", "Tasks counted against node scores by the in-flight penalty", lambda: len(self.in_flight))
+        telemetry.gauge("inbox_depth", "Samples waiting for the ingest stage", lambda: len(self.inbox))
+        telemetry.gauge("inbox_dropped", "Samples dropped because the inbox was full", lambda: self.inbox.dropped)
+        telemetry.gauge("message_inbox_depth", "Acks, summaries and liveliness messages waiting for the message stage", lambda: len(self.message_inbox))
+        telemetry.gauge("messages_dropped", "Acks, summaries and liveliness messages dropped because their inbox was full", lambda: self.message_inbox.dropped)
+        telemetry.gauge("score_queue_depth", "Scoring requests waiting", lambda: self.score_queue.qsize())
+        telemetry.gauge("pending_tasks", "Tasks waiting for a scheduling round", lambda: len(self.task_inbox))
+        telemetry.gauge("tasks_dropped", "Tasks dropped because the pending queue was full", lambda: self.task_inbox.dropped)
+        telemetry.gauge("saturated_nodes", "Nodes excluded from selection because their task queue is full", lambda: len(self.saturated))
+        telemetry.gauge("withdrawn_nodes", "Nodes excluded from selection because their region no longer lists them", lambda: len(self.withdrawn))
+        telemetry.gauge("dead_nodes", "Nodes excluded from selection because they lost liveliness or stopped reporting", lambda: len(self.dead))
+        telemetry.gauge("aging_nodes", "Nodes whose score carries a staleness penalty", lambda: len(self.staleness))
+        telemetry.gauge("outstanding_tasks", "Tasks dispatched and not yet acknowledged", lambda: len(self.outstanding))
+        telemetry.gauge("log_queue_depth", "Task assignments waiting to be logged", lambda: self.log_queue.qsize())
+        telemetry.gauge("csv_queue_depth", "Rows waiting in the CSV writer queue", lambda: self.csv_log.queue_depth)
+        telemetry.gauge("csv_dropped_rows", "CSV rows dropped because the writer queue was full", lambda: self.csv_log.dropped_rows)
+        telemetry.gauge("assignment_entropy", "Shannon entropy (nats) of the task assignments per node", self.fairness.entropy)
+        telemetry.gauge("assignment_gini", "Gini coefficient of the task assignments per node", self.fairness.gini)
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.restore_checkpoint(checkpoint_path)
+
+    # Lifecycle
+    def start(self):
+        self._thread = threading.Thread(target=self._run_loop, name="aggregator-core", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self, timeout=5.0):
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self._shutdown)
+            self._thread.join(timeout)
+        if self.checkpoint_path is not None:
+            # The loop has stopped, so the state can be gathered from this thread
+            if self._checkpoint_write is not None:
+                futures.wait([self._checkpoint_write], timeout)
+                self._checkpoint_executor.shutdown()
+            self._write_checkpoint(*self._checkpoint_state(time.time()))
+        self.csv_log.close()
+        self.decision_history.close()
+        if self.sample_capture is not None:
+            self.sample_capture.close()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self._tasks = [self.loop.create_task(self._guard(stage))
+                       for stage in (self._ingest_stage, self._message_stage, self._scoring_stage,
+                                     self._dispatch_stage, self._logging_stage, self._ticker)]
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+        # Let the cancelled stages unwind before closing the loop
+        self.loop.run_until_complete(asyncio.gather(*self._tasks, return_exceptions=True))
+        self.loop.close()
+
+    def _shutdown(self):
+        # Decisions already made still reach the logs
+        while not self.log_queue.empty():
+            self._log_decision(self.log_queue.get_nowait())
+        for task in self._tasks:
+            task.cancel()
+        self.loop.stop()
+
+    async def _guard(self, stage):
+        # Keep a stage alive across unexpected errors, like the old listener loops
+        while True:
+            try:
+                await stage()
+                # A stage whose input is always ready never suspends; let the others run
+                await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in aggregator stage {stage.__name__}: {e}")
+                traceback.print_exc()
+
+    # Thread-safe entry points
+    def post_sample(self, fields):
+        """Queue (node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+        running_tasks, queue_length, task_capacity); the last three are optional."""
+        return self.inbox.post(fields)
+
+    def submit_task(self, task):
+        """Queue a task for the next scheduling round; returns its id, or None if dropped."""
+        task_id = next(self._task_ids)
+        if not self.task_inbox.post(PendingTask(task_id, task, time.time())):
+            return None
+        return task_id
+
+    def post_summary(self, region, entries):
+        """Merge a regional aggregator's top-k summary: entries are post_sample() fields,
+        and the region's nodes missing from them are withdrawn from selection."""
+        return self.message_inbox.post((self._merge_summary, (region, list(entries), time.time())))
+
+    def post_liveliness_lost(self, node_id):
+        """Report that the transport saw node_id's writer or session go away."""
+        return self.message_inbox.post((self._liveliness_lost, (node_id,)))
+
+    def post_ack(self, node_id, task_ids, completed_at=None, rejected_ids=()):
+        """Report tasks completed or rejected by node_id (completed_at is the node's clock)."""
+        return self.message_inbox.post((self._complete_tasks, (node_id, list(task_ids), time.time(), list(rejected_ids))))
+
+    def call(self, fn, *args, timeout=5.0):
+        """Run fn(*args) on the loop thread and return its result."""
+        async def run():
+            return fn(*args)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result(timeout)
+
+    # Scoring
+    def calculate_score(self, data):
+        return scoring.calculate_score(data, self.selection_criteria, self.weights)
+
+    def _score_record(self, record):
+        if self.scoring_mode == "predictive":
+            record = self.forecaster.forecast_record(self.node_metrics.slots[record.node_id], record)
+        return self.calculate_score(record)
+
+    def _score_fleet(self, values):
+        if self.scoring_mode == "predictive":
+            values = self.forecaster.forecasts[:len(values)]
+        return scoring.score_fleet(values, self.selection_criteria, self.weights)[0]
+
+    def set_selection_criteria(self, criteria, new_weights=None):
+        """Change the criteria/weights and rescore the fleet in one vectorized pass."""
+        self.selection_criteria = criteria
+        if new_weights:
+            self.weights.update(new_weights)
+        self._rescore_fleet()
+        return {"selection_criteria": self.selection_criteria, "weights": dict(self.weights),
+                "best_node": self.best_node, "optimal_value": self.optimal_value}
+
+    def set_scoring_mode(self, mode=None, horizon=None, alpha=None, beta=None):
+        """Switch between reactive and predictive scoring and/or change the forecast parameters."""
+        if mode is not None and mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode {mode!r}; expected one of {list(SCORING_MODES)}")
+        # Forecasts are only kept current in predictive mode; refit them from the ring buffer
+        self.forecaster.set_parameters(alpha, beta, horizon)
+        if mode is not None:
+            self.scoring_mode = mode
+        self._rescore_fleet()
+        return self.scoring_settings()
+
+    def scoring_settings(self):
+        forecaster = self.forecaster
+        return {"mode": self.scoring_mode, "horizon": forecaster.horizon, "alpha": forecaster.alpha,
+                "beta": forecaster.beta, "window": forecaster.window,
+                "best_node": self.best_node, "optimal_value": self.optimal_value}
+
+    def _rescore_fleet(self):
+        self.node_selector.rescore_all(self._score_fleet)
+        self.best_node, self.optimal_value = self.node_selector.best()
+        self.publish_snapshot(full=True)
+
+    def set_dispatch_policy(self, name=None, in_flight_penalty=None):
+        """Switch the dispatch policy and/or the per-task in-flight penalty."""
+        if name is not None and name != self.dispatch_policy.name:
+            self.dispatch_policy = get_policy(name)
+        if in_flight_penalty is not None:
+            self.in_flight.set_penalty(float(in_flight_penalty))
+        return self.dispatch_settings()
+
+    def dispatch_settings(self):
+        return {"policy": self.dispatch_policy.name, "in_flight_penalty": self.in_flight.penalty,
+                "in_flight_ttl": self.in_flight.ttl, "tasks_in_flight": len(self.in_flight)}
+
+    def publish_snapshot(self, full=False):
+        return self.snapshots.publish(self.best_node, self.optimal_value, self.latencies,
+                                      self.throughput_data, full=full)
+
+    # Pipeline stages
+    async def _ingest_stage(self):
+        batch = await self.inbox.get_batch(self.max_batch)
+        current_time = time.time()
+        immediate = []
+        with self.ingest_time.time():
+            for fields in batch:
+                # Always keep the latest sample; score now only if it changed significantly
+                slot = self._ingest_sample(fields, current_time)
+                if self.coalescer.offer(slot, current_time):
+                    immediate.append(slot)
+
+        if immediate:
+            await self.score_queue.put((immediate, current_time))
+        else:
+            self.publish_snapshot()
+
+    async def _message_stage(self):
+        # Acks, summaries and liveliness reports, in arrival order
+        for handler, args in await self.message_inbox.get_batch(self.max_batch):
+            try:
+                handler(*args)
+            except Exception as e:
+                print(f"Error handling {handler.__name__}{args[:1]}: {e}")
+                traceback.print_exc()
+
+    def _ingest_sample(self, fields, current_time):
+        node_id, timestamp = fields[0], fields[5]
+        self.receive_latency.record(abs(current_time - timestamp))
+        self.samples_total.inc()
+        self.node_samples.inc(node_id)
+        slot = self.node_metrics.upsert(*fields[:6])
+        if self.scoring_mode == "predictive":
+            self.forecaster.update(slot, self.node_metrics.values[slot])
+        else:
+            self.forecaster.record(slot, self.node_metrics.values[slot])
+        if self.sample_capture is not None:
+            self.sample_capture.append(node_id, float('nan'), *fields[1:6])
+        if slot == self.fairness.node_count:
+            self.fairness.add_node(slot)  # Slots are allocated in order
+        if len(fields) > 6:
+            self._update_capacity(slot, *fields[6:9])
+        self.last_seen[slot] = current_time
+        if slot not in self.liveness_timers:
+            self._arm_liveness(slot, current_time, current_time)
+            if slot in self.dead:
+                self.dead.discard(slot)
+                self._refresh_selection(slot)
+        if slot in self.staleness:
+            self._set_staleness(slot, 0)
+        return slot
+
+    def _merge_summary(self, region, entries, received_at):
+        # Summaries are already coalesced by the region: rescore every entry now
+        with self.ingest_time.time():
+            listed = set()
+            for fields in entries:
+                slot = self._ingest_sample(fields, received_at)
+                self.node_selector.update(slot)
+                self.coalescer.mark_scored(slot, received_at)
+                listed.add(slot)
+            previous = self.region_candidates.get(region, set())
+            self.region_candidates[region] = listed
+            self.region_seen[region] = received_at
+            for slot in previous - listed:
+                self.withdrawn.add(slot)
+                self._refresh_selection(slot)
+            for slot in listed & self.withdrawn:
+                self.withdrawn.discard(slot)
+                self._refresh_selection(slot)
+        self.best_node, self.optimal_value = self.node_selector.best()
+        self.summaries_merged.inc()
+        self.publish_snapshot()
+
+    def _expire_regions(self, now):
+        # A region that stopped reporting takes its candidates with it
+        deadline = now - self.region_timeout
+        for region, seen in list(self.region_seen.items()):
+            if seen < deadline:
+                del self.region_seen[region]
+                for slot in self.region_candidates.pop(region):
+                    self.withdrawn.add(slot)
+                    self._refresh_selection(slot)
+                print(f"Region {region} stopped reporting; its nodes are withdrawn")
+
+    def top_candidates(self, k):
+        """post_sample() fields of the k best selectable nodes, best first (a regional summary)."""
+        registry = self.node_metrics
+        best = heapq.nsmallest(k, self.node_selector.heap.scores.items(), key=lambda item: (item[1], item[0]))
+        return [(registry.node_ids[slot], *registry.values[slot].tolist(), float(registry.timestamps[slot]),
+                 *self.node_tasks.get(slot, (0, 0)), self.node_capacity.get(slot, 0))
+                for slot, _ in best]
+
+    async def _ticker(self):
+        # Scoring rounds for nodes whose latest samples were coalesced
+        await asyncio.sleep(self.coalescer.score_interval)
+        current_time = time.time()
+        self.in_flight.expire(current_time)
+        self._expire_outstanding(current_time)
+        if self.region_seen:
+            self._expire_regions(current_time)
+        self.liveness.advance(current_time)
+        if self.checkpoint_path is not None and current_time - self._checkpointed_at >= self.checkpoint_interval:
+            self._start_checkpoint(current_time)
+
+        # Task throughput window
+        elapsed_time = current_time - self.start_time
+        if elapsed_time >= 1.0:
+            throughput = self.tasks_completed_in_window / elapsed_time
+            self.throughput_data.append(throughput)
+            if self.tasks_completed_in_window:
+                print(f"Task throughput: {throughput:.2f} tasks/sec")
+            self.tasks_completed_in_window = 0
+            self.start_time = current_time
+
+        slots = self.coalescer.due(current_time)
+        if slots:
+            await self.score_queue.put((slots, current_time))
+        else:
+            # Also runs when idle so the snapshot's registry copy catches up
+            self.publish_snapshot()
+
+    async def _scoring_stage(self):
+        slots, current_time = await self.score_queue.get()
+        # Rescore only the nodes with new samples; the heap keeps the best on top
+        with self.scoring_time.time():
+            self.in_flight.expire(current_time)
+            for slot in slots:
+                self.node_selector.update(slot)
+                self.coalescer.mark_scored(slot, current_time)
+        with self.selection_time.time():
+            best_node_id, best_node_score = self.node_selector.best()
+        decided_at = time.time()
+        timestamps = self.node_metrics.timestamps
+        for slot in slots:
+            self.decision_latency.record(decided_at - timestamps[slot])
+        self.best_node = best_node_id
+        self.optimal_value = best_node_score
+        self.decisions_total.inc()
+        self.publish_snapshot()
+        print(f"New best node: {best_node_id} with score {best_node_score}")
+        if self.decision_task is not None:
+            self.submit_task(self.decision_task)
+
+    async def _dispatch_stage(self):
+        # One scheduling round: everything pending, up to max_tasks_per_round
+        tasks = await self.task_inbox.get_batch(self.max_tasks_per_round)
+        now = time.time()
+        batches = {}
+        assigned = []
+        with self.scheduling_time.time():
+            self.in_flight.expire(now)
+            for i, task in enumerate(tasks):
+                node_id, score = self.dispatch_policy.choose(self.node_selector)
+                if node_id is None:
+                    # No node can take work; keep the rest pending until one can
+                    self.task_inbox.items.extendleft(reversed(tasks[i:]))
+                    break
+                slot = self.node_metrics.slots[node_id]
+                self.in_flight.dispatched(slot, now)
+                self.outstanding[task.task_id] = OutstandingTask(slot, node_id, task.task, task.submitted_at, now)
+                self._track_outstanding(slot, 1)
+                self.fairness.record(slot, self.node_metrics.values[slot])
+                batches.setdefault(node_id, []).append((task.task_id, task.task))
+                assigned.append(Decision(node_id, score, self.node_metrics.record_at(slot), now))
+        self.tasks_submitted.inc(len(assigned))
+
+        # One multi-task message per node
+        for node_id, node_tasks in batches.items():
+            with self.task_publish_time.time():
+                self.publish_tasks(node_id, node_tasks)
+            self.task_batches.inc()
+            self.tasks_dispatched.inc(len(node_tasks))
+            self.node_assignments.inc(node_id, len(node_tasks))
+        for decision in assigned:
+            await self.log_queue.put(decision)
+
+        if len(assigned) < len(tasks):
+            self.capacity_freed.clear()
+            try:
+                await asyncio.wait_for(self.capacity_freed.wait(), self.coalescer.score_interval)
+            except asyncio.TimeoutError:
+                pass
+        elif self.dispatch_interval:
+            await asyncio.sleep(self.dispatch_interval)
+
+    def _update_capacity(self, slot, running_tasks, queue_length, task_capacity):
+        self.node_tasks[slot] = (running_tasks, queue_length)
+        if task_capacity:
+            self.node_capacity[slot] = task_capacity
+        else:
+            self.node_capacity.pop(slot, None)
+        if task_capacity and running_tasks + queue_length >= task_capacity:
+            self.reported_full.add(slot)
+        else:
+            self.reported_full.discard(slot)
+        self._refresh_saturation(slot)
+
+    def _track_outstanding(self, slot, delta):
+        self.node_outstanding[slot] = self.node_outstanding.get(slot, 0) + delta
+        self._refresh_saturation(slot)
+
+    def _refresh_saturation(self, slot):
+        capacity = self.node_capacity.get(slot, 0)
+        full = slot in self.reported_full or (capacity and self.node_outstanding.get(slot, 0) >= capacity)
+        if full:
+            self.saturated.add(slot)
+        else:
+            self.saturated.discard(slot)
+        self._refresh_selection(slot)
+
+    def _refresh_selection(self, slot):
+        # Selectable unless saturated, withdrawn by its region or dead, whichever excluded it
+        selectable = slot not in self.saturated and slot not in self.withdrawn and slot not in self.dead
+        excluded = slot in self.node_selector.excluded
+        if selectable and excluded:
+            self.node_selector.include(slot)
+            self.capacity_freed.set()
+        elif not selectable and not excluded:
+            self.node_selector.exclude(slot)
+
+    # Liveness
+    def _arm_liveness(self, slot, seen, now):
+        # Next check: the liveness deadline, or the next staleness step if that comes first
+        deadline = float('inf') if self.liveness_timeout is None else seen + self.liveness_timeout
+        if self.staleness_penalty:
+            steps = int((now - seen) // self.staleness_interval) + 1
+            deadline = min(deadline, seen + steps * self.staleness_interval)
+        self.liveness_timers[slot] = (None if deadline == float('inf')
+                                      else self.liveness.schedule_at(deadline, self._check_liveness, slot))
+
+    def _check_liveness(self, slot):
+        # Samples only update last_seen; the timer finds out here whether one arrived
+        now = time.time()
+        seen = self.last_seen[slot]
+        if self.liveness_timeout is not None and now - seen >= self.liveness_timeout:
+            del self.liveness_timers[slot]
+            self.liveness_timeouts.inc()
+            self._mark_dead(slot)
+            return
+        if self.staleness_penalty:
+            self._set_staleness(slot, int((now - seen) // self.staleness_interval))
+        self._arm_liveness(slot, seen, now)
+
+    def _set_staleness(self, slot, steps):
+        if steps:
+            self.staleness[slot] = steps
+        elif self.staleness.pop(slot, None) is None:
+            return
+        self.node_selector.set_offset(slot, steps * self.staleness_penalty, "staleness")
+
+    def _liveliness_lost(self, node_id):
+        slot = self.node_metrics.slots.get(node_id)
+        if slot is None or slot in self.dead:
+            return
+        self.liveness.cancel(self.liveness_timers.pop(slot, None))
+        self.liveliness_lost.inc()
+        self._mark_dead(slot)
+
+    def _mark_dead(self, slot):
+        self.dead.add(slot)
+        self._set_staleness(slot, 0)
+        self._refresh_selection(slot)
+        if self.node_metrics.node_ids[slot] == self.best_node:
+            # Readers of the snapshot must not keep seeing the dead node as optimal
+            self.best_node, self.optimal_value = self.node_selector.best()
+            self.publish_snapshot()
+        # Its outstanding tasks will never be acknowledged: dispatch them elsewhere
+        lost = [task_id for task_id, entry in self.outstanding.items() if entry.slot == slot]
+        for task_id in lost:
+            entry = self.outstanding.pop(task_id)
+            self.in_flight.completed(slot)
+            self._track_outstanding(slot, -1)
+            self.task_inbox.post(PendingTask(task_id, entry.task, entry.submitted_at))
+        self.tasks_reassigned.inc(len(lost))
+        print(f"Node {self.node_metrics.node_ids[slot]} is dead; {len(lost)} outstanding tasks requeued")
+
+    def _ack_entry(self, task_id, slot):
+        # A requeued task keeps its id: only the node it is assigned to now may close it
+        entry = self.outstanding.get(task_id)
+        if entry is None:
+            self.unknown_acks.inc()
+            return None
+        if entry.slot != slot:
+            self.stale_acks.inc()
+            return None
+        return self.outstanding.pop(task_id)
+
+    def _complete_tasks(self, node_id, task_ids, received_at, rejected_ids=()):
+        slot = self.node_metrics.slots.get(node_id)
+        for task_id in rejected_ids:
+            entry = self._ack_entry(task_id, slot)
+            if entry is None:
+                continue
+            # The node's queue is full: stop choosing it and dispatch the task elsewhere
+            self.in_flight.completed(entry.slot)
+            self.reported_full.add(entry.slot)
+            self._track_outstanding(entry.slot, -1)
+            self.task_inbox.post(PendingTask(task_id, entry.task, entry.submitted_at))
+            self.tasks_rejected.inc()
+        for task_id in task_ids:
+            entry = self._ack_entry(task_id, slot)
+            if entry is None:
+                continue
+            latency = received_at - entry.submitted_at
+            self.task_latency.record(latency)
+            self.latencies.append(latency * 1000)  # Latency in ms
+            self.in_flight.completed(entry.slot)
+            # A finished task frees a place in the node's queue
+            self.reported_full.discard(entry.slot)
+            self._track_outstanding(entry.slot, -1)
+            self.tasks_completed.inc()
+            self.tasks_completed_in_window += 1
+
+    def _expire_outstanding(self, now):
+        # self.outstanding is in dispatch order, so expired tasks are at the front
+        deadline = now - self.task_timeout
+        outstanding = self.outstanding
+        while outstanding:
+            task_id = next(iter(outstanding))
+            if outstanding[task_id].dispatched_at > deadline:
+                break
+            self._track_outstanding(outstanding.pop(task_id).slot, -1)
+            self.tasks_timed_out.inc()
+
+    async def _logging_stage(self):
+        self._log_decision(await self.log_queue.get())
+
+    def _log_decision(self, decision):
+        data = decision.record
+        with self.log_time.time():
+            # Queued; written in batches by the log-writer thread
+            self.csv_log.submit([data.node_id, decision.score, data.cpu_load, data.memory_usage,
+                                 data.battery_level, data.load_avg])
+            self.decision_history.append(data.node_id, decision.score, data.cpu_load, data.memory_usage,
+                                         data.battery_level, data.load_avg, decision.decided_at)
+        self.logged_total.inc()
+
+    # Checkpointing
+    def _checkpoint_state(self, now):
+        # Copies of the loop-owned state; the file is written from another thread
+        registry, selector, forecaster = self.node_metrics, self.node_selector, self.forecaster
+        count = len(registry)
+        scores = np.full(count, np.nan)
+        if selector.base_scores:
+            slots = np.fromiter(selector.base_scores, dtype=np.int64, count=len(selector.base_scores))
+            scores[slots] = np.fromiter(selector.base_scores.values(), dtype=np.float64, count=len(slots))
+        capacity = np.zeros((count, 4), dtype=np.int64)  # task_capacity, running, queued, reported full
+        for slot, task_capacity in self.node_capacity.items():
+            capacity[slot, 0] = task_capacity
+        for slot, (running_tasks, queue_length) in self.node_tasks.items():
+            capacity[slot, 1:3] = running_tasks, queue_length
+        capacity[list(self.reported_full), 3] = 1
+        dirty = np.zeros(count, dtype=bool)
+        dirty[list(self.coalescer.dirty)] = True
+        self.coalescer.ensure_capacity()  # Slots may have been added since it last grew
+
+        outstanding = list(self.outstanding.items())
+        pending = list(self.task_inbox.items)
+        node_id_offsets, node_id_blob = pack_strings(registry.node_ids)
+        outstanding_offsets, outstanding_blob = pack_strings([entry.task for _, entry in outstanding])
+        pending_offsets, pending_blob = pack_strings([task.task for task in pending])
+        arrays = {
+            "node_id_offsets": node_id_offsets, "node_id_blob": node_id_blob,
+            "values": registry.values[:count].copy(), "timestamps": registry.timestamps[:count].copy(),
+            "generations": registry.generations[:count].copy(), "scores": scores,
+            "capacity": capacity, "dirty": dirty,
+            "scored_values": self.coalescer.scored_values[:count].copy(),
+            "scored_at": self.coalescer.scored_at[:count].copy(),
+            "forecast_samples": forecaster.samples[:count].copy(),
+            "forecast_counts": forecaster.counts[:count].copy(),
+            "forecast_level": forecaster.level[:count].copy(),
+            "forecast_trend": forecaster.trend[:count].copy(),
+            "forecasts": forecaster.forecasts[:count].copy(),
+            "outstanding_ids": np.array([task_id for task_id, _ in outstanding], dtype=np.uint64),
+            "outstanding_slots": np.array([entry.slot for _, entry in outstanding], dtype=np.int64),
+            "outstanding_times": np.array([(entry.submitted_at, entry.dispatched_at) for _, entry in outstanding],
+                                          dtype=np.float64).reshape(-1, 2),
+            "outstanding_offsets": outstanding_offsets, "outstanding_blob": outstanding_blob,
+            "pending_ids": np.array([task.task_id for task in pending], dtype=np.uint64),
+            "pending_times": np.array([task.submitted_at for task in pending], dtype=np.float64),
+            "pending_offsets": pending_offsets, "pending_blob": pending_blob,
+        }
+        meta = {
+            "saved_at": now, "node_count": count, "best_node": self.best_node,
+            "optimal_value": self.optimal_value, "selection_criteria": self.selection_criteria,
+            "weights": self.weights, "scoring_mode": self.scoring_mode, "forecast_window": forecaster.window,
+            "forecast_alpha": forecaster.alpha, "forecast_beta": forecaster.beta,
+            "forecast_horizon": forecaster.horizon, "dispatch_policy": self.dispatch_policy.name,
+            "in_flight_penalty": self.in_flight.penalty, "next_task_id": next(self._task_ids),
+        }
+        return meta, arrays
+
+    def _write_checkpoint(self, meta, arrays):
+        with self.checkpoint_time.time():
+            self.checkpoint_bytes = write_checkpoint(self.checkpoint_path, meta, arrays)
+        self.checkpoints_written.inc()
+
+    def _start_checkpoint(self, now):
+        # Skip this round if the previous checkpoint is still being written
+        if self._checkpoint_write is not None and not self._checkpoint_write.done():
+            return
+        if self._checkpoint_executor is None:
+            self._checkpoint_executor = futures.ThreadPoolExecutor(1, thread_name_prefix="aggregator-checkpoint")
+        self._checkpointed_at = now
+        self._checkpoint_write = self._checkpoint_executor.submit(self._write_checkpoint, *self._checkpoint_state(now))
+        self._checkpoint_write.add_done_callback(self._checkpoint_written)
+
+    def _checkpoint_written(self, future):
+        if future.exception() is not None:
+            print(f"Error writing checkpoint {self.checkpoint_path}: {future.exception()}")
+
+    def restore_checkpoint(self, path):
+        """Load the state saved in a checkpoint into this (not yet started) core."""
+        started = time.perf_counter()
+        meta, arrays = read_checkpoint(path)
+        now = time.time()
+        count = meta["node_count"]
+
+        # Settings as they were when the checkpoint was taken
+        self.selection_criteria = meta["selection_criteria"]
+        self.weights = dict(meta["weights"])
+        self.scoring_mode = meta["scoring_mode"]
+        self.dispatch_policy = get_policy(meta["dispatch_policy"])
+        self.in_flight.set_penalty(meta["in_flight_penalty"])
+        self._task_ids = itertools.count(meta["next_task_id"])
+
+        registry = self.node_metrics
+        registry.load(unpack_strings(arrays["node_id_offsets"], arrays["node_id_blob"]),
+                      arrays["values"], arrays["timestamps"], arrays["generations"])
+        self.fairness.add_nodes(count)
+        self.coalescer.ensure_capacity()
+        self.coalescer.scored_values[:count] = arrays["scored_values"]
+        self.coalescer.scored_at[:count] = arrays["scored_at"]
+        self.coalescer.dirty = set(np.flatnonzero(arrays["dirty"]).tolist())
+
+        forecaster = self.forecaster
+        if count and meta["forecast_window"] == forecaster.window:
+            forecaster.add_nodes(count)
+            forecaster.samples[:count] = arrays["forecast_samples"]
+            forecaster.counts[:count] = arrays["forecast_counts"]
+            forecaster.level[:count] = arrays["forecast_level"]
+            forecaster.trend[:count] = arrays["forecast_trend"]
+            forecaster.forecasts[:count] = arrays["forecasts"]
+        # The restored smoothing state already matches these; set_parameters() would refit it
+        forecaster.alpha, forecaster.beta = meta["forecast_alpha"], meta["forecast_beta"]
+        forecaster.horizon = meta["forecast_horizon"]
+
+        # Saved scores; nodes that had not been scored yet are scored now
+        scores = np.array(arrays["scores"])
+        unscored = np.isnan(scores)
+        if unscored.any():
+            scores[unscored] = self._score_fleet(registry.values[:count])[unscored]
+        self.node_selector.rescore_all(lambda values: scores)
+
+        capacity = arrays["capacity"]
+        reported = np.flatnonzero(capacity[:, :3].any(axis=1)).tolist()
+        for slot, (task_capacity, running_tasks, queue_length, full) in zip(reported, capacity[reported].tolist()):
+            self.node_tasks[slot] = (running_tasks, queue_length)
+            if task_capacity:
+                self.node_capacity[slot] = task_capacity
+            if full:
+                self.reported_full.add(slot)
+        # Nodes that have not reported for liveness_timeout seconds are dead until their next sample
+        timestamps = registry.timestamps[:count]
+        ages = now - timestamps
+        alive = ages < (float('inf') if self.liveness_timeout is None else self.liveness_timeout)
+        self.dead = set(np.flatnonzero(~alive).tolist())
+        for slot, seen in zip(np.flatnonzero(alive).tolist(), timestamps[alive].tolist()):
+            self.last_seen[slot] = seen
+            self._arm_liveness(slot, seen, now)
+
+        outstanding_tasks = unpack_strings(arrays["outstanding_offsets"], arrays["outstanding_blob"])
+        for task_id, slot, (submitted_at, dispatched_at), task in zip(
+                arrays["outstanding_ids"].tolist(), arrays["outstanding_slots"].tolist(),
+                arrays["outstanding_times"].tolist(), outstanding_tasks):
+            self.outstanding[task_id] = OutstandingTask(slot, registry.node_ids[slot], task, submitted_at, dispatched_at)
+            self.node_outstanding[slot] = self.node_outstanding.get(slot, 0) + 1
+            self.in_flight.dispatched(slot, dispatched_at)
+        pending_tasks = unpack_strings(arrays["pending_offsets"], arrays["pending_blob"])
+        for task_id, submitted_at, task in zip(arrays["pending_ids"].tolist(),
+                                               arrays["pending_times"].tolist(), pending_tasks):
+            self.task_inbox.items.append(PendingTask(task_id, task, submitted_at))
+        # Only nodes with tasks, a capacity or no recent sample can be excluded
+        for slot in self.node_capacity.keys() | self.reported_full | self.node_outstanding.keys() | self.dead:
+            self._refresh_saturation(slot)
+
+        self.best_node, self.optimal_value = self.node_selector.best()
+        self.publish_snapshot(full=True)
+        self._checkpointed_at = now
+        self.restore_report = {
+            "path": path, "nodes": count, "dead_nodes": len(self.dead),
+            "outstanding_tasks": len(self.outstanding), "pending_tasks": len(self.task_inbox),
+            "checkpoint_age": now - meta["saved_at"],
+            "oldest_sample_age": float(ages.max()) if count else 0.0,
+            "restore_ms": (time.perf_counter() - started) * 1000,
+        }
+        print(f"Restored {count} nodes ({len(self.dead)} dead), {len(self.outstanding)} outstanding and "
+              f"{len(self.task_inbox)} pending tasks from {path} in {self.restore_report['restore_ms']:.1f} ms; "
+              f"best node {self.best_node}")
+        return self.restore_report
+
+    # Stats for the REST routes (read-only, safe from any thread)
+    def checkpoint_stats(self):
+        return {
+            "path": self.checkpoint_path,
+            "interval": self.checkpoint_interval,
+            "written": self.checkpoints_written.value,
+            "bytes": self.checkpoint_bytes,
+            "age": time.time() - self._checkpointed_at if self.checkpoints_written.value else None,
+            "write_p99": self.checkpoint_time.percentile(0.99),
+            "restored": self.restore_report,
+        }
+
+    def ingest_stats(self):
+        stats = self.coalescer.stats()
+        stats["inbox_depth"] = len(self.inbox)
+        stats["inbox_dropped"] = self.inbox.dropped
+        stats["message_inbox_depth"] = len(self.message_inbox)
+        stats["messages_dropped"] = self.message_inbox.dropped
+        return stats
+
+    def fairness_stats(self):
+        """Fairness summary; O(nodes), so run it on the loop via call()."""
+        return self.fairness.summary(self.node_metrics.node_ids)
+
+    def liveness_stats(self):
+        """Dead and aging nodes with the age of their latest sample; run it on the loop via call()."""
+        now = time.time()
+        registry = self.node_metrics
+        def age(slot):
+            return now - self.last_seen.get(slot, float(registry.timestamps[slot]))
+        return {
+            "liveness_timeout": self.liveness_timeout,
+            "staleness_penalty": self.staleness_penalty,
+            "staleness_interval": self.staleness_interval,
+            "timers": len(self.liveness),
+            "liveliness_lost": self.liveliness_lost.value,
+            "timed_out": self.liveness_timeouts.value,
+            "tasks_reassigned": self.tasks_reassigned.value,
+            "dead": {registry.node_ids[slot]: age(slot) for slot in self.dead},
+            "aging": {registry.node_ids[slot]: {"age": age(slot), "penalty": steps * self.staleness_penalty}
+                      for slot, steps in self.staleness.items()},
+        }
+
+    def region_stats(self):
+        """Per-region candidates and summary age (sharded root); run it on the loop via call()."""
+        now = time.time()
+        return {region: {"candidates": len(self.region_candidates[region]), "age": now - seen}
+                for region, seen in self.region_seen.items()}
+
+    def task_stats(self):
+        return {
+            "pending": len(self.task_inbox),
+            "dropped": self.task_inbox.dropped,
+            "outstanding": len(self.outstanding),
+            "submitted": self.tasks_submitted.value,
+            "dispatched": self.tasks_dispatched.value,
+            "batches": self.task_batches.value,
+            "completed": self.tasks_completed.value,
+            "rejected": self.tasks_rejected.value,
+            "timed_out": self.tasks_timed_out.value,
+            "saturated_nodes": [self.node_metrics.node_ids[slot] for slot in list(self.saturated)],
+            "unknown_acks": self.unknown_acks.value,
+            "stale_acks": self.stale_acks.value,
+            "throughput": self.throughput_data[-1] if self.throughput_data else 0.0,
+            "latency_p50": self.task_latency.percentile(0.5),
+            "latency_p99": self.task_latency.percentile(0.99),
+        }
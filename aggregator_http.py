@@ -0,0 +1,125 @@
+"""REST routes of the aggregator, shared by the DDS and Zenoh aggregators
+and the headless service (aggregator_service.py).
+
+create_app() builds a Flask app around an AggregatorCore. Routes read the
+core's snapshots and stats, or run commands on its loop via core.call().
+pause_event, when given, is set by /pause and cleared by /resume; the
+transport listeners drop samples while it is set.
+"""
+from flask import Flask, Response, request, jsonify
+
+from aggregator_core import CRITERIA_MAP
+from instrumentation import PROMETHEUS_CONTENT_TYPE
+
+def create_app(core, pause_event=None, name=__name__):
+    app = Flask(name)
+    criteria_map = CRITERIA_MAP
+
+    @app.route('/get_best_node', methods=['GET'])
+    def get_best_node():
+        # Served from the latest snapshot; no rescoring and no lock
+        snapshot = core.snapshots.current
+        return jsonify({"best_node": snapshot.best_node, "optimal_value": snapshot.optimal_value,
+                        "version": snapshot.version})
+
+    @app.route('/nodes', methods=['GET'])
+    def get_nodes():
+        # Latest metrics per node from the snapshot (copied at most every 0.5 s)
+        snapshot = core.snapshots.current
+        nodes = [
+            {"node_id": node_id, "cpu_load": row[0], "memory_usage": row[1],
+             "battery_level": row[2], "load_avg": row[3], "timestamp": timestamp}
+            for node_id, row, timestamp in zip(snapshot.node_ids, snapshot.values.tolist(), snapshot.timestamps.tolist())
+        ]
+        return jsonify({"version": snapshot.version, "taken_at": snapshot.taken_at, "nodes": nodes})
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        return Response(core.telemetry.render(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+    @app.route('/log_stats', methods=['GET'])
+    def log_stats():
+        return jsonify(core.csv_log.stats())
+
+    @app.route('/ingest_stats', methods=['GET'])
+    def ingest_stats():
+        return jsonify(core.ingest_stats())
+
+    @app.route('/set_criteria', methods=['POST'])
+    def set_criteria():
+        body = request.get_json(force=True)
+        criteria = criteria_map.get(body.get("criteria"), body.get("criteria", core.selection_criteria))
+        if criteria not in criteria_map.values():
+            return jsonify({"error": f"Unknown criteria {criteria}"}), 400
+        # Runs on the core's loop, between pipeline steps
+        return jsonify(core.call(core.set_selection_criteria, criteria, body.get("weights")))
+
+    @app.route('/tasks', methods=['POST'])
+    def submit_tasks():
+        # {"task": "Perform task", "count": 1}; tasks go out in the next scheduling round
+        body = request.get_json(force=True)
+        task = body.get("task", "Perform task")
+        task_ids = [core.submit_task(task) for _ in range(int(body.get("count", 1)))]
+        return jsonify({"task_ids": [task_id for task_id in task_ids if task_id is not None],
+                        "dropped": task_ids.count(None)})
+
+    @app.route('/task_stats', methods=['GET'])
+    def task_stats():
+        return jsonify(core.task_stats())
+
+    @app.route('/fairness', methods=['GET'])
+    def fairness():
+        # Live uniformity statistics of the task assignments (see fairness_stats.py)
+        return jsonify(core.call(core.fairness_stats))
+
+    @app.route('/dispatch_policy', methods=['GET'])
+    def get_dispatch_policy():
+        return jsonify(core.dispatch_settings())
+
+    @app.route('/set_policy', methods=['POST'])
+    def set_policy():
+        # {"policy": "argmin" | "p2c" | "wrr", "in_flight_penalty": float}; both optional
+        body = request.get_json(force=True)
+        try:
+            settings = core.call(core.set_dispatch_policy, body.get("policy"), body.get("in_flight_penalty"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(settings)
+
+    @app.route('/scoring', methods=['GET'])
+    def get_scoring():
+        return jsonify(core.scoring_settings())
+
+    @app.route('/set_scoring', methods=['POST'])
+    def set_scoring():
+        # {"mode": "reactive" | "predictive", "horizon": samples, "alpha": float, "beta": float}; all optional
+        body = request.get_json(force=True)
+        try:
+            settings = core.call(core.set_scoring_mode, body.get("mode"), body.get("horizon"),
+                                 body.get("alpha"), body.get("beta"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(settings)
+
+    @app.route('/liveness', methods=['GET'])
+    def liveness():
+        # Dead nodes and nodes carrying a staleness penalty, with the age of their latest sample
+        return jsonify(core.call(core.liveness_stats))
+
+    @app.route('/checkpoint', methods=['GET'])
+    def get_checkpoint():
+        # Checkpoint file, write counts and what the last restart restored
+        return jsonify(core.checkpoint_stats())
+
+    if pause_event is not None:
+        @app.route('/pause', methods=['POST'])
+        def pause_listener():
+            pause_event.set()
+            return jsonify({"message": "Listener paused"})
+
+        @app.route('/resume', methods=['POST'])
+        def resume_listener():
+            pause_event.clear()
+            return jsonify({"message": "Listener resumed"})
+
+    return app
@@ -0,0 +1,33 @@
+import matplotlib.pyplot as plt
+
+def plot_metrics(core, running=lambda: True):
+    """Live task latency and throughput plots; blocks the calling (main) thread while running()."""
+    plt.ion()
+    fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8))
+
+    while running():
+        # Render from the latest snapshot so ingest is never blocked by drawing
+        snapshot = core.snapshots.current
+
+        # Plot Latency Over Time
+        ax1.clear()
+        if snapshot.latencies:
+            ax1.plot(range(len(snapshot.latencies)), snapshot.latencies, label="Task completion latency (ms)", color='blue')
+            ax1.set_title("Task Completion Latency Over Time")
+            ax1.set_ylabel("Latency (ms)")
+            ax1.legend(loc="upper right")
+            ax1.grid(True)
+
+        # Plot Throughput Over Time
+        ax2.clear()
+        if snapshot.throughput:
+            ax2.plot(range(len(snapshot.throughput)), snapshot.throughput, label="Throughput (tasks/sec)", color='green')
+            ax2.set_title("Task Throughput Over Time")
+            ax2.set_ylabel("Throughput (tasks/sec)")
+            ax2.legend(loc="upper right")
+            ax2.grid(True)
+
+        plt.pause(1)
+
+    plt.ioff()
+    plt.show()
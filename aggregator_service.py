@@ -0,0 +1,270 @@
+"""Headless aggregator service.
+
+central_aggregator_web.py and Zenoh_central_aggregator_web.py open their
+transport and build their Flask app at import, write to a hard-coded CSV
+path and run the matplotlib GUI in the main thread. This entry point runs
+the same AggregatorCore as a service:
+
+- settings come from a JSON config file (--config, keys as in DEFAULTS)
+  and command-line options, which override the file
+- Flask (aggregator_http.py) is only imported with an HTTP port, and
+  matplotlib (aggregator_plot.py) only with --plot
+- after a checkpoint restore (see aggregator_core.py) the criteria,
+  weights, dispatch policy and scoring mode are reset to the config's
+- the transports (dds, zenoh or both; see sharded_aggregation.py) are
+  opened on worker threads while the core restores its checkpoint. With
+  both, tasks for a node go out on the transport its samples came in on
+- every startup phase is timed: the report is printed, served on /startup
+  and exported as aggregator_startup_seconds
+
+Usage:
+    python aggregator_service.py --transport zenoh --csv /var/lib/aggregator/decisions.csv
+    python aggregator_service.py --config service.json --http-port 5000
+    python aggregator_service.py --transport dds zenoh --startup-only
+
+Example config file:
+    {"transports": ["dds"], "criteria": "ALL", "weights": {"CPU": 0.4, "Memory": 0.2},
+     "csv_path": "/var/lib/aggregator/decisions.csv", "http_port": 5000,
+     "core": {"dispatch_policy": "p2c", "in_flight_penalty": 0.05, "liveness_timeout": 30}}
+"""
+import time
+
+_STARTED = time.perf_counter()  # Before the imports below, which are part of startup
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from aggregator_core import CRITERIA_MAP, DEFAULT_WEIGHTS, AggregatorCore
+from sharded_aggregation import TRANSPORTS
+
+DEFAULTS = {
+    "transports": ["zenoh"],
+    "criteria": "CPU",
+    "weights": None,              # Partial weights are merged into DEFAULT_WEIGHTS
+    "csv_path": "optimal_node_data.csv",
+    "capture_directory": None,
+    "checkpoint_path": None,      # None: next to csv_path; "" disables checkpointing
+    "http_host": "127.0.0.1",
+    "http_port": None,            # None: no REST routes, Flask is not imported
+    "plot": False,
+    "core": {},                   # Further AggregatorCore keyword arguments
+}
+
+def load_config(path=None, overrides=None):
+    """DEFAULTS, updated from the JSON file at path, then from overrides (None values are ignored)."""
+    config = json.loads(json.dumps(DEFAULTS))
+    if path is not None:
+        with open(path) as file:
+            loaded = json.load(file)
+        unknown = set(loaded) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown config keys in {path}: {sorted(unknown)}")
+        config.update(loaded)
+    for key, value in (overrides or {}).items():
+        if value is None:
+            continue
+        if key == "core":
+            config["core"].update(value)
+        elif key == "weights":
+            config["weights"] = {**(config["weights"] or {}), **value}
+        else:
+            config[key] = value
+
+    config["criteria"] = CRITERIA_MAP.get(config["criteria"], config["criteria"])
+    if config["criteria"] not in CRITERIA_MAP.values():
+        raise ValueError(f"Unknown criteria {config['criteria']!r}; expected one of {list(CRITERIA_MAP.values())}")
+    unknown = [name for name in config["transports"] if name not in TRANSPORTS]
+    if unknown or not config["transports"]:
+        raise ValueError(f"Unknown transports {unknown}; expected some of {sorted(TRANSPORTS)}")
+    if config["checkpoint_path"] is None:
+        config["checkpoint_path"] = config["csv_path"].rsplit('.', 1)[0] + '_state.ckpt'
+    return config
+
+class AggregatorService:
+    def __init__(self, config):
+        self.config = config
+        self.core = None
+        self.transports = {}       # name -> transport, in config order
+        self.node_transports = {}  # node_id -> transport its samples arrive on (several transports)
+        self.pause_event = threading.Event()
+        self.stopping = threading.Event()
+        self.app = None
+        self.startup = {}          # phase -> seconds
+
+    def _timed(self, phase, fn, *args):
+        started = time.perf_counter()
+        result = fn(*args)
+        self.startup[phase] = time.perf_counter() - started
+        return result
+
+    def start(self):
+        config = self.config
+        started = time.perf_counter()
+        self.startup["imports"] = started - _STARTED
+
+        # Participant creation / session open and checkpoint restore are independent
+        names = config["transports"]
+        with ThreadPoolExecutor(len(names), thread_name_prefix="transport-open") as pool:
+            opening = {name: pool.submit(self._timed, f"transport_{name}", TRANSPORTS[name]) for name in names}
+            self._timed("core", self._create_core)
+            waited = time.perf_counter()
+            for name, future in opening.items():
+                self.transports[name] = future.result()
+            self.startup["transport_wait"] = time.perf_counter() - waited
+
+        self.core.start()
+        self._timed("subscribe", self._subscribe)
+        if config["http_port"] is not None:
+            self._timed("http", self._start_http)
+        self.startup["total"] = time.perf_counter() - _STARTED
+        # Includes interpreter startup, at the OS clock's resolution
+        self.startup["since_process_start"] = time.time() - psutil.Process().create_time()
+        self.core.telemetry.gauge("startup_seconds", "Time from importing the service to ready",
+                                  lambda: self.startup["total"])
+        return self
+
+    def _create_core(self):
+        config, options = self.config, self.config["core"]
+        # Partial weights keep the defaults for the other metrics
+        weights = {**DEFAULT_WEIGHTS, **(config["weights"] or {})}
+        self.core = core = AggregatorCore(self._publish_tasks, config["csv_path"],
+                                          selection_criteria=config["criteria"], weights=weights,
+                                          capture_directory=config["capture_directory"],
+                                          checkpoint_path=config["checkpoint_path"] or None, **options)
+        if core.restore_report is not None:
+            # The checkpoint restores the settings it was taken with; the config decides them
+            core.set_selection_criteria(config["criteria"], weights)
+            core.set_dispatch_policy(options.get("dispatch_policy", "argmin"), options.get("in_flight_penalty", 0.0))
+            forecast = [options.get(key) for key in ("forecast_horizon", "forecast_alpha", "forecast_beta")]
+            core.set_scoring_mode(options.get("scoring_mode", "reactive"), *forecast)
+
+    def _publish_tasks(self, node_id, tasks):
+        transport = self.node_transports.get(node_id)
+        if transport is None:
+            transport = next(iter(self.transports.values()))
+        transport.publish_tasks(node_id, tasks)
+
+    def _subscribe(self):
+        core, paused = self.core, self.pause_event
+        routes = self.node_transports
+        for transport in self.transports.values():
+            if len(self.transports) == 1:
+                def on_sample(fields):
+                    if not paused.is_set():
+                        core.post_sample(fields)
+            else:
+                def on_sample(fields, transport=transport):
+                    if not paused.is_set():
+                        routes[fields[0]] = transport
+                        core.post_sample(fields)
+            transport.subscribe_metrics(on_sample, on_lost=core.post_liveliness_lost)
+            transport.subscribe_acks(core.post_ack)
+
+    def _start_http(self):
+        from aggregator_http import create_app
+        from flask import jsonify
+
+        self.app = create_app(self.core, self.pause_event)
+        self.app.add_url_rule('/startup', 'startup', lambda: jsonify(self.startup_report()))
+        threading.Thread(target=self.app.run, name="aggregator-http", daemon=True,
+                         kwargs={"host": self.config["http_host"], "port": self.config["http_port"],
+                                 "use_reloader": False}).start()
+
+    def startup_report(self):
+        return {"phases": dict(self.startup), "transports": list(self.transports),
+                "restored": self.core.restore_report if self.core is not None else None}
+
+    def run(self):
+        """Block until stop() or a signal; runs the GUI in this thread with plot enabled."""
+        if self.config["plot"]:
+            from aggregator_plot import plot_metrics
+            plot_metrics(self.core, lambda: not self.stopping.is_set())
+        else:
+            self.stopping.wait()
+
+    def stop(self):
+        self.stopping.set()
+        if self.core is not None:
+            self.core.stop()
+        for transport in self.transports.values():
+            transport.close()
+
+def _format_startup(service):
+    phases = service.startup
+    opened = ", ".join(f"{name} {phases[f'transport_{name}'] * 1000:.1f}" for name in service.transports)
+    return (f"Aggregator ready in {phases['total'] * 1000:.1f} ms: imports {phases['imports'] * 1000:.1f}, "
+            f"core {phases['core'] * 1000:.1f}, transports ({opened}; waited "
+            f"{phases['transport_wait'] * 1000:.1f}), subscribe {phases['subscribe'] * 1000:.1f}"
+            + (f", http {phases['http'] * 1000:.1f}" if "http" in phases else "") + " ms; "
+            f"{phases['since_process_start'] * 1000:.0f} ms since process start")
+
+def _weight(text):
+    name, _, value = text.partition("=")
+    if name not in CRITERIA_MAP.values() or name == "ALL" or not value:
+        raise argparse.ArgumentTypeError(f"expected METRIC=WEIGHT with METRIC one of CPU, Memory, Battery, Load; got {text!r}")
+    return name, float(value)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--config", help="JSON config file; options below override it")
+    parser.add_argument("--transport", nargs="+", choices=sorted(TRANSPORTS), dest="transports")
+    parser.add_argument("--criteria", help="CPU, Memory, Battery, Load, ALL (or 1-5)")
+    parser.add_argument("--weight", type=_weight, action="append", help="METRIC=WEIGHT, repeatable")
+    parser.add_argument("--csv", dest="csv_path", help="Decision CSV; the history and checkpoint go next to it")
+    parser.add_argument("--capture-directory", help="Record every sample for trace_replay.py")
+    parser.add_argument("--checkpoint", dest="checkpoint_path", help="State checkpoint file ('' disables)")
+    parser.add_argument("--http-host")
+    parser.add_argument("--http-port", type=int, help="Serve the REST routes on this port")
+    parser.add_argument("--plot", action="store_true", default=None, help="Show the latency/throughput GUI")
+    parser.add_argument("--policy", help="Dispatch policy: argmin, p2c or wrr")
+    parser.add_argument("--penalty", type=float, help="In-flight penalty per task")
+    parser.add_argument("--scoring", choices=["reactive", "predictive"])
+    parser.add_argument("--liveness-timeout", type=float, help="Seconds without a sample before a node is dead")
+    parser.add_argument("--staleness-penalty", type=float, help="Score penalty per staleness interval a sample has aged")
+    parser.add_argument("--startup-only", action="store_true", help="Print the startup report as JSON and exit")
+    args = parser.parse_args()
+
+    core_options = {key: value for key, value in (("dispatch_policy", args.policy), ("in_flight_penalty", args.penalty),
+                                                  ("scoring_mode", args.scoring),
+                                                  ("liveness_timeout", args.liveness_timeout),
+                                                  ("staleness_penalty", args.staleness_penalty)) if value is not None}
+    overrides = {key: getattr(args, key) for key in ("transports", "criteria", "csv_path", "capture_directory",
+                                                     "checkpoint_path", "http_host", "http_port", "plot")}
+    overrides["weights"] = dict(args.weight) if args.weight else None
+    overrides["core"] = core_options
+    try:
+        config = load_config(args.config, overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    service = AggregatorService(config)
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.stopping.set())
+    status = 0
+    try:
+        service.start()
+        print(_format_startup(service), flush=True)
+        if args.startup_only:
+            print(json.dumps(service.startup_report(), indent=2), flush=True)
+        else:
+            service.run()
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        service.stop()
+        sys.stdout.flush()
+        # Transport threads (Zenoh callbacks, DDS listeners) would keep the process alive
+        os._exit(status)
+
+if __name__ == "__main__":
+    main()
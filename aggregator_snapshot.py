@@ -0,0 +1,51 @@
+import time
+from collections import namedtuple
+import numpy as np
+
+AggregatorSnapshot = namedtuple(
+    "AggregatorSnapshot",
+    ["version", "taken_at", "best_node", "optimal_value",
+     "node_ids", "values", "timestamps", "latencies", "throughput"],
+)
+
+class SnapshotPublisher:
+    """Versioned, immutable views of the aggregator state for readers.
+
+    Only the aggregator core's event loop calls publish(). It builds a new
+    AggregatorSnapshot and swaps it into self.current with a single reference
+    assignment, so readers on other threads (plotting, Flask routes,
+    exporters) just read snapshots.current and always see one consistent
+    state.
+
+    The best node, optimal value and the latency/throughput windows are
+    copied on every publish. The registry columns are copied at most every
+    registry_interval seconds (or when full=True) and are shared, read-only,
+    between snapshots in between; the ingest side publishes on idle ticks
+    too, so the copy catches up once traffic stops.
+    """
+
+    def __init__(self, registry, registry_interval=0.5):
+        self.registry = registry
+        self.registry_interval = registry_interval
+        self._registry_copied_at = float('-inf')
+        empty = np.empty((0, registry.values.shape[1]))
+        empty.setflags(write=False)
+        self.current = AggregatorSnapshot(0, time.time(), None, float('inf'), (), empty,
+                                          empty[:, 0], (), ())
+
+    def publish(self, best_node, optimal_value, latencies, throughput, full=False):
+        previous = self.current
+        now = time.time()
+        node_ids, values, timestamps = previous.node_ids, previous.values, previous.timestamps
+        if full or now - self._registry_copied_at >= self.registry_interval:
+            count = len(self.registry)
+            node_ids = tuple(self.registry.node_ids)
+            values = self.registry.values[:count].copy()
+            timestamps = self.registry.timestamps[:count].copy()
+            values.setflags(write=False)
+            timestamps.setflags(write=False)
+            self._registry_copied_at = now
+        self.current = AggregatorSnapshot(previous.version + 1, now, best_node, optimal_value,
+                                          node_ids, values, timestamps,
+                                          tuple(latencies), tuple(throughput))
+        return self.current
@@ -0,0 +1,120 @@
+"""Benchmark: idle CPU and per-sample latency of the DDS receive loops.
+
+Usage: python bench_dds_receive.py [--idle-seconds 5] [--samples 5000] [--rate 2000]
+
+Modes:
+  spin      - the old aggregator loop: reader.take() with no wait (N=1)
+  take_iter - the old node loop: take_iter(), one sample per take()
+  waitset   - dds_receive.BatchedDdsReceiver: WaitSet + take(N)
+
+For each mode the receive loop runs on its own thread. Idle CPU is the
+process CPU time divided by wall time while nothing is published; latency
+is measured from write() to the moment the loop hands the sample over.
+"""
+import argparse
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from cyclonedds.domain import DomainParticipant
+from cyclonedds.pub import Publisher, DataWriter
+from cyclonedds.sub import Subscriber, DataReader
+from cyclonedds.core import Qos, Policy
+from cyclonedds.topic import Topic
+from cyclonedds.idl import IdlStruct
+from cyclonedds.util import duration
+from dds_receive import BatchedDdsReceiver
+
+@dataclass
+class BenchSample(IdlStruct):
+    seq: int
+    sent: float
+
+def spin_loop(reader, stop, deliver, args):
+    while not stop.is_set():
+        for sample in reader.take():
+            deliver(sample)
+
+def take_iter_loop(reader, stop, deliver, args):
+    while not stop.is_set():
+        for sample in reader.take_iter(timeout=duration(seconds=args.timeout)):
+            deliver(sample)
+
+def waitset_loop(reader, stop, deliver, args):
+    receiver = BatchedDdsReceiver(reader, max_batch=args.max_batch, timeout=args.timeout)
+    while not stop.is_set():
+        for sample in receiver.receive():
+            deliver(sample)
+
+MODES = {"spin": spin_loop, "take_iter": take_iter_loop, "waitset": waitset_loop}
+
+def run_mode(participant, mode, args):
+    qos = Qos(Policy.Reliability.Reliable(duration(seconds=1)), Policy.Durability.Volatile,
+              Policy.History.KeepAll)
+    topic = Topic(participant, f"bench_receive_{mode}", BenchSample)
+    reader = DataReader(Subscriber(participant), topic, qos=qos)
+    writer = DataWriter(Publisher(participant), topic, qos=qos)
+
+    latencies = []
+    received = threading.Event()
+    stop = threading.Event()
+
+    def deliver(sample):
+        latencies.append(time.perf_counter() - sample.sent)
+        if len(latencies) == args.samples:
+            received.set()
+
+    thread = threading.Thread(target=MODES[mode], args=(reader, stop, deliver, args), daemon=True)
+    thread.start()
+    time.sleep(0.5)
+
+    # Idle phase: nothing is published
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    time.sleep(args.idle_seconds)
+    idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    # Load phase: publish at a fixed rate
+    interval = 1.0 / args.rate
+    next_send = time.perf_counter()
+    for seq in range(args.samples):
+        writer.write(BenchSample(seq=seq, sent=time.perf_counter()))
+        next_send += interval
+        delay = next_send - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    received.wait(timeout=30)
+    stop.set()
+    thread.join(timeout=args.timeout + 1)
+
+    latencies_us = sorted(latency * 1e6 for latency in latencies)
+    def percentile(q):
+        return latencies_us[min(len(latencies_us) - 1, int(q * len(latencies_us)))] if latencies_us else float('nan')
+    return {
+        "mode": mode,
+        "idle_cpu_pct": idle_cpu * 100,
+        "received": len(latencies_us),
+        "p50_us": percentile(0.50),
+        "p99_us": percentile(0.99),
+        "mean_us": statistics.fmean(latencies_us) if latencies_us else float('nan'),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--samples", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=2000.0, help="samples per second")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=1.0, help="receive timeout in seconds")
+    parser.add_argument("--domain", type=int, default=0)
+    args = parser.parse_args()
+
+    participant = DomainParticipant(args.domain)
+    print(f"{'mode':>10} {'idle CPU %':>11} {'received':>9} {'p50 us':>9} {'p99 us':>9} {'mean us':>9}")
+    for mode in args.modes:
+        result = run_mode(participant, mode, args)
+        print(f"{result['mode']:>10} {result['idle_cpu_pct']:>11.1f} {result['received']:>9} "
+              f"{result['p50_us']:>9.1f} {result['p99_us']:>9.1f} {result['mean_us']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark: dispatch policies replayed on the optimal_node_data CSV traces.
+
+Usage: python bench_dispatch_policies.py [csv ...] [--criteria CPU]
+           [--service-ms 40] [--load 0.7] [--penalty 0.05]
+
+Each CSV row is replayed as a metrics sample from its node followed by one
+task, through the same registry, selector and dispatch policies the
+aggregator uses. Every node runs its tasks one at a time in
+--service-ms, and tasks arrive evenly so the fleet as a whole is --load
+busy. A task's latency is its wait in the node's queue plus its service
+time; the penalty runs release in-flight tasks when they finish.
+"""
+import argparse
+import glob
+
+import numpy as np
+
+from scoring import DEFAULT_WEIGHTS
+from trace_replay import load_trace, replay_exact
+
+def replay(trace, policy_name, penalty, criteria, service_time, interval):
+    # Every sample is followed by one task, evenly spaced
+    samples = len(trace.nodes)
+    chosen, _, latencies = replay_exact(trace, trace.values, np.arange(samples) * interval,
+                                        np.ones(samples, dtype=bool), criteria, DEFAULT_WEIGHTS,
+                                        policy_name, penalty, service_time)
+    counts = np.bincount(chosen)
+    latencies = latencies * 1e3
+    return {
+        "nodes_used": int(np.count_nonzero(counts)),
+        "max_share": counts.max() / samples,
+        "p50": np.percentile(latencies, 50),
+        "p99": np.percentile(latencies, 99),
+        "max": latencies.max(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("csv_files", nargs="*")
+    parser.add_argument("--criteria", default="CPU", choices=["CPU", "Memory", "Battery", "Load", "ALL"])
+    parser.add_argument("--service-ms", type=float, default=40.0)
+    parser.add_argument("--load", type=float, default=0.7)
+    parser.add_argument("--penalty", type=float, default=0.05)
+    args = parser.parse_args()
+    csv_files = args.csv_files or sorted(glob.glob("optimal_node_data*.csv"))
+
+    service_time = args.service_ms / 1e3
+    for path in csv_files:
+        trace = load_trace(path)
+        node_count = len(trace.node_ids)
+        interval = service_time / (node_count * args.load)
+        print(f"\n{path}: {len(trace.nodes)} tasks, {node_count} nodes, criteria={args.criteria}, "
+              f"service={args.service_ms:g} ms, load={args.load:g}")
+        print(f"{'policy':>8} {'penalty':>8} {'nodes':>6} {'max share':>10} "
+              f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9}")
+        for policy_name in ("argmin", "p2c", "wrr"):
+            for penalty in (0.0, args.penalty):
+                result = replay(trace, policy_name, penalty, args.criteria, service_time, interval)
+                print(f"{policy_name:>8} {penalty:>8g} {result['nodes_used']:>6} {result['max_share']:>9.1%} "
+                      f"{result['p50']:>9.1f} {result['p99']:>9.1f} {result['max']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Benchmark: per-node Python scoring vs the vectorized scoring.score_fleet.
+
+Usage: python bench_scoring.py [--sizes 100 10000 1000000] [--criteria ALL]
+
+For each fleet size it scores a random fleet both ways, checks that the
+scores and the selected node are identical, and prints the timings.
+"""
+import argparse
+import time
+import numpy as np
+from node_registry import NodeRecord
+import scoring
+
+def random_fleet(size, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.empty((size, 4), dtype=np.float64)
+    values[:, 0] = rng.uniform(0, 100, size).astype(np.float32)   # CPU (%)
+    values[:, 1] = rng.uniform(0, 100, size).astype(np.float32)   # Memory (%)
+    values[:, 2] = rng.uniform(0, 100, size).astype(np.float32)   # Battery (%)
+    values[:, 3] = rng.uniform(0, 8, size).astype(np.float32)     # Load average
+    return values
+
+def score_per_node(records, criteria):
+    node_scores = {record.node_id: scoring.calculate_score(record, criteria, scoring.DEFAULT_WEIGHTS) for record in records}
+    best_node_id = min(node_scores, key=node_scores.get)
+    return node_scores, best_node_id
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 1_000_000])
+    parser.add_argument("--criteria", default="ALL", choices=["CPU", "Memory", "Battery", "Load", "ALL"])
+    args = parser.parse_args()
+
+    print(f"criteria={args.criteria}")
+    print(f"{'nodes':>10} {'python (ms)':>12} {'numpy (ms)':>12} {'speedup':>9}")
+    for size in args.sizes:
+        values = random_fleet(size)
+        records = [NodeRecord(f"node_{i}", *row, 0.0) for i, row in enumerate(values.tolist())]
+        repeat = 5 if size <= 10_000 else 1
+
+        python_time, (node_scores, best_node_id) = best_of(lambda: score_per_node(records, args.criteria), repeat)
+        numpy_time, (scores, best) = best_of(lambda: scoring.score_fleet(values, args.criteria, scoring.DEFAULT_WEIGHTS), repeat * 4)
+
+        # The vectorized engine must reproduce the per-node numbers exactly
+        assert scores.tolist() == list(node_scores.values()), "score mismatch"
+        assert records[best].node_id == best_node_id, "argmin mismatch"
+
+        print(f"{size:>10} {python_time * 1e3:>12.3f} {numpy_time * 1e3:>12.3f} {python_time / numpy_time:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Benchmark: end-to-end DDS vs Zenoh, aggregator and simulated fleet on localhost.
+
+Usage: python bench_transport.py [--transports dds zenoh] [--nodes 100 1000]
+           [--rates 1] [--payloads 16 1024] [--task-rate 200]
+           [--duration 10] [--warmup 3] [--output bench_transport_results.json]
+
+Every combination of transport, node count, per-node publish rate
+(samples/s) and task payload size (bytes) runs the real aggregator module
+(central_aggregator_web or Zenoh_central_aggregator_web, without Flask or
+the plot) in one process and a fleet_simulator fleet in another, so both
+stacks talk over loopback in their default peer setup, with no Zenoh router.
+The aggregator submits --task-rate tasks/s, and the virtual nodes
+acknowledge them immediately.
+
+Per run, --warmup seconds after both sides have started, the results record:
+  ingest throughput     samples/s ingested by the core (vs. published by the fleet)
+  decision latency      node publish -> decision that scored the sample (p50/p99)
+  task delivery latency submit -> dispatch -> node -> ack back (p50/p99)
+  CPU and RSS           of the aggregator and the fleet process
+The results are printed and written as JSON for regression tracking.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import psutil
+
+AGGREGATOR_MODULES = {"dds": "central_aggregator_web", "zenoh": "Zenoh_central_aggregator_web"}
+
+def process_usage(process, cpu_before, elapsed):
+    cpu_after = process.cpu_times()
+    cpu = (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system)
+    return {"cpu_percent": 100.0 * cpu / elapsed, "rss_mb": process.memory_info().rss / 2**20}
+
+def run_aggregator(args):
+    import importlib
+
+    module = importlib.import_module(AGGREGATOR_MODULES[args.transport])
+    core = module.core
+    # Keep the benchmark's decisions out of the configured CSV and history
+    core.csv_log.path = os.path.join(args.workdir, "optimal_node_data.csv")
+    core.decision_history.directory = os.path.join(args.workdir, "optimal_node_data_history")
+    core.checkpoint_path = os.path.join(args.workdir, "optimal_node_data_state.ckpt")
+    core.decision_task = None
+    core.start()
+    if args.transport == "dds":
+        threading.Thread(target=module.dds_listener, daemon=True).start()
+        threading.Thread(target=module.ack_listener, daemon=True).start()
+
+    stop = threading.Event()
+    task = "x" * args.payload
+
+    def submit_tasks():
+        # Not before the fleet is up, or the backlog goes out in one burst
+        time.sleep(max(0.0, args.start_at - time.time()))
+        interval = 1.0 / args.task_rate
+        next_at = time.monotonic()
+        while not stop.is_set():
+            core.submit_task(task)
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+
+    if args.task_rate > 0:
+        threading.Thread(target=submit_tasks, daemon=True).start()
+    time.sleep(max(0.0, args.start_at + args.warmup - time.time()))
+
+    # Measurement window
+    process = psutil.Process()
+    for histogram in (core.decision_latency, core.task_latency):
+        core.call(histogram.reset)
+    samples, completed, cpu_before = core.samples_total.value, core.tasks_completed.value, process.cpu_times()
+    started = time.monotonic()
+    time.sleep(args.duration)
+    elapsed = time.monotonic() - started
+    result = {
+        "ingest_per_s": (core.samples_total.value - samples) / elapsed,
+        "tasks_completed_per_s": (core.tasks_completed.value - completed) / elapsed,
+        "decision_p50_ms": core.decision_latency.percentile(0.5) * 1e3,
+        "decision_p99_ms": core.decision_latency.percentile(0.99) * 1e3,
+        "task_delivery_p50_ms": core.task_latency.percentile(0.5) * 1e3,
+        "task_delivery_p99_ms": core.task_latency.percentile(0.99) * 1e3,
+        "inbox_dropped": core.inbox.dropped,
+        "tasks_timed_out": core.tasks_timed_out.value,
+    }
+    result.update({f"aggregator_{key}": value for key, value in process_usage(process, cpu_before, elapsed).items()})
+    stop.set()
+    return result
+
+def run_fleet(args):
+    import fleet_simulator
+
+    simulator = fleet_simulator.FleetSimulator(
+        fleet_simulator.TRANSPORTS[args.transport](), fleet_simulator.SyntheticMetrics(args.seed),
+        args.nodes, interval=1.0 / args.rate, prefix="bench", service_time=1e-6, seed=args.seed, tick=0.001)
+    threading.Thread(target=simulator.run, kwargs={"report_interval": float('inf')}, daemon=True).start()
+    time.sleep(max(0.0, args.start_at + args.warmup - time.time()))
+
+    process = psutil.Process()
+    published, cpu_before = simulator.published, process.cpu_times()
+    started = time.monotonic()
+    time.sleep(args.duration)
+    elapsed = time.monotonic() - started
+    result = {"published_per_s": (simulator.published - published) / elapsed}
+    result.update({f"fleet_{key}": value for key, value in process_usage(process, cpu_before, elapsed).items()})
+    return result
+
+def run_role(args):
+    # The aggregator prints every decision; only the result file matters here
+    sys.stdout = open(os.devnull, "w")
+    result = (run_aggregator if args.role == "aggregator" else run_fleet)(args)
+    with open(args.result + ".tmp", "w") as file:
+        json.dump(result, file)
+    os.replace(args.result + ".tmp", args.result)
+    if args.role == "fleet":
+        # Keep publishing until the aggregator's window is over too; the parent kills us
+        time.sleep(args.duration + 60)
+    # Transport threads (Zenoh callbacks, DDS listeners) would keep the process alive
+    os._exit(0)
+
+def run_config(run, transport, nodes, rate, payload, args, workdir):
+    # Both sides measure the same wall-clock window, however long their imports take
+    start_at = time.time() + args.startup
+    common = ["--transport", transport, "--nodes", str(nodes), "--rate", str(rate), "--payload", str(payload),
+              "--task-rate", str(args.task_rate), "--duration", str(args.duration), "--warmup", str(args.warmup),
+              "--seed", str(args.seed), "--workdir", workdir, "--start-at", repr(start_at)]
+    # A fresh DDS domain per run: readers and writers of the previous run's killed
+    # processes stay matched until their lease expires and would block reliable writes
+    env = dict(os.environ)
+    domain = f'<CycloneDDS><Domain id="{1 + run % 200}"/></CycloneDDS>'
+    env["CYCLONEDDS_URI"] = f'{env["CYCLONEDDS_URI"]},{domain}' if env.get("CYCLONEDDS_URI") else domain
+    results = {}
+    children = []
+    for role in ("aggregator", "fleet"):
+        result_path = os.path.join(workdir, f"{role}.json")
+        command = [sys.executable, os.path.abspath(__file__), "--role", role, "--result", result_path] + common
+        children.append((role, result_path, subprocess.Popen(command, env=env)))
+    deadline = start_at + args.warmup + args.duration + 60
+    for role, result_path, child in children:
+        # The fleet only stops when killed, after the aggregator is done
+        while not os.path.exists(result_path) and child.poll() is None and time.time() < deadline:
+            time.sleep(0.1)
+        if role == "aggregator":
+            try:
+                child.wait(max(0.0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                pass
+        child.kill()
+        child.wait()
+        if os.path.exists(result_path):
+            with open(result_path) as file:
+                results.update(json.load(file))
+            os.remove(result_path)
+        else:
+            results[f"{role}_error"] = f"exit code {child.returncode}"
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transports", nargs="+", default=["dds", "zenoh"], choices=sorted(AGGREGATOR_MODULES))
+    parser.add_argument("--nodes", nargs="+", type=int, default=[100, 1000])
+    parser.add_argument("--rates", nargs="+", type=float, default=[1.0], help="Samples per second per node")
+    parser.add_argument("--payloads", nargs="+", type=int, default=[16, 1024], help="Task payload bytes")
+    parser.add_argument("--task-rate", type=float, default=200.0, help="Tasks submitted per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--startup", type=float, default=5.0, help="Seconds allowed for both sides to start")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_transport_results.json")
+    # Internal: one side of a run
+    parser.add_argument("--role", choices=["aggregator", "fleet"], help=argparse.SUPPRESS)
+    parser.add_argument("--transport", help=argparse.SUPPRESS)
+    parser.add_argument("--rate", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--payload", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.role:
+        if isinstance(args.nodes, list):
+            args.nodes = args.nodes[0]
+        run_role(args)
+
+    started = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    runs = []
+    print(f"{'transport':>9} {'nodes':>6} {'rate':>5} {'payload':>7} {'published/s':>11} {'ingest/s':>9} "
+          f"{'decision p50/p99 (ms)':>21} {'task p50/p99 (ms)':>17} {'agg CPU%':>8} {'agg MB':>7} "
+          f"{'fleet CPU%':>10} {'fleet MB':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        configs = itertools.product(args.transports, args.nodes, args.rates, args.payloads)
+        for run, (transport, nodes, rate, payload) in enumerate(configs):
+            result = run_config(run, transport, nodes, rate, payload, args, workdir)
+            runs.append(dict(transport=transport, nodes=nodes, rate=rate, payload=payload, **result))
+            if "aggregator_error" in result or "fleet_error" in result:
+                print(f"{transport:>9} {nodes:>6} {rate:>5g} {payload:>7} failed: {result}")
+                continue
+            print(f"{transport:>9} {nodes:>6} {rate:>5g} {payload:>7} {result['published_per_s']:>11.0f} "
+                  f"{result['ingest_per_s']:>9.0f} "
+                  f"{result['decision_p50_ms']:>10.1f}/{result['decision_p99_ms']:<10.1f} "
+                  f"{result['task_delivery_p50_ms']:>8.1f}/{result['task_delivery_p99_ms']:<8.1f} "
+                  f"{result['aggregator_cpu_percent']:>8.0f} {result['aggregator_rss_mb']:>7.0f} "
+                  f"{result['fleet_cpu_percent']:>10.0f} {result['fleet_rss_mb']:>8.0f}")
+
+    with open(args.output, "w") as file:
+        json.dump({
+            "started": started,
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "settings": {"task_rate": args.task_rate, "duration": args.duration, "warmup": args.warmup, "seed": args.seed},
+            "runs": runs,
+        }, file, indent=2)
+    print(f"Wrote {len(runs)} runs to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: encode/decode throughput and payload size of the wire codecs.
+
+Usage: python bench_wire_codec.py [--messages 200000] [--nodes 1000] [--batch-size 8]
+
+Covers the payloads the Zenoh aggregator and nodes exchange: metrics,
+task batches (--batch-size tasks each) and task acks (one completed task,
+as nodes send them). Payloads are decoded through the module-level
+wire_codec.decode_*() functions, i.e. with the same encoding detection the
+Zenoh aggregator uses.
+"""
+import argparse
+import random
+import time
+import wire_codec
+
+def make_samples(messages, nodes, seed=0):
+    rng = random.Random(seed)
+    return [(f"node_{rng.randrange(nodes)}", rng.uniform(0, 100), rng.uniform(0, 100),
+             rng.uniform(0, 100), rng.uniform(0, 8), time.time()) for _ in range(messages)]
+
+def measure(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=8, help="Tasks per task batch")
+    args = parser.parse_args()
+
+    samples = make_samples(args.messages, args.nodes)
+    batch_count = max(1, args.messages // args.batch_size)
+    batches = [(sample[0], [(i * args.batch_size + j, "Perform task") for j in range(args.batch_size)])
+               for i, sample in enumerate(samples[:batch_count])]
+    acks = [(sample[0], [i], sample[5]) for i, sample in enumerate(samples)]
+
+    print(f"{'codec':>7} {'metrics B':>10} {'batch B':>8} {'ack B':>6} {'enc metrics/s':>14} {'dec metrics/s':>14} "
+          f"{'enc batch/s':>12} {'dec batch/s':>12} {'enc ack/s':>11} {'dec ack/s':>11}")
+    for name, codec in wire_codec.CODECS.items():
+        encoded = [codec.encode_metrics(*sample) for sample in samples]
+        encoded_batches = [codec.encode_task_batch(*batch) for batch in batches]
+        encoded_acks = [codec.encode_task_ack(*ack) for ack in acks]
+        metrics_size = sum(map(len, encoded)) / len(encoded)
+        batch_size = sum(map(len, encoded_batches)) / len(encoded_batches)
+        ack_size = sum(map(len, encoded_acks)) / len(encoded_acks)
+
+        encode_rate = measure(lambda sample: codec.encode_metrics(*sample), samples)
+        decode_rate = measure(wire_codec.decode_metrics, encoded)
+        encode_batch_rate = measure(lambda batch: codec.encode_task_batch(*batch), batches)
+        decode_batch_rate = measure(wire_codec.decode_task_batch, encoded_batches)
+        encode_ack_rate = measure(lambda ack: codec.encode_task_ack(*ack), acks)
+        decode_ack_rate = measure(wire_codec.decode_task_ack, encoded_acks)
+
+        print(f"{name:>7} {metrics_size:>10.1f} {batch_size:>8.1f} {ack_size:>6.1f} {encode_rate:>14,.0f} "
+              f"{decode_rate:>14,.0f} {encode_batch_rate:>12,.0f} {decode_batch_rate:>12,.0f} "
+              f"{encode_ack_rate:>11,.0f} {decode_ack_rate:>11,.0f}")
+
+if __name__ == "__main__":
+    main()
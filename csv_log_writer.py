@@ -0,0 +1,186 @@
+import csv
+import os
+import queue
+import threading
+import time
+import traceback
+
+class _FlushRequest:
+    def __init__(self, fsync):
+        self.fsync = fsync
+        self.done = threading.Event()
+
+_STOP = object()
+
+class BatchedCsvWriter:
+    """Append rows to a CSV file from a background thread.
+
+    submit() only enqueues the row on a bounded queue, so callers on the
+    receive path never touch the file. The writer thread drains the queue in
+    batches of up to batch_size rows, flushes the file once batch_size rows
+    are buffered or flush_interval seconds have passed, and rotates the file
+    to path.1 ... path.<backup_count> once it grows past max_bytes. fsync is
+    only done when flush(fsync=True) is called.
+
+    If the queue is full, or writing a batch fails, the rows are dropped and
+    counted in dropped_rows. A failed rotation is counted in rotation_errors;
+    the file keeps growing until the next rotation succeeds.
+    write_histogram, if given, records how long each batch write takes.
+    """
+
+    def __init__(self, path, max_queue=10000, batch_size=256, flush_interval=1.0,
+                 max_bytes=64 * 1024 * 1024, backup_count=5, write_histogram=None):
+        self.path = path
+        self.write_histogram = write_histogram
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=max_queue)
+
+        # Counters
+        self.rows_written = 0
+        self.dropped_rows = 0
+        self.batches_written = 0
+        self.rotations = 0
+        self.rotation_errors = 0
+
+        self._file = None
+        self._writer = None
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="csv-log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "rows_written": self.rows_written,
+            "dropped_rows": self.dropped_rows,
+            "batches_written": self.batches_written,
+            "rotations": self.rotations,
+            "rotation_errors": self.rotation_errors,
+        }
+
+    def submit(self, row):
+        """Queue one row for writing. Returns False if it had to be dropped."""
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped_rows += 1
+            return False
+
+    def flush(self, fsync=False, timeout=None):
+        """Write out everything queued so far; optionally fsync the file."""
+        request = _FlushRequest(fsync)
+        self.queue.put(request)
+        return request.done.wait(timeout)
+
+    def close(self, timeout=None):
+        self.queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # Writer thread
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_if_due()
+                continue
+
+            batch = []
+            while True:
+                if item is _STOP:
+                    self._write_batch(batch)
+                    self._flush()
+                    self._close_file()
+                    return
+                if isinstance(item, _FlushRequest):
+                    self._write_batch(batch)
+                    batch = []
+                    self._flush(item.fsync)
+                    item.done.set()
+                else:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+            self._flush_if_due()
+
+    def _open_file(self):
+        self._file = open(self.path, mode='a', newline='')
+        self._writer = csv.writer(self._file)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = self._writer = None
+
+    def _write_batch(self, batch):
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            if self._file is None:
+                self._open_file()
+            self._writer.writerows(batch)
+        except Exception as e:
+            self.dropped_rows += len(batch)
+            print(f"Error writing CSV log {self.path}: {e}")
+            traceback.print_exc()
+            return
+        self.rows_written += len(batch)
+        self.batches_written += 1
+        self._unflushed += len(batch)
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            # The rows are already in the file; a failed rotation loses none of them
+            try:
+                self._rotate()
+            except Exception as e:
+                self.rotation_errors += 1
+                print(f"Error rotating CSV log {self.path}: {e}")
+                traceback.print_exc()
+        if self.write_histogram is not None:
+            self.write_histogram.record(time.perf_counter() - start)
+
+    def _flush_if_due(self):
+        if self._unflushed >= self.batch_size or (
+                self._unflushed and time.monotonic() - self._last_flush >= self.flush_interval):
+            self._flush()
+
+    def _flush(self, fsync=False):
+        self._last_flush = time.monotonic()
+        if self._file is None:
+            return
+        try:
+            self._file.flush()
+            if fsync:
+                os.fsync(self._file.fileno())
+            self._unflushed = 0
+        except Exception as e:
+            print(f"Error flushing CSV log {self.path}: {e}")
+            traceback.print_exc()
+
+    def _rotate(self):
+        self._flush()
+        self._close_file()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
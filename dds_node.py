@@ -0,0 +1,168 @@
+"""DDS node: publishes this host's metrics and runs the tasks assigned to it.
+
+node1.py, node2.py and node3.py start one NodeSimulator each with a live
+metrics plot; fleet_simulator.py hosts many virtual nodes per process
+instead.
+"""
+import time
+import threading
+from cyclonedds.domain import DomainParticipant
+from cyclonedds.pub import DataWriter, Publisher
+from cyclonedds.sub import DataReader, Subscriber
+from cyclonedds.core import Qos, Policy
+from cyclonedds.topic import Topic
+import matplotlib.pyplot as plt
+from collections import deque
+from dds_receive import BatchedDdsReceiver
+from dds_types import (nodeMetrics, TaskBatch, TaskAck, METRICS_TOPIC, METRICS_QOS, TASK_TOPIC, ACK_TOPIC,
+                       metrics_partition, task_partition)
+from metrics_sampler import MetricsSampler, read_system_metrics
+from task_executor import NodeTaskExecutor
+
+class NodeSimulator:
+    def __init__(self, node_id, max_batch_size=64, receive_timeout=1.0, max_workers=None, max_queue=None,
+                 sample_interval=0.25, heartbeat_interval=60.0) -> None:
+        self.node_id = node_id
+        self.plot_label = node_id.replace("_", "").upper()  # node_1 -> NODE1
+        self.max_batch_size = max_batch_size
+        self.receive_timeout = receive_timeout
+        print(f"Initializing DDS Participant for node {self.node_id}")
+
+        self.participant = DomainParticipant(domain_id=0)
+
+        # Metrics publisher, in this node's shard partition (see dds_types.metrics_partition)
+        self.metrics_topic = Topic(self.participant, METRICS_TOPIC, nodeMetrics)
+        metrics_publisher = Publisher(self.participant, qos=Qos(Policy.Partition([metrics_partition(self.node_id)])))
+        self.metrics_writer = DataWriter(metrics_publisher, self.metrics_topic,  qos=METRICS_QOS)
+
+        # Task subscriber in this node's partition: the aggregator writes each batch
+        # in its target node's partition, so only this node's batches arrive
+        self.task_topic = Topic(self.participant, TASK_TOPIC, TaskBatch)
+        self.task_subscriber = Subscriber(self.participant, qos=Qos(Policy.Partition([task_partition(self.node_id)])))
+        self.task_reader = DataReader(self.task_subscriber, self.task_topic,  qos=Qos(Policy.Reliability.Reliable(1),Policy.Durability.Volatile,Policy.History.KeepAll))
+
+        # Completion acks back to the aggregator
+        self.ack_topic = Topic(self.participant, ACK_TOPIC, TaskAck)
+        self.ack_writer = DataWriter(Publisher(self.participant), self.ack_topic,  qos=Qos(Policy.Reliability.Reliable(1),Policy.Durability.Volatile,Policy.History.KeepAll))
+
+        # Tasks run in a process pool (one worker per core) with a bounded queue
+        self.executor = NodeTaskExecutor(self.report_completion, max_workers, max_queue,
+                                         on_saturation_change=self.report_saturation)
+
+        # Background psutil sampler; publishes smoothed metrics on significant change, else every heartbeat
+        self.sampler = MetricsSampler(self.publish_metrics, poll_interval=sample_interval,
+                                      heartbeat_interval=heartbeat_interval)
+
+        # Data for plotting
+        self.cpu_load_data = deque(maxlen=30)
+        self.memory_usage_data = deque(maxlen=30)
+        self.battery_level_data = deque(maxlen=30)
+        self.load_avg_data = deque(maxlen=30)
+
+        # Start metrics sampling and the task handling thread
+        self.sampler.start()
+        threading.Thread(target=self.listen_for_task_assignments, daemon=True).start()
+
+    def publish_metrics(self, cpu_load, memory_usage, battery_level, load_avg, timestamp):
+        """Publishes smoothed metrics from this node (called from the sampler)."""
+        metrics = self.make_metrics(cpu_load, memory_usage, battery_level, load_avg, timestamp)
+        self.metrics_writer.write(metrics)
+        print(f"Node {self.node_id} sent metrics: {metrics}")
+
+    def listen_for_task_assignments(self):
+        """Listens for task assignments from the aggregator."""
+        print(f"Node {self.node_id} listening for task assignments...")
+        # Block on a WaitSet and take tasks in batches instead of spinning on take_iter()
+        receiver = BatchedDdsReceiver(self.task_reader, max_batch=self.max_batch_size, timeout=self.receive_timeout)
+        while True:
+            for batch in receiver.receive():
+                rejected = []
+                for task_id, task in zip(batch.task_ids, batch.tasks):
+                    print(f"Node {self.node_id} received task: {task}")
+                    if not self.executor.submit(task_id, task):
+                        rejected.append(task_id)
+                if rejected:
+                    # Queue full; the aggregator requeues these for other nodes
+                    print(f"Node {self.node_id} rejected tasks {rejected}: queue full")
+                    self.ack_writer.write(TaskAck(node_id=self.node_id, task_ids=[], completed_at=time.time(), rejected_task_ids=rejected))
+
+    def report_completion(self, task_id, known_task):
+        """Acknowledge a finished task (called from the executor)."""
+        if not known_task:
+            print(f"Node {self.node_id} received unknown task type for task {task_id}")
+        self.ack_writer.write(TaskAck(node_id=self.node_id, task_ids=[task_id], completed_at=time.time()))
+
+    def report_saturation(self, saturated):
+        """Republish the latest metrics as soon as the task queue fills up or frees up."""
+        print(f"Node {self.node_id} task queue {'full' if saturated else 'has room again'}")
+        self.sampler.publish_now()
+
+    def make_metrics(self, cpu_load, memory_usage, battery_level, load_avg, timestamp):
+        return nodeMetrics(
+            cpu_load=cpu_load,
+            memory_usage=memory_usage,
+            battery_level=battery_level,
+            load_avg=load_avg,
+            node_id=self.node_id,
+            timestamp=timestamp,
+            running_tasks=self.executor.running_tasks,
+            queue_length=self.executor.queue_length,
+            task_capacity=self.executor.task_capacity
+        )
+
+    def get_system_metrics(self):
+        """Latest smoothed system metrics from the sampler; never blocks."""
+        values = self.sampler.latest() or read_system_metrics()
+        return self.make_metrics(*values, time.time())
+
+    def update_plot(self):
+        """Update the plot with the latest metrics."""
+        plt.clf()  # Clear the current figure
+        
+        # Plot the metrics
+        plt.subplot(2, 2, 1)
+        plt.plot(self.cpu_load_data)
+        plt.title(f'CPU Load {self.plot_label}(%)')
+        
+        plt.subplot(2, 2, 2)
+        plt.plot(self.memory_usage_data)
+        plt.title(f'Memory Usage {self.plot_label} (%)')
+        
+        plt.subplot(2, 2, 3)
+        plt.plot(self.battery_level_data)
+        plt.title(f'Battery Level {self.plot_label} (%)')
+        
+        plt.subplot(2, 2, 4)
+        plt.plot(self.load_avg_data)
+        plt.title(f'Load Average {self.plot_label} ')
+        
+        plt.tight_layout()
+        plt.draw()
+        plt.pause(1)  # Pause to allow for real-time updating
+
+    def simulate_metrics(self):
+        """Updates the plot with the smoothed metrics; the sampler does the publishing."""
+        while True:
+            metrics = self.get_system_metrics()
+
+            # Update data for plotting
+            self.cpu_load_data.append(metrics.cpu_load)
+            self.memory_usage_data.append(metrics.memory_usage)
+            self.battery_level_data.append(metrics.battery_level)
+            self.load_avg_data.append(metrics.load_avg)
+            
+            # Update the plot in the main thread
+            self.update_plot()
+
+            time.sleep(60)  # Update plot every 60 seconds
+
+def run_with_plot(node_id):
+    """Run a node with the live metrics plot in the main thread."""
+    # Set up the plot
+    plt.ion()  # Interactive mode on
+    plt.figure(figsize=(10, 8))
+
+    node = NodeSimulator(node_id)
+
+    # Start the metrics simulation and task handling in the main thread
+    node.simulate_metrics()
@@ -0,0 +1,36 @@
+from cyclonedds.core import WaitSet, ReadCondition, SampleState, ViewState, InstanceState
+from cyclonedds.internal import InvalidSample
+from cyclonedds.util import duration
+
+class BatchedDdsReceiver:
+    """Blocking, batched receive on a DataReader.
+
+    receive() parks the calling thread on a WaitSet until the reader has
+    unread samples (or timeout seconds pass) and then takes up to max_batch
+    samples in a single take() call. The thread uses no CPU while idle.
+    Invalid samples (disposes/unregisters) are dropped; with on_not_alive,
+    those of instances that are no longer alive (disposed, or no live
+    writer, e.g. after a liveliness lease expired) are passed to
+    on_not_alive(key_sample), whose key fields identify the instance.
+    """
+
+    def __init__(self, reader, max_batch=256, timeout=1.0, on_not_alive=None):
+        self.reader = reader
+        self.on_not_alive = on_not_alive
+        self.max_batch = max_batch
+        self.timeout = duration(seconds=timeout)
+        self.condition = ReadCondition(reader, SampleState.NotRead | ViewState.Any | InstanceState.Any)
+        self.waitset = WaitSet(reader.participant)
+        self.waitset.attach(self.condition)
+
+    def receive(self):
+        """Return the next batch of valid samples; empty after a timeout."""
+        if self.waitset.wait(self.timeout) == 0:
+            return []
+        samples = self.reader.take(N=self.max_batch, condition=self.condition)
+        valid = [sample for sample in samples if not isinstance(sample, InvalidSample)]
+        if self.on_not_alive is not None and len(valid) < len(samples):
+            for sample in samples:
+                if isinstance(sample, InvalidSample) and sample.sample_info.instance_state != InstanceState.Alive:
+                    self.on_not_alive(sample.key_sample)
+        return valid
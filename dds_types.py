@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from cyclonedds.core import Policy, Qos
+from cyclonedds.idl import IdlStruct
+from cyclonedds.idl.annotations import key
+from cyclonedds.idl.types import float32, sequence, uint16, uint32, uint64
+from cyclonedds.util import duration
+from node_sharding import bucket_of, shard_buckets
+
+# Shared DDS data structures (see NodeMetricsModule.idl.i). The aggregator and
+# the nodes must use the same type names and keys to match on the wire.
+
+# DDS topic names
+METRICS_TOPIC = "node_metrics"
+TASK_TOPIC = "task_batches"
+ACK_TOPIC = "task_acks"
+SUMMARY_TOPIC = "region_summaries"
+
+# QoS of metrics writers and readers alike: each writer keeps the latest sample
+# of each of its nodes (TransientLocal, KeepLast(1)) and delivers it to readers
+# that join later, so a restarted aggregator hears from every live node at once
+# instead of waiting for its next report. Durability must match on both sides:
+# a TransientLocal reader does not match a Volatile writer. Liveliness is
+# asserted by the middleware while the node process runs; when a node crashes
+# or disconnects, readers see its instances go not-alive within
+# METRICS_LEASE seconds (see BatchedDdsReceiver's on_not_alive).
+METRICS_LEASE = 5.0
+METRICS_QOS = Qos(Policy.Reliability.Reliable(1), Policy.Durability.TransientLocal, Policy.History.KeepLast(1),
+                  Policy.Liveliness.Automatic(duration(seconds=METRICS_LEASE)))
+
+# Metrics are written in the partition of the node's shard bucket (see
+# node_sharding.py), so a regional aggregator of a hash-sharded deployment
+# joins shard_metrics_partitions() and receives only its shard's samples.
+# Readers of the whole fleet join ALL_METRICS_PARTITIONS.
+ALL_METRICS_PARTITIONS = ["metrics/*"]
+
+def bucket_partition(bucket):
+    return f"metrics/{bucket}"
+
+def metrics_partition(node_id):
+    return bucket_partition(bucket_of(node_id))
+
+def shard_metrics_partitions(shard, shards):
+    return [bucket_partition(bucket) for bucket in shard_buckets(shard, shards)]
+
+# Node metrics, one instance per node
+@dataclass
+class nodeMetrics(IdlStruct, typename="NodeMetricsModule::nodeMetrics"):
+    cpu_load: float32
+    memory_usage: float32
+    battery_level: float32
+    load_avg: float32
+    node_id: str
+    timestamp: float
+    # Node task executor (see task_executor.py): tasks running, tasks queued, and
+    # how many tasks the node accepts at once (workers + queue; 0 if not reported)
+    running_tasks: uint16 = 0
+    queue_length: uint16 = 0
+    task_capacity: uint16 = 0
+    key("node_id")
+
+# Task batches are written in the partition of the node they are for, and a
+# node's subscriber joins only its own partition, so the middleware delivers
+# each batch to its node instead of to every node. Subscriber partitions may
+# use wildcards: fleet_simulator.py joins task_partition(f"{prefix}_*").
+def task_partition(node_id):
+    return f"tasks/{node_id}"
+
+# Tasks assigned to one node in a scheduling round; task_ids[i] identifies tasks[i]
+@dataclass
+class TaskBatch(IdlStruct, typename="NodeMetricsModule::TaskBatch"):
+    node_id: str
+    task_ids: sequence[uint64]
+    tasks: sequence[str]
+    key("node_id")
+
+# Completion report sent back by the node; rejected_task_ids were refused
+# because the node's task queue was full and can be dispatched elsewhere
+@dataclass
+class TaskAck(IdlStruct, typename="NodeMetricsModule::TaskAck"):
+    node_id: str
+    task_ids: sequence[uint64]
+    completed_at: float
+    rejected_task_ids: sequence[uint64] = ()
+    key("node_id")
+
+# Top-k candidates of a regional aggregator (sharded_aggregation.py), one
+# instance per region; candidate i is node_ids[i] with cpu_load[i], ...
+@dataclass
+class RegionSummary(IdlStruct, typename="NodeMetricsModule::RegionSummary"):
+    region: str
+    node_count: uint32  # Nodes in the region's shard, candidates or not
+    node_ids: sequence[str]
+    cpu_load: sequence[float32]
+    memory_usage: sequence[float32]
+    battery_level: sequence[float32]
+    load_avg: sequence[float32]
+    timestamps: sequence[float]
+    running_tasks: sequence[uint16]
+    queue_length: sequence[uint16]
+    task_capacity: sequence[uint16]
+    key("region")
@@ -0,0 +1,200 @@
+"""Append-only columnar store of aggregator decisions.
+
+A store is a directory with one raw little-endian file per column plus a
+node dictionary (nodes.txt, one node id per line; the line number is the
+code stored in the node column):
+
+    node.i4  score.f8  cpu_load.f4  memory_usage.f4  battery_level.f4
+    load_avg.f4  timestamp.f8  nodes.txt
+
+Columns are plain arrays, so open_history() maps them straight into NumPy
+with np.memmap and no parsing. Imported CSV rows have no timestamp and get
+NaN.
+
+Usage:
+    python decision_history.py import <store_dir> optimal_node_data_Test1.csv ...
+    python decision_history.py summary <store_dir>
+"""
+import argparse
+import csv
+import os
+import numpy as np
+
+COLUMNS = {
+    "node": np.dtype("<i4"),
+    "score": np.dtype("<f8"),
+    "cpu_load": np.dtype("<f4"),
+    "memory_usage": np.dtype("<f4"),
+    "battery_level": np.dtype("<f4"),
+    "load_avg": np.dtype("<f4"),
+    "timestamp": np.dtype("<f8"),
+}
+NODES_FILE = "nodes.txt"
+
+def _column_path(directory, name):
+    return os.path.join(directory, f"{name}.{COLUMNS[name].kind}{COLUMNS[name].itemsize}")
+
+def _load_node_ids(directory):
+    path = os.path.join(directory, NODES_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path) as file:
+        return file.read().splitlines()
+
+def _row_count(directory):
+    counts = []
+    for name, dtype in COLUMNS.items():
+        path = _column_path(directory, name)
+        counts.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+    return min(counts)
+
+class DecisionHistory:
+    """Writer side of the store.
+
+    append() copies a decision into preallocated in-memory column chunks;
+    the chunk is written to the column files once chunk_rows decisions have
+    accumulated (or on flush()/close()), so the caller pays for file I/O
+    once per chunk rather than once per decision.
+    """
+
+    def __init__(self, directory, chunk_rows=1024):
+        self.directory = directory
+        self.node_ids = _load_node_ids(directory)
+        self.codes = {node_id: code for code, node_id in enumerate(self.node_ids)}
+        self._saved_nodes = len(self.node_ids)
+
+        # Drop a partially written tail left behind by a crash mid-append
+        rows = _row_count(directory)
+        for name, dtype in COLUMNS.items():
+            path = _column_path(directory, name)
+            if os.path.exists(path) and os.path.getsize(path) != rows * dtype.itemsize:
+                os.truncate(path, rows * dtype.itemsize)
+
+        self.chunk_rows = chunk_rows
+        self.chunk = {name: np.empty(chunk_rows, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self.buffered = 0
+
+    def encode_node(self, node_id):
+        code = self.codes.get(node_id)
+        if code is None:
+            code = len(self.node_ids)
+            self.codes[node_id] = code
+            self.node_ids.append(node_id)
+        return code
+
+    def append(self, node_id, score, cpu_load, memory_usage, battery_level, load_avg, timestamp):
+        i = self.buffered
+        chunk = self.chunk
+        chunk["node"][i] = self.encode_node(node_id)
+        chunk["score"][i] = score
+        chunk["cpu_load"][i] = cpu_load
+        chunk["memory_usage"][i] = memory_usage
+        chunk["battery_level"][i] = battery_level
+        chunk["load_avg"][i] = load_avg
+        chunk["timestamp"][i] = timestamp
+        self.buffered = i + 1
+        if self.buffered == self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # New dictionary entries go first so every stored code can be decoded
+        if len(self.node_ids) > self._saved_nodes:
+            with open(os.path.join(self.directory, NODES_FILE), "a") as file:
+                file.writelines(f"{node_id}\n" for node_id in self.node_ids[self._saved_nodes:])
+            self._saved_nodes = len(self.node_ids)
+        if not self.buffered:
+            return
+        for name, column in self.chunk.items():
+            with open(_column_path(self.directory, name), "ab") as file:
+                file.write(column[:self.buffered].tobytes())
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+
+class HistoryView:
+    """Read side of the store: zero-copy memory-mapped columns."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.node_ids = np.array(_load_node_ids(directory), dtype=object)
+        self.rows = _row_count(directory)
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            if self.rows:
+                self.columns[name] = np.memmap(_column_path(directory, name), dtype=dtype,
+                                               mode="r", shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=dtype)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def node_column(self):
+        """Decode the node column back to node id strings."""
+        return self.node_ids[self.columns["node"]]
+
+    def to_dataframe(self):
+        """Load the store as a DataFrame with the notebooks' CSV column names."""
+        import pandas as pd
+        return pd.DataFrame({
+            "Node_ID": self.node_column(),
+            " optimal_score": self.columns["score"],
+            "CPU Load (%)": self.columns["cpu_load"],
+            "Memory Usage (%)": self.columns["memory_usage"],
+            "Battery Level (%)": self.columns["battery_level"],
+            "Load Average": self.columns["load_avg"],
+            "timestamp": self.columns["timestamp"],
+        })
+
+def open_history(directory):
+    return HistoryView(directory)
+
+# CSV import
+def read_csv_rows(csv_path):
+    """Yield (node_id, score, cpu_load, memory_usage, battery_level, load_avg) from an
+    optimal_node_data CSV (with or without header)."""
+    with open(csv_path, newline='') as file:
+        for row in csv.reader(file):
+            if not row or row[0].strip() == "Node_ID":
+                continue
+            node_id, score, cpu_load, memory_usage, battery_level, load_avg = row[:6]
+            yield (node_id.strip(), float(score), float(cpu_load), float(memory_usage),
+                   float(battery_level), float(load_avg))
+
+def import_csv(csv_path, history):
+    """Append the rows of an optimal_node_data CSV (with or without header)."""
+    imported = 0
+    for row in read_csv_rows(csv_path):
+        history.append(*row, float('nan'))
+        imported += 1
+    return imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar store of aggregator decisions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="Append optimal_node_data CSV files to a store")
+    import_parser.add_argument("store")
+    import_parser.add_argument("csv_files", nargs="+")
+    summary_parser = commands.add_parser("summary", help="Print per-node decision counts of a store")
+    summary_parser.add_argument("store")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        history = DecisionHistory(args.store)
+        for csv_path in args.csv_files:
+            print(f"Imported {import_csv(csv_path, history)} rows from {csv_path}")
+        history.close()
+    else:
+        view = open_history(args.store)
+        counts = np.bincount(view["node"], minlength=len(view.node_ids))
+        print(f"{len(view)} decisions, {len(view.node_ids)} nodes")
+        for node_id, count in zip(view.node_ids, counts):
+            print(f"{node_id}: {count}")
+
+if __name__ == "__main__":
+    main()
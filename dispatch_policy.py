@@ -0,0 +1,146 @@
+"""Dispatch policies: which node gets the next task.
+
+Every policy reads the scores kept by a BestNodeSelector (lower is better)
+and returns (node_id, score):
+
+  argmin  the best-scoring node (the original behaviour)
+  p2c     power of two choices: the better of two nodes sampled at random
+  wrr     smooth weighted round-robin, weight 1 / score
+
+Argmin sends every task to the same node until its next metrics sample
+arrives, which is what makes the same node show up again and again in the
+optimal_node_data CSVs. InFlightTracker counters that for any policy by
+adding penalty * (tasks sent to the node and not yet finished) to its score.
+"""
+import random
+from collections import deque
+
+import numpy as np
+
+class ArgminPolicy:
+    name = "argmin"
+
+    def choose(self, selector):
+        return selector.best()
+
+class PowerOfTwoChoicesPolicy:
+    name = "p2c"
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def choose(self, selector):
+        heap = selector.heap
+        if len(heap) < 2:
+            return selector.best()
+        a, b = self.random.sample(heap.heap, 2)
+        if heap._less(b, a):
+            a = b
+        return selector.registry.node_ids[a], heap.scores[a]
+
+class WeightedRoundRobinPolicy:
+    """Nginx-style smooth weighted round-robin over all scored nodes.
+
+    Each pick adds every node's weight (1 / score) to its running credit,
+    takes the node with the most credit and charges it the total weight, so
+    a node with half the score gets twice the tasks, spread out evenly
+    rather than in runs.
+    """
+    name = "wrr"
+
+    def __init__(self, min_score=1e-6):
+        self.min_score = min_score
+        self.credit = np.zeros(0)
+
+    def choose(self, selector):
+        scores = selector.heap.scores
+        if not scores:
+            return None, float('inf')
+        size = len(selector.registry)
+        if self.credit.shape[0] < size:
+            credit = np.zeros(max(size, 2 * self.credit.shape[0]))
+            credit[:self.credit.shape[0]] = self.credit
+            self.credit = credit
+        slots = np.fromiter(scores.keys(), dtype=np.int64, count=len(scores))
+        score_values = np.fromiter(scores.values(), dtype=np.float64, count=len(scores))
+        weights = 1.0 / np.maximum(score_values, self.min_score)
+        credit = self.credit
+        credit[slots] += weights
+        chosen = int(slots[np.argmax(credit[slots])])
+        credit[chosen] -= weights.sum()
+        return selector.registry.node_ids[chosen], scores[chosen]
+
+POLICIES = {policy.name: policy for policy in (ArgminPolicy, PowerOfTwoChoicesPolicy, WeightedRoundRobinPolicy)}
+
+def get_policy(name, **kwargs):
+    try:
+        return POLICIES[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown dispatch policy {name!r}; expected one of {sorted(POLICIES)}") from None
+
+class InFlightTracker:
+    """Counts tasks sent to each node and turns them into a score penalty.
+
+    dispatched() adds penalty to the node's score in the selector;
+    completed() removes it again. Tasks that are never reported complete
+    expire after ttl seconds, when the node's newer metrics should reflect
+    them anyway. With penalty 0 nothing is tracked.
+    """
+
+    def __init__(self, selector, penalty=0.0, ttl=10.0):
+        self.selector = selector
+        self.penalty = penalty
+        self.ttl = ttl
+        self.pending = {}        # slot -> expiry times of its tasks in flight, oldest first
+        self.expiries = deque()  # (expires_at, slot) in dispatch order, including completed tasks
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def _apply(self, slot):
+        pending = self.pending.get(slot)
+        self.selector.set_offset(slot, self.penalty * len(pending) if pending else 0.0)
+
+    def dispatched(self, slot, now):
+        if not self.penalty:
+            return
+        pending = self.pending.get(slot)
+        if pending is None:
+            pending = self.pending[slot] = deque()
+        pending.append(now + self.ttl)
+        self.expiries.append((now + self.ttl, slot))
+        self.total += 1
+        self._apply(slot)
+
+    def _release(self, slot, pending):
+        pending.popleft()
+        if not pending:
+            del self.pending[slot]
+        self.total -= 1
+        self._apply(slot)
+
+    def completed(self, slot):
+        """Release the oldest in-flight task of slot, if any; O(1)."""
+        pending = self.pending.get(slot)
+        if pending:
+            self._release(slot, pending)
+
+    def expire(self, now):
+        # Entries of tasks already completed are skipped: completed() released
+        # the slot's oldest task, so its head then expires later than the entry
+        expiries = self.expiries
+        while expiries and expiries[0][0] <= now:
+            expires_at, slot = expiries.popleft()
+            pending = self.pending.get(slot)
+            if pending and pending[0] <= expires_at:
+                self._release(slot, pending)
+
+    def set_penalty(self, penalty):
+        self.penalty = penalty
+        for slot in list(self.pending):
+            self._apply(slot)
+        if not penalty:
+            self.pending.clear()
+            self.expiries.clear()
+            self.total = 0
@@ -0,0 +1,199 @@
+import math
+
+import numpy as np
+
+from node_registry import METRIC_COLUMNS
+
+class FairnessStats:
+    """Load-distribution statistics of the task assignments, kept online.
+
+    The Uniformity notebooks compute these after the fact from the decision
+    CSV; here every assignment updates them in O(1), keyed by registry slot:
+
+    - Welford running mean / variance of each metric per node, over the
+      metrics the node had when it was assigned a task, plus the global
+      min/max of each metric. The notebooks' coefficient of variation of
+      min-max normalized metrics is std / (mean - min) (the range cancels),
+      so it is derived from these when read.
+    - Assignment counts and their Shannon entropy, H = ln T - S / T with
+      T = sum(c) and S = sum(c ln c); one increment changes S by
+      (c+1) ln(c+1) - c ln c.
+    - Gini coefficient of the counts, G = 2W / (nT) - (n+1) / n with
+      W = sum(rank * count) over the counts sorted ascending. The sorted
+      order is kept as blocks of equal counts: incrementing a node swaps it
+      to the end of its block, which keeps the order sorted and adds its
+      rank to W. New nodes (count 0) go in front of every rank, which adds
+      T to W.
+
+    Node counts include nodes that were never assigned a task (add_node()
+    is called when a node first reports), so idle nodes lower the score.
+    """
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 1)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.means = np.zeros((capacity, len(METRIC_COLUMNS)), dtype=np.float64)
+        self.m2 = np.zeros((capacity, len(METRIC_COLUMNS)), dtype=np.float64)
+        self.minimum = np.full(len(METRIC_COLUMNS), np.inf)
+        self.maximum = np.full(len(METRIC_COLUMNS), -np.inf)
+        self.node_count = 0
+        self.total = 0
+        self.count_log_sum = 0.0  # S = sum(c ln c)
+        self.weighted_sum = 0     # W = sum(rank * c), counts sorted ascending
+
+        # Sorted order: position <-> slot; rank = position - base + 1
+        self.position = {}
+        self.slot_at = {}
+        self.base = 0
+        self.first = {}  # count -> first position holding it
+        self.last = {}   # count -> last position holding it
+
+    def _ensure_capacity(self, slot):
+        capacity = self.counts.shape[0]
+        if slot < capacity:
+            return
+        while capacity <= slot:
+            capacity *= 2
+        for name in ("counts", "means", "m2"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:old.shape[0]] = old
+            setattr(self, name, new)
+
+    def add_node(self, slot):
+        """Start tracking slot with no assignments."""
+        self._ensure_capacity(slot)
+        self.base -= 1
+        position = self.base
+        self.position[slot] = position
+        self.slot_at[position] = slot
+        if 0 in self.first:
+            self.first[0] = position
+        else:
+            self.first[0] = self.last[0] = position
+        self.weighted_sum += self.total  # Every other rank moved up by one
+        self.node_count += 1
+
+    def add_nodes(self, count):
+        """add_node() for the next count slots at once."""
+        if count:
+            self._ensure_capacity(self.node_count + count - 1)
+            self.node_count += count
+            self._rebuild_order()
+
+    def record(self, slot, values):
+        """Count one assignment to slot, made when the node's metrics were values."""
+        count = int(self.counts[slot])
+        position = self.position[slot]
+        end = self.last[count]
+        if position != end:
+            other = self.slot_at[end]
+            self.slot_at[position], self.position[other] = other, position
+            self.slot_at[end], self.position[slot] = slot, end
+        if self.first[count] == end:
+            del self.first[count], self.last[count]
+        else:
+            self.last[count] = end - 1
+        if count + 1 in self.first:
+            self.first[count + 1] = end
+        else:
+            self.first[count + 1] = self.last[count + 1] = end
+        self.weighted_sum += end - self.base + 1
+
+        self.counts[slot] = count + 1
+        self.total += 1
+        self.count_log_sum += (count + 1) * math.log(count + 1) - (count * math.log(count) if count else 0.0)
+
+        # Welford update of the node's metric means and squared deviations
+        delta = values - self.means[slot]
+        self.means[slot] += delta / (count + 1)
+        self.m2[slot] += delta * (values - self.means[slot])
+        np.minimum(self.minimum, values, out=self.minimum)
+        np.maximum(self.maximum, values, out=self.maximum)
+
+    def record_many(self, slots, values):
+        """record() for arrays of assignments at once (e.g. a replay); O(len + nodes log nodes)."""
+        slots = np.asarray(slots, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(slots):
+            return
+        n = self.node_count
+        batch_counts = np.bincount(slots, minlength=n)
+        batch_means = np.stack([np.bincount(slots, values[:, k], minlength=n) for k in range(values.shape[1])], axis=1)
+        assigned = batch_counts > 0
+        batch_means[assigned] /= batch_counts[assigned, None]
+        deviations = values - batch_means[slots]
+        batch_m2 = np.stack([np.bincount(slots, deviations[:, k] ** 2, minlength=n)
+                             for k in range(values.shape[1])], axis=1)
+
+        # Chan et al. merge of the batch into the running mean / squared deviations
+        counts = self.counts[:n]
+        merged = counts + batch_counts
+        ratio = np.divide(batch_counts, merged, out=np.zeros(n), where=merged > 0)
+        delta = batch_means - self.means[:n]
+        self.means[:n][assigned] += (delta * ratio[:, None])[assigned]
+        self.m2[:n] += batch_m2 + delta ** 2 * (counts * ratio)[:, None]
+        np.minimum(self.minimum, values.min(axis=0), out=self.minimum)
+        np.maximum(self.maximum, values.max(axis=0), out=self.maximum)
+        self.counts[:n] = merged
+        self.total += len(slots)
+        self._rebuild_order()
+
+    def _rebuild_order(self):
+        counts = self.counts[:self.node_count]
+        nonzero = counts[counts > 0].astype(np.float64)
+        self.count_log_sum = float((nonzero * np.log(nonzero)).sum())
+        order = np.argsort(counts, kind="stable")
+        self.base = 0
+        self.position = {int(slot): position for position, slot in enumerate(order)}
+        self.slot_at = {position: slot for slot, position in self.position.items()}
+        self.first, self.last = {}, {}
+        for position, count in enumerate(counts[order].tolist()):
+            self.first.setdefault(count, position)
+            self.last[count] = position
+        self.weighted_sum = int((np.arange(1, len(order) + 1) * counts[order]).sum())
+
+    def entropy(self):
+        """Shannon entropy (nats) of the assignment distribution; ln(nodes) is perfectly even."""
+        if self.total == 0:
+            return 0.0
+        return math.log(self.total) - self.count_log_sum / self.total
+
+    def gini(self):
+        """Gini coefficient of the assignment counts: 0 is perfectly even, towards 1 is one node."""
+        n = self.node_count
+        if n == 0 or self.total == 0:
+            return 0.0
+        return 2.0 * self.weighted_sum / (n * self.total) - (n + 1) / n
+
+    def summary(self, node_ids):
+        """All statistics, with per-node ones for the slots of node_ids (slot -> node_id)."""
+        n = self.node_count
+        counts = self.counts[:n]
+        means = self.means[:n]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variances = self.m2[:n] / (counts[:, None] - 1)  # Sample variance, like pandas
+            # CV of min-max normalized metrics, as in the notebooks: inf and NaN count as 0, clipped to +-10
+            cv = np.sqrt(variances) / (means - self.minimum)
+        cv = np.clip(np.nan_to_num(cv, nan=0.0, posinf=0.0, neginf=0.0), -10.0, 10.0)
+        uniformity = cv.mean(axis=1)
+        assigned = counts > 0
+
+        nodes = {}
+        for slot in np.flatnonzero(assigned).tolist():
+            nodes[node_ids[slot]] = {
+                "assignments": int(counts[slot]),
+                "mean": dict(zip(METRIC_COLUMNS, means[slot].tolist())),
+                "variance": dict(zip(METRIC_COLUMNS, [None if math.isnan(v) else v for v in variances[slot].tolist()])),
+                "uniformity": float(uniformity[slot]),
+            }
+        return {
+            "nodes": n,
+            "assigned_nodes": int(assigned.sum()),
+            "assignments": self.total,
+            "entropy": self.entropy(),
+            "max_entropy": math.log(n) if n else 0.0,
+            "gini": self.gini(),
+            "uniformity_score": float(uniformity[assigned].mean()) if assigned.any() else 0.0,
+            "per_node": nodes,
+        }
@@ -0,0 +1,332 @@
+"""Multi-node simulator: hosts thousands of virtual nodes in one process.
+
+node1.py-node3.py need a process, a DDS participant, threads and a plot
+each, so testing the aggregator at fleet scale meant launching dozens of
+processes. FleetSimulator runs N virtual nodes over one shared DDS
+participant or Zenoh session, from a single thread: every node's next
+publish and every running task's completion is an entry in one
+TimerWheel, so 10k nodes cost 10k wheel entries rather than 10k threads.
+
+Metrics are synthetic (SyntheticMetrics: per-node means drawn from a seeded
+generator, mean-reverting noise around them, battery drain, and CPU from
+running tasks) or replayed from the optimal_node_data CSVs
+(ReplayMetrics); the same seed gives the same fleet. Tasks are not
+executed: like NodeTaskExecutor, a virtual node runs up to --workers tasks
+at once, each for an exponentially distributed time averaging
+--service-ms, queues --queue more and rejects the rest, and acknowledges
+them like a real node.
+
+Usage: python fleet_simulator.py [--transport dds|zenoh] [--nodes 1000]
+           [--interval 1.0] [--seed 0] [--replay [csv ...]] [--duration 60]
+"""
+import argparse
+import glob
+import math
+import random
+import time
+from collections import deque
+
+import wire_codec
+from decision_history import read_csv_rows
+from node_sharding import SHARD_BUCKETS, bucket_of
+from timer_wheel import TimerWheel
+
+class VirtualNode:
+    __slots__ = ("node_id", "index", "state", "running", "pending", "saturated")
+
+    def __init__(self, node_id, index):
+        self.node_id = node_id
+        self.index = index
+        self.state = None  # Owned by the metrics source
+        self.running = 0
+        self.pending = deque()  # Queued task ids
+        self.saturated = False
+
+# Metrics sources: start(node) sets node.state, next(node, dt, busy) returns
+# (cpu_load, memory_usage, battery_level, load_avg) dt seconds after the last call
+class SyntheticMetrics:
+    """Mean-reverting (Ornstein-Uhlenbeck) metrics around seeded per-node means."""
+
+    def __init__(self, seed=0, reversion=0.5, cpu_noise=8.0, memory_noise=2.0,
+                 battery_drain=0.01, cores=4):
+        self.rng = random.Random(seed)
+        self.reversion = reversion  # Pull towards the mean, per second
+        self.cpu_noise = cpu_noise
+        self.memory_noise = memory_noise
+        self.battery_drain = battery_drain  # % per second at full CPU
+        self.cores = cores
+
+    def start(self, node):
+        rng = self.rng
+        cpu_mean = 100.0 * rng.betavariate(2, 5)  # Mostly lightly loaded, a few busy nodes
+        memory_mean = rng.uniform(20.0, 80.0)
+        battery = rng.uniform(40.0, 100.0)
+        node.state = [cpu_mean, memory_mean, battery, cpu_mean / 100.0 * self.cores, cpu_mean, memory_mean]
+
+    def next(self, node, dt, busy):
+        state = node.state
+        cpu, memory, battery, load, cpu_mean, memory_mean = state
+        rng = self.rng
+        pull = min(1.0, self.reversion * dt)
+        noise = math.sqrt(dt)
+        cpu = min(100.0, max(0.0, cpu + pull * (cpu_mean - cpu) + self.cpu_noise * noise * rng.gauss(0.0, 1.0)))
+        memory = min(100.0, max(0.0, memory + pull * (memory_mean - memory)
+                                + self.memory_noise * noise * rng.gauss(0.0, 1.0)))
+        # Running tasks take their share of the idle CPU
+        observed_cpu = cpu + (100.0 - cpu) * busy
+        battery -= self.battery_drain * dt * observed_cpu / 100.0
+        if battery < 5.0:
+            battery = 100.0  # Recharged
+        # 1-minute load average follows CPU with a 60 s time constant
+        load += (1.0 - math.exp(-dt / 60.0)) * (observed_cpu / 100.0 * self.cores - load)
+        state[:4] = cpu, memory, battery, load
+        return observed_cpu, memory, battery, load
+
+class ReplayMetrics:
+    """Replays the CSV rows of the recorded nodes, cycling; virtual node i follows
+    recorded node i % N, and its copies start at different rows."""
+
+    def __init__(self, csv_paths):
+        traces = {}
+        for path in csv_paths:
+            for node_id, _score, *values in read_csv_rows(path):
+                traces.setdefault(node_id, []).append(tuple(values))
+        if not traces:
+            raise ValueError(f"No rows in {csv_paths}")
+        self.traces = list(traces.values())
+
+    def start(self, node):
+        trace = self.traces[node.index % len(self.traces)]
+        node.state = [trace, (node.index // len(self.traces)) * 7 % len(trace)]
+
+    def next(self, node, dt, busy):
+        trace, position = node.state
+        node.state[1] = (position + 1) % len(trace)
+        return trace[position]
+
+# Transports: one participant or session shared by all virtual nodes
+class DdsFleetTransport:
+    def __init__(self, max_batch=256, prefix="sim"):
+        from cyclonedds.core import Policy, Qos
+        from cyclonedds.domain import DomainParticipant
+        from cyclonedds.internal import InvalidSample
+        from cyclonedds.pub import DataWriter, Publisher
+        from cyclonedds.sub import DataReader, Subscriber
+        from cyclonedds.topic import Topic
+        from dds_types import (ACK_TOPIC, METRICS_QOS, METRICS_TOPIC, TASK_TOPIC, TaskAck, TaskBatch, nodeMetrics,
+                               bucket_partition, task_partition)
+
+        self.nodeMetrics, self.TaskAck, self.InvalidSample = nodeMetrics, TaskAck, InvalidSample
+        self.max_batch = max_batch
+        self.participant = DomainParticipant()  # Default domain, like the aggregator
+        # One metrics writer per shard bucket, in the bucket's partition (see dds_types.metrics_partition)
+        metrics_topic = Topic(self.participant, METRICS_TOPIC, nodeMetrics)
+        self.bucket_writers = [
+            DataWriter(Publisher(self.participant, qos=Qos(Policy.Partition([bucket_partition(bucket)]))),
+                       metrics_topic, qos=METRICS_QOS)
+            for bucket in range(SHARD_BUCKETS)]
+        self.metrics_writers = {}  # node_id -> its bucket's writer
+        # Joins the partitions of every <prefix>_<n> node, so batches for nodes hosted elsewhere do not arrive
+        task_subscriber = Subscriber(self.participant, qos=Qos(Policy.Partition([task_partition(f"{prefix}_*")])))
+        self.task_reader = DataReader(task_subscriber, Topic(self.participant, TASK_TOPIC, TaskBatch),
+                                      qos=Qos(Policy.Reliability.Reliable(1), Policy.Durability.Volatile, Policy.History.KeepAll))
+        self.ack_writer = DataWriter(Publisher(self.participant), Topic(self.participant, ACK_TOPIC, TaskAck),
+                                     qos=Qos(Policy.Reliability.Reliable(1), Policy.Durability.Volatile, Policy.History.KeepAll))
+
+    def publish_metrics(self, node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+                        running_tasks, queue_length, task_capacity):
+        writer = self.metrics_writers.get(node_id)
+        if writer is None:
+            writer = self.metrics_writers[node_id] = self.bucket_writers[bucket_of(node_id)]
+        writer.write(self.nodeMetrics(
+            cpu_load=cpu_load, memory_usage=memory_usage, battery_level=battery_level, load_avg=load_avg,
+            node_id=node_id, timestamp=timestamp, running_tasks=running_tasks,
+            queue_length=queue_length, task_capacity=task_capacity))
+
+    def ack(self, node_id, task_ids, completed_at, rejected_ids=()):
+        self.ack_writer.write(self.TaskAck(node_id=node_id, task_ids=task_ids, completed_at=completed_at,
+                                           rejected_task_ids=rejected_ids))
+
+    def poll_tasks(self):
+        """(node_id, [(task_id, task)]) for the batches received so far; never blocks."""
+        samples = self.task_reader.take(N=self.max_batch)
+        return [(batch.node_id, list(zip(batch.task_ids, batch.tasks)))
+                for batch in samples if not isinstance(batch, self.InvalidSample)]
+
+    def close(self):
+        pass
+
+class ZenohFleetTransport:
+    def __init__(self, codec="binary", metrics_key="zenoh/node_metrics"):
+        import zenoh
+
+        self.codec = wire_codec.get_codec(codec)
+        self.session = zenoh.open(zenoh.Config())
+        self.metrics_publisher = self.session.declare_publisher(metrics_key)
+        self.ack_publisher = self.session.declare_publisher("zenoh/task_acks")
+        # Batches arrive on Zenoh's thread; the simulator thread drains them
+        self.received = deque()
+        self.task_subscriber = self.session.declare_subscriber(
+            "zenoh/task_assignments/*", lambda sample: self.received.append(sample.payload.to_bytes()))
+
+    def publish_metrics(self, node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+                        running_tasks, queue_length, task_capacity):
+        self.metrics_publisher.put(self.codec.encode_metrics(
+            node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+            running_tasks, queue_length, task_capacity))
+
+    def ack(self, node_id, task_ids, completed_at, rejected_ids=()):
+        self.ack_publisher.put(self.codec.encode_task_ack(node_id, task_ids, completed_at, rejected_ids))
+
+    def poll_tasks(self):
+        batches = []
+        while self.received:
+            batches.append(wire_codec.decode_task_batch(self.received.popleft()))
+        return batches
+
+    def close(self):
+        self.session.close()
+
+TRANSPORTS = {"dds": DdsFleetTransport, "zenoh": ZenohFleetTransport}
+
+class FleetSimulator:
+    def __init__(self, transport, metrics, node_count, interval=1.0, prefix="sim", workers=4,
+                 max_queue=8, service_time=0.04, seed=0, tick=0.01):
+        self.transport = transport
+        self.metrics = metrics
+        self.interval = interval
+        self.workers = workers
+        self.max_queue = max_queue
+        self.task_capacity = workers + max_queue
+        self.service_time = service_time
+        self.rng = random.Random(seed)
+        self.wheel = TimerWheel(tick=tick)
+        self.nodes = {}
+        for index in range(node_count):
+            node = VirtualNode(f"{prefix}_{index}", index)
+            metrics.start(node)
+            self.nodes[node.node_id] = node
+
+        # Counters
+        self.published = 0
+        self.tasks_received = 0
+        self.tasks_completed = 0
+        self.tasks_rejected = 0
+        self.foreign_batches = 0  # Batches for nodes hosted elsewhere
+
+    def start(self):
+        # Spread the first publishes over one interval so the fleet does not publish in lockstep
+        for node in self.nodes.values():
+            self.wheel.schedule(self.rng.uniform(0.0, self.interval), self._tick, node)
+
+    def _tick(self, node):
+        self._publish(node)
+        self.wheel.schedule(self.interval, self._tick, node)
+
+    def _publish(self, node, dt=None):
+        cpu_load, memory_usage, battery_level, load_avg = self.metrics.next(
+            node, self.interval if dt is None else dt, node.running / self.workers)
+        self.transport.publish_metrics(node.node_id, cpu_load, memory_usage, battery_level, load_avg,
+                                       time.time(), node.running, len(node.pending), self.task_capacity)
+        self.published += 1
+
+    def receive(self, node_id, tasks):
+        node = self.nodes.get(node_id)
+        if node is None:
+            self.foreign_batches += 1
+            return
+        rejected = []
+        for task_id, _task in tasks:
+            self.tasks_received += 1
+            if node.running < self.workers:
+                self._start_task(node, task_id)
+            elif len(node.pending) < self.max_queue:
+                node.pending.append(task_id)
+            else:
+                rejected.append(task_id)
+        if rejected:
+            # Queue full; the aggregator requeues these for other nodes
+            self.tasks_rejected += len(rejected)
+            self.transport.ack(node_id, [], time.time(), rejected)
+        self._update_saturation(node)
+
+    def _start_task(self, node, task_id):
+        node.running += 1
+        self.wheel.schedule(self.rng.expovariate(1.0 / self.service_time), self._complete_task, node, task_id)
+
+    def _complete_task(self, node, task_id):
+        node.running -= 1
+        self.tasks_completed += 1
+        self.transport.ack(node.node_id, [task_id], time.time())
+        if node.pending:
+            self._start_task(node, node.pending.popleft())
+        self._update_saturation(node)
+
+    def _update_saturation(self, node):
+        saturated = node.running >= self.workers and len(node.pending) >= self.max_queue
+        if saturated != node.saturated:
+            # Publish right away, like a real node, so the aggregator stops (or resumes) dispatching
+            node.saturated = saturated
+            self._publish(node, dt=0.0)
+
+    def step(self):
+        """Fire due timers and hand received batches to their nodes."""
+        self.wheel.advance()
+        for node_id, tasks in self.transport.poll_tasks():
+            self.receive(node_id, tasks)
+
+    def run(self, duration=None, report_interval=5.0):
+        self.start()
+        started = last_report = time.monotonic()
+        last_published = 0
+        while duration is None or time.monotonic() - started < duration:
+            self.step()
+            time.sleep(self.wheel.tick)
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                rate = (self.published - last_published) / (now - last_report)
+                print(f"{len(self.nodes)} nodes: {rate:.0f} samples/s, tasks received {self.tasks_received}, "
+                      f"completed {self.tasks_completed}, rejected {self.tasks_rejected}")
+                last_report, last_published = now, self.published
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transport", default="dds", choices=sorted(TRANSPORTS))
+    parser.add_argument("--nodes", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between a node's publishes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--replay", nargs="*", metavar="CSV",
+                        help="Replay optimal_node_data CSVs instead of synthetic metrics (default: all in .)")
+    parser.add_argument("--prefix", default="sim", help="Node ids are <prefix>_<n>")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=8)
+    parser.add_argument("--service-ms", type=float, default=40.0)
+    parser.add_argument("--duration", type=float, help="Seconds to run (default: forever)")
+    parser.add_argument("--key-prefix", help="Zenoh: publish metrics on zenoh/node_metrics/<prefix> "
+                                             "(prefix sharding, see sharded_aggregation.py)")
+    args = parser.parse_args()
+    if args.key_prefix and args.transport != "zenoh":
+        parser.error("--key-prefix needs --transport zenoh")
+
+    if args.replay is not None:
+        metrics = ReplayMetrics(args.replay or sorted(glob.glob("optimal_node_data*.csv")))
+    else:
+        metrics = SyntheticMetrics(args.seed)
+    if args.key_prefix:
+        transport = ZenohFleetTransport(metrics_key=f"zenoh/node_metrics/{args.key_prefix}")
+    elif args.transport == "dds":
+        transport = DdsFleetTransport(prefix=args.prefix)
+    else:
+        transport = TRANSPORTS[args.transport]()
+    simulator = FleetSimulator(transport, metrics, args.nodes, args.interval, args.prefix, args.workers,
+                               args.queue, args.service_ms / 1e3, args.seed)
+    print(f"Simulating {args.nodes} {args.transport} nodes, one sample every {args.interval:g} s each")
+    try:
+        simulator.run(args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        transport.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+
+# Default per-metric change that counts as significant (CPU %, Memory %, Battery %, Load)
+DEFAULT_CHANGE_THRESHOLDS = (10.0, 10.0, 5.0, 0.5)
+
+class LatestValueCoalescer:
+    """Decides when freshly ingested samples are scored.
+
+    Every sample is written to the registry (the latest value always wins);
+    this class only tracks which nodes have unscored updates. A node is
+    scored right away when one of its metrics moved by more than its change
+    threshold since the node was last scored; otherwise it is marked dirty
+    and picked up by the next scoring round, at most every score_interval
+    seconds. min_node_interval throttles how often a single node is scored.
+    """
+
+    def __init__(self, registry, score_interval=1.0, min_node_interval=0.0,
+                 change_thresholds=DEFAULT_CHANGE_THRESHOLDS):
+        self.registry = registry
+        self.score_interval = score_interval
+        self.min_node_interval = min_node_interval
+        self.change_thresholds = np.asarray(change_thresholds, dtype=np.float64)
+        self.scored_values = np.zeros_like(registry.values)
+        self.scored_at = np.full(registry.capacity, -np.inf)
+        self.dirty = set()
+        self.last_round = 0.0
+
+        # Counters
+        self.samples = 0
+        self.immediate = 0
+        self.coalesced = 0
+
+    def ensure_capacity(self):
+        """Grow the per-slot arrays to the registry's capacity."""
+        capacity = self.registry.capacity
+        if self.scored_at.shape[0] < capacity:
+            scored_values = np.zeros_like(self.registry.values)
+            scored_values[:self.scored_values.shape[0]] = self.scored_values
+            scored_at = np.full(capacity, -np.inf)
+            scored_at[:self.scored_at.shape[0]] = self.scored_at
+            self.scored_values, self.scored_at = scored_values, scored_at
+
+    def offer(self, slot, now):
+        """Register a new sample for slot; True means score it immediately."""
+        self.ensure_capacity()
+        self.samples += 1
+        if now - self.scored_at[slot] >= self.min_node_interval:
+            never_scored = self.scored_at[slot] == -np.inf
+            delta = np.abs(self.registry.values[slot] - self.scored_values[slot])
+            if never_scored or (delta > self.change_thresholds).any():
+                self.immediate += 1
+                return True
+        if slot in self.dirty:
+            self.coalesced += 1  # An older unscored sample was superseded
+        self.dirty.add(slot)
+        return False
+
+    def mark_scored(self, slot, now):
+        # Also reached without offer(): the sharded root scores summary entries directly
+        self.ensure_capacity()
+        self.scored_values[slot] = self.registry.values[slot]
+        self.scored_at[slot] = now
+        self.dirty.discard(slot)
+
+    def due(self, now):
+        """Return the dirty slots to score in this round ([] if not yet due)."""
+        if not self.dirty or now - self.last_round < self.score_interval:
+            return []
+        self.last_round = now
+        slots = [slot for slot in self.dirty if now - self.scored_at[slot] >= self.min_node_interval]
+        self.dirty.difference_update(slots)
+        return slots
+
+    def stats(self):
+        return {"samples": self.samples, "scored_immediately": self.immediate,
+                "coalesced": self.coalesced, "pending": len(self.dirty)}
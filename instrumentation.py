@@ -0,0 +1,159 @@
+"""Counters and latency histograms exported in Prometheus text format.
+
+Nothing here takes a lock. Every instrument is meant to be updated by one
+thread (the aggregator core's event loop, or the CSV writer thread for its
+own timings), and increments are plain integer stores under the GIL, so an
+exporter reading concurrently sees at worst a value that is one update
+behind.
+"""
+import threading
+import time
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class LabeledCounter:
+    """Counter family keyed by one label value, e.g. node_id."""
+
+    def __init__(self):
+        self.values = {}
+
+    def inc(self, label, amount=1):
+        self.values[label] = self.values.get(label, 0) + amount
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of durations.
+
+    Values are recorded in integer microseconds. Each power-of-two range is
+    split into sub_bucket_count / 2 linear sub-buckets, which keeps the
+    relative error under 1 / (sub_bucket_count / 2) (< 1% with the default
+    256) from 1 us up to highest_seconds. record() is O(1) bit arithmetic on
+    a fixed preallocated array.
+    """
+
+    def __init__(self, highest_seconds=3600.0, sub_bucket_bits=8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.half_count = 1 << (sub_bucket_bits - 1)
+        self.highest = int(highest_seconds * 1e6)
+        self.counts = [0] * (self._index(self.highest) + 1)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0
+
+    def _index(self, value):
+        magnitude = value.bit_length() - self.sub_bucket_bits
+        if magnitude <= 0:
+            return value
+        return magnitude * self.half_count + (value >> magnitude)
+
+    def _upper_bound(self, index):
+        if index < 2 * self.half_count:
+            return index
+        magnitude = index // self.half_count - 1
+        sub_bucket = index - magnitude * self.half_count
+        return ((sub_bucket + 1) << magnitude) - 1
+
+    def record(self, seconds):
+        value = min(max(int(seconds * 1e6), 0), self.highest)
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum += seconds
+        if value > self.max:
+            self.max = value
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0
+
+    def time(self):
+        """Context manager that records the duration of its block."""
+        return _Timer(self)
+
+    def percentile(self, quantile):
+        """Return the duration (seconds) at quantile (0..1), 0.0 if empty."""
+        total = self.total
+        if total == 0:
+            return 0.0
+        target = max(1, int(quantile * total + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(index), self.max) / 1e6
+        return self.max / 1e6
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter() - self.start)
+        return False
+
+def escape_label_value(value):
+    """Label value as the text format requires: backslash, double quote and newline escaped."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRegistry:
+    """Named instruments plus a Prometheus text-format renderer."""
+
+    QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.instruments = []  # (kind, name, help, instrument, extra)
+        self._render_lock = threading.Lock()
+
+    def _add(self, kind, name, help_text, instrument, extra=None):
+        self.instruments.append((kind, f"{self.prefix}_{name}", help_text, instrument, extra))
+        return instrument
+
+    def counter(self, name, help_text):
+        return self._add("counter", name, help_text, Counter())
+
+    def labeled_counter(self, name, help_text, label):
+        return self._add("labeled_counter", name, help_text, LabeledCounter(), label)
+
+    def histogram(self, name, help_text):
+        return self._add("histogram", name, help_text, LatencyHistogram())
+
+    def gauge(self, name, help_text, read_fn):
+        """Gauge whose value is read from read_fn() at export time."""
+        return self._add("gauge", name, help_text, read_fn)
+
+    def render(self):
+        lines = []
+        with self._render_lock:
+            for kind, name, help_text, instrument, extra in self.instruments:
+                lines.append(f"# HELP {name} {help_text}")
+                if kind == "counter":
+                    lines.append(f"# TYPE {name} counter")
+                    lines.append(f"{name} {instrument.value}")
+                elif kind == "labeled_counter":
+                    lines.append(f"# TYPE {name} counter")
+                    for label, value in list(instrument.values.items()):
+                        lines.append(f'{name}{{{extra}="{escape_label_value(label)}"}} {value}')
+                elif kind == "gauge":
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {instrument()}")
+                else:
+                    lines.append(f"# TYPE {name} summary")
+                    for quantile in self.QUANTILES:
+                        lines.append(f'{name}{{quantile="{quantile}"}} {instrument.percentile(quantile):.6f}')
+                    lines.append(f"{name}_sum {instrument.sum:.6f}")
+                    lines.append(f"{name}_count {instrument.total}")
+        return "\n".join(lines) + "\n"
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
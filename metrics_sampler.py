@@ -0,0 +1,111 @@
+"""Background, non-blocking system metrics sampler for the nodes.
+
+get_system_metrics() used to call psutil.cpu_percent(interval=1), blocking
+the publishing thread for a second, and each 60-second publish reflected a
+single noisy one-second window. MetricsSampler polls psutil every
+poll_interval seconds on its own thread (cpu_percent(interval=None) only
+diffs counters since the previous call) and keeps an EWMA of each metric
+with the given time constant, so the smoothing does not depend on the
+polling rate.
+
+Publishing is change-driven: on_publish is called as soon as a smoothed
+metric moves more than its change threshold away from the last published
+value (at most every min_publish_interval seconds), and otherwise once per
+heartbeat_interval so the aggregator still knows the node is alive.
+"""
+import math
+import os
+import threading
+import time
+
+import psutil
+
+# Per-metric change that triggers a publish (CPU %, Memory %, Battery %, Load)
+DEFAULT_PUBLISH_THRESHOLDS = (5.0, 5.0, 2.0, 0.25)
+
+def read_system_metrics():
+    """One raw (cpu_load, memory_usage, battery_level, load_avg) reading; never blocks."""
+    cpu_load = psutil.cpu_percent(interval=None)  # CPU usage since the previous call
+    memory_usage = psutil.virtual_memory().percent  # Memory usage percentage
+    battery = psutil.sensors_battery()  # Battery statistics
+    battery_level = battery.percent if battery else 100.0  # Assume 100% if no battery
+    load_avg = os.getloadavg()[0]  # 1-minute load average
+    return cpu_load, memory_usage, battery_level, load_avg
+
+class MetricsSampler:
+    def __init__(self, on_publish, poll_interval=0.25, time_constant=5.0,
+                 change_thresholds=DEFAULT_PUBLISH_THRESHOLDS, heartbeat_interval=60.0,
+                 min_publish_interval=1.0):
+        self.on_publish = on_publish  # on_publish(cpu_load, memory_usage, battery_level, load_avg, timestamp)
+        self.poll_interval = poll_interval
+        self.time_constant = time_constant
+        self.change_thresholds = change_thresholds
+        self.heartbeat_interval = heartbeat_interval
+        self.min_publish_interval = min_publish_interval
+        self.smoothed = None   # EWMA of each metric
+        self.published = None  # Values sent in the last publish
+        self.last_sample = 0.0
+        self.last_publish = float('-inf')
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Counters
+        self.samples = 0
+        self.change_publishes = 0
+        self.heartbeats = 0
+
+    def start(self):
+        psutil.cpu_percent(interval=None)  # Prime the CPU counters; the first reading is meaningless
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self):
+        """Smoothed (cpu_load, memory_usage, battery_level, load_avg), or None before the first sample."""
+        return self.smoothed
+
+    def publish_now(self):
+        """Publish the current smoothed values regardless of change or heartbeat."""
+        with self.lock:
+            if self.smoothed is not None:
+                self._publish(time.time())
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error sampling system metrics: {e}")
+
+    def sample(self):
+        raw = read_system_metrics()
+        now = time.time()
+        with self.lock:
+            self.samples += 1
+            if self.smoothed is None:
+                self.smoothed = raw
+            else:
+                # Time-based EWMA weight, so a missed poll counts for more
+                alpha = 1.0 - math.exp(-(now - self.last_sample) / self.time_constant)
+                self.smoothed = tuple(old + alpha * (new - old) for old, new in zip(self.smoothed, raw))
+            self.last_sample = now
+
+            if self.published is None:
+                self._publish(now)
+            elif now - self.last_publish >= self.min_publish_interval and any(
+                    abs(value - published) > threshold for value, published, threshold
+                    in zip(self.smoothed, self.published, self.change_thresholds)):
+                self.change_publishes += 1
+                self._publish(now)
+            elif now - self.last_publish >= self.heartbeat_interval:
+                self.heartbeats += 1
+                self._publish(now)
+
+    def _publish(self, now):
+        self.published = self.smoothed
+        self.last_publish = now
+        self.on_publish(*self.smoothed, now)
@@ -0,0 +1,113 @@
+import numpy as np
+from collections import namedtuple
+
+# Column order of the metric matrix; matches the criteria names used for scoring
+METRIC_COLUMNS = ("CPU", "Memory", "Battery", "Load")
+CPU, MEMORY, BATTERY, LOAD = range(len(METRIC_COLUMNS))
+
+_NodeRecordBase = namedtuple(
+    "NodeRecord",
+    ["node_id", "cpu_load", "memory_usage", "battery_level", "load_avg", "timestamp"],
+)
+
+class NodeRecord(_NodeRecordBase):
+    """Read-only view of one registry row.
+
+    Supports both attribute access (DDS style) and item access by field
+    name (Zenoh dict style), so it can be passed to either aggregator's
+    scoring and CSV code unchanged.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+class NodeRegistry:
+    """Node metrics table keyed by node_id.
+
+    Every node owns a fixed slot in a set of preallocated column arrays:
+    one float64 column per metric, plus the sample timestamp and a
+    per-slot generation counter that is bumped on every upsert. Upsert and
+    lookup are O(1) (amortized when the arrays have to grow) and no
+    per-sample Python objects are kept.
+    """
+
+    def __init__(self, capacity=1024):
+        capacity = max(int(capacity), 1)
+        self.values = np.zeros((capacity, len(METRIC_COLUMNS)), dtype=np.float64)
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.generations = np.zeros(capacity, dtype=np.uint64)
+        self.node_ids = []   # slot -> node_id
+        self.slots = {}      # node_id -> slot
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __contains__(self, node_id):
+        return node_id in self.slots
+
+    def __iter__(self):
+        for slot in range(len(self.node_ids)):
+            yield self.record_at(slot)
+
+    @property
+    def capacity(self):
+        return self.values.shape[0]
+
+    def _grow(self):
+        capacity = self.capacity * 2
+        values = np.zeros((capacity, len(METRIC_COLUMNS)), dtype=np.float64)
+        values[:len(self.node_ids)] = self.values[:len(self.node_ids)]
+        timestamps = np.zeros(capacity, dtype=np.float64)
+        timestamps[:len(self.node_ids)] = self.timestamps[:len(self.node_ids)]
+        generations = np.zeros(capacity, dtype=np.uint64)
+        generations[:len(self.node_ids)] = self.generations[:len(self.node_ids)]
+        self.values, self.timestamps, self.generations = values, timestamps, generations
+
+    def slot_for(self, node_id):
+        """Return the slot of node_id, allocating one if the node is new."""
+        slot = self.slots.get(node_id)
+        if slot is None:
+            slot = len(self.node_ids)
+            if slot == self.capacity:
+                self._grow()
+            self.slots[node_id] = slot
+            self.node_ids.append(node_id)
+        return slot
+
+    def load(self, node_ids, values, timestamps, generations):
+        """Replace the contents with whole columns, e.g. from a checkpoint."""
+        count = len(node_ids)
+        while self.capacity < count:
+            self._grow()
+        self.node_ids = list(node_ids)
+        self.slots = {node_id: slot for slot, node_id in enumerate(self.node_ids)}
+        self.values[:count] = values
+        self.timestamps[:count] = timestamps
+        self.generations[:count] = generations
+
+    def upsert(self, node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp):
+        """Store the latest sample of a node and return its slot."""
+        slot = self.slot_for(node_id)
+        row = self.values[slot]
+        row[CPU] = cpu_load
+        row[MEMORY] = memory_usage
+        row[BATTERY] = battery_level
+        row[LOAD] = load_avg
+        self.timestamps[slot] = timestamp
+        self.generations[slot] += 1
+        return slot
+
+    def record_at(self, slot):
+        cpu_load, memory_usage, battery_level, load_avg = self.values[slot].tolist()
+        return NodeRecord(self.node_ids[slot], cpu_load, memory_usage, battery_level,
+                          load_avg, float(self.timestamps[slot]))
+
+    def record(self, node_id):
+        """Return the latest sample of node_id as a NodeRecord, or None."""
+        slot = self.slots.get(node_id)
+        if slot is None:
+            return None
+        return self.record_at(slot)
@@ -0,0 +1,196 @@
+import numpy as np
+
+class IndexedMinHeap:
+    """Binary min-heap of registry slots ordered by (score, slot).
+
+    Keeps a slot -> heap position index so a node's score can be raised or
+    lowered in place in O(log N). Ties are broken by slot, i.e. by the order
+    in which nodes were first seen, which matches what min() over the old
+    insertion-ordered node_scores dict returned.
+    """
+
+    def __init__(self):
+        self.heap = []       # heap of slots
+        self.scores = {}     # slot -> score
+        self.position = {}   # slot -> index in self.heap
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, slot):
+        return slot in self.position
+
+    def _less(self, a, b):
+        score_a, score_b = self.scores[a], self.scores[b]
+        return score_a < score_b or (score_a == score_b and a < b)
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i]] = i
+        self.position[heap[j]] = j
+
+    def _sift_up(self, i):
+        heap = self.heap
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not self._less(heap[i], heap[parent]):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        heap = self.heap
+        size = len(heap)
+        while True:
+            smallest = i
+            left = 2 * i + 1
+            right = left + 1
+            if left < size and self._less(heap[left], heap[smallest]):
+                smallest = left
+            if right < size and self._less(heap[right], heap[smallest]):
+                smallest = right
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+    def update(self, slot, score):
+        """Insert slot or change its score (decrease- or increase-key)."""
+        i = self.position.get(slot)
+        if i is None:
+            self.scores[slot] = score
+            self.position[slot] = len(self.heap)
+            self.heap.append(slot)
+            self._sift_up(len(self.heap) - 1)
+            return
+        old_score = self.scores[slot]
+        self.scores[slot] = score
+        if score < old_score:
+            self._sift_up(i)
+        elif score > old_score:
+            self._sift_down(i)
+
+    def remove(self, slot):
+        """Drop slot from the heap; no-op if it is not present."""
+        i = self.position.pop(slot, None)
+        if i is None:
+            return
+        del self.scores[slot]
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.position[last] = i
+            self._sift_up(i)
+            self._sift_down(self.position[last])
+
+    def rebuild(self, scores):
+        """Replace the heap contents with slots 0..len(scores)-1.
+
+        A list sorted by (score, slot) is a valid heap, and a stable NumPy
+        sort is much cheaper than sifting N slots in Python.
+        """
+        self.clear()
+        self.heap.extend(np.argsort(np.asarray(scores, dtype=np.float64), kind="stable").tolist())
+        self.scores.update(enumerate(scores))
+        self.position.update((slot, i) for i, slot in enumerate(self.heap))
+
+    def peek(self):
+        """Return (slot, score) of the minimum, or (None, inf) when empty."""
+        if not self.heap:
+            return None, float('inf')
+        slot = self.heap[0]
+        return slot, self.scores[slot]
+
+    def clear(self):
+        self.heap.clear()
+        self.scores.clear()
+        self.position.clear()
+
+class BestNodeSelector:
+    """Incremental best-node selection over a NodeRegistry.
+
+    Only the node whose sample just arrived is rescored; the current best
+    node is the top of an IndexedMinHeap. score_fn receives a NodeRecord.
+
+    set_offset() adds a per-node amount on top of the metric score, one per
+    source (e.g. the in-flight task penalty, see dispatch_policy.py, and the
+    staleness penalty of aging samples); the heap orders nodes by metric
+    score + the sum of their offsets. exclude() takes a node out of selection (e.g.
+    while its task queue is full) without forgetting its score; include()
+    puts it back.
+    """
+
+    def __init__(self, registry, score_fn):
+        self.registry = registry
+        self.score_fn = score_fn
+        self.heap = IndexedMinHeap()
+        self.base_scores = {}  # slot -> metric score without offset
+        self.offsets = {}      # slot -> total offset, only for nodes that have one
+        self.offset_parts = {} # slot -> {source: offset}, only for nodes that have one
+        self.excluded = set()  # slots kept out of the heap
+
+    def update(self, slot):
+        """Rescore one registry slot and return its new score."""
+        score = self.score_fn(self.registry.record_at(slot))
+        self.base_scores[slot] = score
+        if slot not in self.excluded:
+            self.heap.update(slot, score + self.offsets.get(slot, 0.0))
+        return score
+
+    def exclude(self, slot):
+        self.excluded.add(slot)
+        self.heap.remove(slot)
+
+    def include(self, slot):
+        if slot in self.excluded:
+            self.excluded.discard(slot)
+            if slot in self.base_scores:
+                self.heap.update(slot, self.base_scores[slot] + self.offsets.get(slot, 0.0))
+
+    def set_offset(self, slot, offset, source="in_flight"):
+        """Set the amount source adds to slot's score; 0 removes it."""
+        parts = self.offset_parts.get(slot)
+        if offset:
+            if parts is None:
+                parts = self.offset_parts[slot] = {}
+            parts[source] = offset
+        elif parts is not None:
+            parts.pop(source, None)
+        total = sum(parts.values()) if parts else 0.0
+        if total:
+            self.offsets[slot] = total
+        else:
+            self.offsets.pop(slot, None)
+            if parts is not None and not parts:
+                del self.offset_parts[slot]
+        if slot in self.heap:
+            self.heap.update(slot, self.base_scores[slot] + total)
+
+    def rescore_all(self, batch_score_fn=None):
+        """Rescore every node, e.g. after the criteria or weights change.
+
+        batch_score_fn, when given, maps the registry's (N, 4) metric matrix
+        to an array of N scores (see scoring.score_fleet) and replaces the
+        per-node loop.
+        """
+        if batch_score_fn is None:
+            self.heap.clear()
+            for slot in range(len(self.registry)):
+                self.update(slot)
+            return
+        values = self.registry.values[:len(self.registry)]
+        scores = batch_score_fn(values).tolist()
+        self.base_scores = dict(enumerate(scores))
+        for slot, offset in self.offsets.items():
+            scores[slot] += offset
+        self.heap.rebuild(scores)
+        for slot in self.excluded:
+            self.heap.remove(slot)
+
+    def best(self):
+        """Return (node_id, score) of the best node, or (None, inf)."""
+        slot, score = self.heap.peek()
+        if slot is None:
+            return None, score
+        return self.registry.node_ids[slot], score
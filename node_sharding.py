@@ -0,0 +1,28 @@
+"""Stable assignment of nodes to the shards of sharded_aggregation.py.
+
+A node id hashes (crc32, the same in every process, unlike hash()) into
+one of SHARD_BUCKETS buckets, and shard k of n owns the buckets b with
+b % n == k. DDS nodes publish their metrics in their bucket's partition
+(dds_types.metrics_partition), so a regional aggregator joins only its
+buckets' partitions and the middleware delivers it only its shard's
+samples, whatever the number of shards. Dependency-free so nodes,
+Zenoh-only deployments and the DDS types can all import it.
+"""
+import zlib
+
+SHARD_BUCKETS = 64  # Also the largest usable number of shards
+
+def bucket_of(node_id):
+    return zlib.crc32(node_id.encode()) % SHARD_BUCKETS
+
+def shard_of(node_id, shards):
+    """Shard of node_id when the nodes are split into `shards` shards."""
+    return bucket_of(node_id) % shards
+
+def shard_buckets(shard, shards):
+    """Buckets owned by shard `shard` of `shards`."""
+    if not 1 <= shards <= SHARD_BUCKETS:
+        raise ValueError(f"Hash sharding supports 1 to {SHARD_BUCKETS} shards, got {shards}")
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} out of range for {shards} shards")
+    return list(range(shard, SHARD_BUCKETS, shards))
@@ -0,0 +1,62 @@
+import numpy as np
+from node_registry import METRIC_COLUMNS, CPU, MEMORY, BATTERY, LOAD
+
+DEFAULT_WEIGHT = 0.7  # Weight used for a metric missing from the weights dict
+DEFAULT_WEIGHTS = {"CPU": 0.25, "Memory": 0.25, "Battery": 0.25, "Load": 0.25}  # Aggregator defaults
+
+# Per-node scoring (reference implementation used on the ingest path)
+def calculate_score(data, selection_criteria, weights):
+    if selection_criteria == "ALL":
+        scores = [
+            calculate_score_for_metric("CPU", data, weights),
+            calculate_score_for_metric("Memory", data, weights),
+            calculate_score_for_metric("Battery", data, weights),
+            calculate_score_for_metric("Load", data, weights)
+        ]
+        return sum(scores) / len(scores)
+    return calculate_score_for_metric(selection_criteria, data, weights)
+
+def calculate_score_for_metric(metric, data, weights):
+    metric_value = {
+        "CPU": data.cpu_load,
+        "Memory": data.memory_usage,
+        "Battery": data.battery_level,
+        "Load": data.load_avg
+    }[metric]
+
+    if metric in ["CPU", "Load", "Memory"]:
+        normalized_value = 1 / (1 + metric_value)  # Lower is better, so inverse
+    elif metric == "Battery":
+        normalized_value = metric_value / 100  # Assumes the max value is 100
+    else:
+        normalized_value = metric_value
+
+    return normalized_value * weights.get(metric, DEFAULT_WEIGHT)
+
+# Batch scoring over the whole fleet
+def score_fleet(values, selection_criteria, weights):
+    """Score every row of an (N, 4) metric matrix in one vectorized pass.
+
+    Columns follow node_registry.METRIC_COLUMNS. Returns (scores, argmin)
+    where argmin is the row of the lowest score (first one on ties) or None
+    for an empty fleet. The arithmetic mirrors calculate_score step by step,
+    so the float64 results are bit-identical to the per-node functions.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if selection_criteria == "ALL":
+        cpu = (1.0 / (1.0 + values[:, CPU])) * weights.get("CPU", DEFAULT_WEIGHT)
+        memory = (1.0 / (1.0 + values[:, MEMORY])) * weights.get("Memory", DEFAULT_WEIGHT)
+        battery = (values[:, BATTERY] / 100) * weights.get("Battery", DEFAULT_WEIGHT)
+        load = (1.0 / (1.0 + values[:, LOAD])) * weights.get("Load", DEFAULT_WEIGHT)
+        # Same left-to-right summation order as sum() in calculate_score
+        scores = (((cpu + memory) + battery) + load) / 4
+    else:
+        column = values[:, METRIC_COLUMNS.index(selection_criteria)]
+        if selection_criteria == "Battery":
+            normalized = column / 100
+        else:
+            normalized = 1.0 / (1.0 + column)
+        scores = normalized * weights.get(selection_criteria, DEFAULT_WEIGHT)
+
+    best = int(np.argmin(scores)) if len(scores) else None
+    return scores, best
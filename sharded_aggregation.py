@@ -0,0 +1,491 @@
+"""Two-tier, sharded aggregation across several aggregator processes.
+
+One aggregator ingesting every node's samples is both a throughput ceiling
+and a single point of failure. In sharded mode:
+
+  regional aggregators  each own a shard of the nodes and ingest, coalesce
+                        and score only their samples (an AggregatorCore
+                        that never dispatches). Every --summary-interval
+                        they publish a summary: their --top-k best nodes
+                        with latest metrics and executor state
+                        (AggregatorCore.top_candidates)
+  root aggregator       merges the summaries (AggregatorCore.post_summary)
+                        and dispatches tasks straight to the nodes, which
+                        acknowledge to it as usual
+
+A node's shard is chosen by
+  hash    node_sharding.shard_of: a crc32 bucket of the node id, buckets
+          split between the shards; works with unmodified nodes. DDS
+          nodes publish in their bucket's partition and a region joins
+          only its own buckets', so the middleware delivers only the
+          shard's samples. Over Zenoh every region still receives and
+          decodes every sample and drops the other shards' ones before
+          they reach its core
+  prefix  (Zenoh only) nodes publish on zenoh/node_metrics/<prefix> and
+          the region subscribes to zenoh/node_metrics/<prefix>/**, so the
+          network delivers only the shard's samples
+          (fleet_simulator.py --key-prefix)
+
+Ingest work (registry, coalescing, scoring) in a region is proportional to
+its shard, and the root's to regions x top-k per interval, so ingest
+capacity grows with the number of regions. With prefix sharding, or hash
+sharding over DDS, receiving and decoding is split as well. A region that stops reporting only takes its
+own nodes out of selection, after the root's region_timeout; restarting it
+brings them back with its next summary.
+
+Usage:
+    python sharded_aggregation.py region --name r0 --shard 0 --shards 4 [--transport zenoh]
+    python sharded_aggregation.py region --name r0 --key-prefix r0
+    python sharded_aggregation.py root [--transport zenoh] [--task-rate 100]
+    python sharded_aggregation.py local --shards 4 --nodes 4000 [--sharding hash|prefix]
+
+local runs a root, --shards regions and one fleet_simulator process per
+shard on this machine. After --warmup seconds it measures for --duration
+and prints each process's rates, so you can compare --shards 1 with 4.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+import psutil
+
+import wire_codec
+from aggregator_core import AggregatorCore
+from node_sharding import shard_buckets, shard_of
+
+METRICS_KEY = "zenoh/node_metrics"
+TASK_KEY = "zenoh/task_assignments"  # Task batches go to f"{TASK_KEY}/{node_id}"
+ACK_KEY = "zenoh/task_acks"
+SUMMARY_KEY = "zenoh/region_summaries"  # Summaries go to f"{SUMMARY_KEY}/{region}"
+LIVELINESS_KEY = "zenoh/node_liveliness"  # Nodes declare a token at f"{LIVELINESS_KEY}/{node_id}"
+
+def _receive_loop(receiver, handle, name):
+    while True:
+        try:
+            for sample in receiver.receive():
+                handle(sample)
+        except Exception as e:
+            print(f"Error in DDS {name} listener: {e}")
+            traceback.print_exc()
+
+class ZenohShardTransport:
+    def __init__(self):
+        import zenoh
+
+        self.session = zenoh.open(zenoh.Config())
+        self.SampleKind = zenoh.SampleKind
+        self.codec = wire_codec.get_codec("binary")  # Task batches and region summaries
+        self.task_publishers = {}
+        self.summary_publisher = None
+        self.subscribers = []
+
+    def _subscribe(self, key, handle, name):
+        def callback(sample):
+            try:
+                handle(sample.payload.to_bytes())
+            except Exception as e:
+                print(f"Error processing Zenoh {name}: {e}")
+                traceback.print_exc()
+        self.subscribers.append(self.session.declare_subscriber(key, callback))
+
+    # Regional side
+    def subscribe_metrics(self, on_sample, shard=0, shards=1, key_prefix=None, on_lost=None):
+        if on_lost is not None:
+            # Tokens of every node; on_lost ignores nodes outside the shard it never saw
+            def liveliness(sample):
+                if sample.kind == self.SampleKind.DELETE:
+                    on_lost(str(sample.key_expr).rsplit("/", 1)[-1])
+            self.subscribers.append(self.session.liveliness().declare_subscriber(f"{LIVELINESS_KEY}/*", liveliness))
+        if key_prefix is not None or shards == 1:
+            key = f"{METRICS_KEY}/**" if key_prefix is None else f"{METRICS_KEY}/{key_prefix}/**"
+            self._subscribe(key, lambda payload: on_sample(wire_codec.decode_metrics(payload)), "metrics")
+            return
+
+        def handle(payload):
+            fields = wire_codec.decode_metrics(payload)
+            if shard_of(fields[0], shards) == shard:
+                on_sample(fields)
+        self._subscribe(f"{METRICS_KEY}/**", handle, "metrics")
+
+    def publish_summary(self, region, node_count, entries):
+        if self.summary_publisher is None:
+            self.summary_publisher = self.session.declare_publisher(f"{SUMMARY_KEY}/{region}")
+        self.summary_publisher.put(self.codec.encode_region_summary(region, node_count, entries))
+
+    # Root side
+    def subscribe_summaries(self, on_summary):
+        self._subscribe(f"{SUMMARY_KEY}/*", lambda payload: on_summary(*wire_codec.decode_region_summary(payload)),
+                        "region summary")
+
+    def subscribe_acks(self, on_ack):
+        self._subscribe(ACK_KEY, lambda payload: on_ack(*wire_codec.decode_task_ack(payload)), "task ack")
+
+    def publish_tasks(self, node_id, tasks):
+        publisher = self.task_publishers.get(node_id)
+        if publisher is None:
+            publisher = self.task_publishers[node_id] = self.session.declare_publisher(f"{TASK_KEY}/{node_id}")
+        publisher.put(self.codec.encode_task_batch(node_id, tasks))
+
+    def close(self):
+        self.session.close()
+
+class DdsShardTransport:
+    def __init__(self, max_batch=256, receive_timeout=1.0):
+        from cyclonedds.core import Policy, Qos
+        from cyclonedds.domain import DomainParticipant
+        from cyclonedds.pub import Publisher
+        from cyclonedds.sub import Subscriber
+
+        self.Policy, self.Qos = Policy, Qos
+        self.max_batch = max_batch
+        self.receive_timeout = receive_timeout
+        self.participant = DomainParticipant()  # Default domain, like the nodes
+        self.publisher = Publisher(self.participant)
+        self.subscriber = Subscriber(self.participant)
+        self.summary_writer = None
+        self.task_topic = None
+        self.task_writers = {}
+
+    def _topic(self, name, data_type):
+        from cyclonedds.topic import Topic
+        return Topic(self.participant, name, data_type)
+
+    def _listen(self, topic, history, handle, name, qos=None, on_not_alive=None, subscriber=None):
+        from cyclonedds.sub import DataReader
+        from dds_receive import BatchedDdsReceiver
+
+        Policy = self.Policy
+        if qos is None:
+            qos = self.Qos(Policy.Reliability.Reliable(1), Policy.Durability.Volatile, history)
+        reader = DataReader(subscriber or self.subscriber, topic, qos=qos)
+        receiver = BatchedDdsReceiver(reader, max_batch=self.max_batch, timeout=self.receive_timeout,
+                                      on_not_alive=on_not_alive)
+        threading.Thread(target=_receive_loop, args=(receiver, handle, name), daemon=True).start()
+
+    def _writer(self, topic, history, publisher=None):
+        from cyclonedds.pub import DataWriter
+        Policy = self.Policy
+        return DataWriter(publisher or self.publisher, topic, qos=self.Qos(Policy.Reliability.Reliable(1),
+                                                                           Policy.Durability.Volatile, history))
+
+    # Regional side
+    def subscribe_metrics(self, on_sample, shard=0, shards=1, key_prefix=None, on_lost=None):
+        from cyclonedds.sub import Subscriber
+        from dds_types import ALL_METRICS_PARTITIONS, METRICS_QOS, METRICS_TOPIC, nodeMetrics, shard_metrics_partitions
+
+        if key_prefix is not None:
+            raise ValueError("Key-prefix sharding needs Zenoh key expressions; use hash sharding with DDS")
+        # Nodes publish in their shard bucket's partition: join only this shard's buckets
+        partitions = ALL_METRICS_PARTITIONS if shards == 1 else shard_metrics_partitions(shard, shards)
+        subscriber = Subscriber(self.participant, qos=self.Qos(self.Policy.Partition(partitions)))
+
+        def handle(msg):
+            on_sample((msg.node_id, msg.cpu_load, msg.memory_usage, msg.battery_level, msg.load_avg,
+                       msg.timestamp, msg.running_tasks, msg.queue_length, msg.task_capacity))
+        # Instances whose writer lost liveliness (METRICS_LEASE) come back as invalid samples
+        on_not_alive = None if on_lost is None else lambda key: on_lost(key.node_id)
+        self._listen(self._topic(METRICS_TOPIC, nodeMetrics), self.Policy.History.KeepLast(1), handle, "metrics",
+                     METRICS_QOS, on_not_alive, subscriber)
+
+    def publish_summary(self, region, node_count, entries):
+        from dds_types import SUMMARY_TOPIC, RegionSummary
+
+        if self.summary_writer is None:
+            self.summary_writer = self._writer(self._topic(SUMMARY_TOPIC, RegionSummary),
+                                               self.Policy.History.KeepLast(1))
+        columns = list(zip(*entries)) if entries else [()] * 9
+        self.summary_writer.write(RegionSummary(
+            region=region, node_count=node_count, node_ids=list(columns[0]), cpu_load=list(columns[1]),
+            memory_usage=list(columns[2]), battery_level=list(columns[3]), load_avg=list(columns[4]),
+            timestamps=list(columns[5]), running_tasks=list(columns[6]), queue_length=list(columns[7]),
+            task_capacity=list(columns[8])))
+
+    # Root side
+    def subscribe_summaries(self, on_summary):
+        from dds_types import SUMMARY_TOPIC, RegionSummary
+
+        def handle(summary):
+            on_summary(summary.region, summary.node_count, list(zip(
+                summary.node_ids, summary.cpu_load, summary.memory_usage, summary.battery_level,
+                summary.load_avg, summary.timestamps, summary.running_tasks, summary.queue_length,
+                summary.task_capacity)))
+        # Only the latest summary of each region matters
+        self._listen(self._topic(SUMMARY_TOPIC, RegionSummary), self.Policy.History.KeepLast(1),
+                     handle, "region summary")
+
+    def subscribe_acks(self, on_ack):
+        from dds_types import ACK_TOPIC, TaskAck
+        self._listen(self._topic(ACK_TOPIC, TaskAck), self.Policy.History.KeepAll,
+                     lambda ack: on_ack(ack.node_id, ack.task_ids, ack.completed_at, ack.rejected_task_ids),
+                     "task ack")
+
+    def publish_tasks(self, node_id, tasks):
+        from cyclonedds.pub import Publisher
+        from dds_types import TASK_TOPIC, TaskBatch, task_partition
+
+        writer = self.task_writers.get(node_id)
+        if writer is None:
+            if self.task_topic is None:
+                self.task_topic = self._topic(TASK_TOPIC, TaskBatch)
+            # One writer per node, in the node's partition, so the batch reaches only that node
+            publisher = Publisher(self.participant, qos=self.Qos(self.Policy.Partition([task_partition(node_id)])))
+            writer = self.task_writers[node_id] = self._writer(self.task_topic, self.Policy.History.KeepAll, publisher)
+        writer.write(TaskBatch(node_id=node_id, task_ids=[task_id for task_id, _ in tasks],
+                               tasks=[task for _, task in tasks]))
+
+    def close(self):
+        pass
+
+TRANSPORTS = {"dds": DdsShardTransport, "zenoh": ZenohShardTransport}
+
+def _no_dispatch(node_id, tasks):
+    raise RuntimeError("Regional aggregators do not dispatch tasks")
+
+class RegionalAggregator:
+    def __init__(self, transport, name, shard=0, shards=1, key_prefix=None, top_k=8, summary_interval=0.25,
+                 csv_file_path=None, **core_options):
+        if key_prefix is None:
+            shard_buckets(shard, shards)  # Raises ValueError for a shard hash sharding cannot split off
+        self.transport = transport
+        self.name = name
+        self.shard = shard
+        self.shards = shards
+        self.key_prefix = key_prefix
+        self.top_k = top_k
+        self.summary_interval = summary_interval
+        if csv_file_path is None:
+            csv_file_path = os.path.join(tempfile.gettempdir(), f"region_{name}_optimal_node_data.csv")
+        self.core = AggregatorCore(_no_dispatch, csv_file_path, decision_task=None, **core_options)
+        self.summaries_published = 0
+        self._stop = threading.Event()
+
+    def start(self):
+        self.core.start()
+        self.transport.subscribe_metrics(self.core.post_sample, self.shard, self.shards, self.key_prefix,
+                                         on_lost=self.core.post_liveliness_lost)
+        threading.Thread(target=self._summary_loop, name=f"region-{self.name}-summaries", daemon=True).start()
+        return self
+
+    def _summary_loop(self):
+        core = self.core
+        while not self._stop.wait(self.summary_interval):
+            try:
+                entries = core.call(core.top_candidates, self.top_k)
+                self.transport.publish_summary(self.name, len(core.node_metrics), entries)
+                self.summaries_published += 1
+            except Exception as e:
+                print(f"Error publishing region summary: {e}")
+                traceback.print_exc()
+
+    def stop(self):
+        self._stop.set()
+        self.core.stop()
+
+    def stats(self):
+        return {"region": self.name, "nodes": len(self.core.node_metrics), "samples": self.core.samples_total.value,
+                "summaries": self.summaries_published, "inbox_dropped": self.core.inbox.dropped}
+
+class RootAggregator:
+    def __init__(self, transport, csv_file_path=None, **core_options):
+        self.transport = transport
+        if csv_file_path is None:
+            csv_file_path = os.path.join(tempfile.gettempdir(), "root_optimal_node_data.csv")
+        self.core = AggregatorCore(transport.publish_tasks, csv_file_path, decision_task=None, **core_options)
+        self.region_nodes = {}  # region -> nodes in its shard, from its latest summary
+
+    def start(self):
+        self.core.start()
+        self.transport.subscribe_summaries(self._on_summary)
+        self.transport.subscribe_acks(self.core.post_ack)
+        return self
+
+    def _on_summary(self, region, node_count, entries):
+        self.region_nodes[region] = node_count
+        self.core.post_summary(region, entries)
+
+    def stop(self):
+        self.core.stop()
+
+    def stats(self):
+        core = self.core
+        regions = core.call(core.region_stats)
+        for region, stats in regions.items():
+            stats["nodes"] = self.region_nodes.get(region, 0)
+        return {"regions": regions, "fleet_nodes": sum(stats["nodes"] for stats in regions.values()),
+                "summaries": core.summaries_merged.value, "tasks_completed": core.tasks_completed.value,
+                "best_node": core.best_node}
+
+# Command line
+def _submit_tasks(core, rate, start_at=0.0):
+    time.sleep(max(0.0, start_at - time.time()))
+    interval = 1.0 / rate
+    next_at = time.monotonic()
+    while True:
+        core.submit_task("Perform task")
+        next_at += interval
+        time.sleep(max(0.0, next_at - time.monotonic()))
+
+def _measure(counters, args):
+    """{name: rate per second} of counters() over the --warmup/--duration window, plus CPU%."""
+    process = psutil.Process()
+    time.sleep(max(0.0, args.start_at + args.warmup - time.time()))
+    before, cpu_before, started = counters(), process.cpu_times(), time.monotonic()
+    time.sleep(args.duration)
+    after, cpu_after, elapsed = counters(), process.cpu_times(), time.monotonic() - started
+    result = {f"{name}_per_s": (after[name] - before[name]) / elapsed for name in after}
+    cpu = (cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system)
+    result["cpu_percent"] = 100.0 * cpu / elapsed
+    return result
+
+def _finish(args, result):
+    if args.result:
+        with open(args.result + ".tmp", "w") as file:
+            json.dump(result, file)
+        os.replace(args.result + ".tmp", args.result)
+    # Transport threads (Zenoh callbacks, DDS listeners) would keep the process alive
+    os._exit(0)
+
+def run_region(args):
+    if args.key_prefix is None and args.shard is None:
+        raise SystemExit("region needs --shard (hash sharding) or --key-prefix (prefix sharding)")
+    region = RegionalAggregator(TRANSPORTS[args.transport](), args.name, args.shard or 0, args.shards,
+                                args.key_prefix, args.top_k, args.summary_interval, selection_criteria=args.criteria)
+    # The core prints every scoring decision; keep stdout for the reports only
+    report, sys.stdout = sys.stdout, open(os.devnull, "w")
+    region.start()
+    if args.start_at is not None:
+        stats = region.stats
+        result = _measure(lambda: {key: stats()[key] for key in ("samples", "summaries")}, args)
+        result.update(role="region", name=args.name, nodes=len(region.core.node_metrics))
+        _finish(args, result)
+    while True:
+        time.sleep(args.report_interval)
+        print(json.dumps(region.stats()), file=report, flush=True)
+
+def run_root(args):
+    root = RootAggregator(TRANSPORTS[args.transport](), selection_criteria=args.criteria,
+                          dispatch_policy=args.policy, in_flight_penalty=args.penalty).start()
+    if args.task_rate > 0:
+        threading.Thread(target=_submit_tasks, args=(root.core, args.task_rate, args.start_at or 0.0),
+                         daemon=True).start()
+    if args.start_at is not None:
+        sys.stdout = open(os.devnull, "w")
+        core = root.core
+        result = _measure(lambda: {"summaries": core.summaries_merged.value,
+                                   "tasks_completed": core.tasks_completed.value}, args)
+        stats = root.stats()
+        result.update(role="root", fleet_nodes=stats["fleet_nodes"], regions=len(stats["regions"]),
+                      candidates=len(core.node_metrics) - len(core.withdrawn),
+                      task_p99_ms=core.task_latency.percentile(0.99) * 1e3)
+        _finish(args, result)
+    while True:
+        time.sleep(args.report_interval)
+        print(json.dumps(root.stats()))
+
+def run_local(args):
+    if args.sharding == "prefix" and args.transport != "zenoh":
+        raise SystemExit("Prefix sharding needs --transport zenoh")
+    start_at = time.time() + args.startup
+    timing = ["--start-at", repr(start_at), "--warmup", str(args.warmup), "--duration", str(args.duration)]
+    common = ["--transport", args.transport, "--criteria", args.criteria]
+    script = os.path.abspath(__file__)
+    fleet_script = os.path.join(os.path.dirname(script), "fleet_simulator.py")
+    with tempfile.TemporaryDirectory() as workdir:
+        children = []
+
+        def spawn(name, command):
+            result_path = os.path.join(workdir, f"{name}.json")
+            children.append((name, result_path, subprocess.Popen(command + ["--result", result_path])))
+
+        spawn("root", [sys.executable, script, "root", "--task-rate", str(args.task_rate)] + common + timing)
+        for shard in range(args.shards):
+            sharding = (["--key-prefix", f"r{shard}"] if args.sharding == "prefix"
+                        else ["--shard", str(shard), "--shards", str(args.shards)])
+            spawn(f"r{shard}", [sys.executable, script, "region", "--name", f"r{shard}", "--top-k", str(args.top_k)]
+                  + sharding + common + timing)
+        fleets = []
+        for shard in range(args.shards):
+            command = [sys.executable, fleet_script, "--transport", args.transport, "--prefix", f"r{shard}",
+                       "--nodes", str(args.nodes // args.shards), "--interval", str(args.interval),
+                       "--service-ms", "1", "--duration", str(args.startup + args.warmup + args.duration + 10)]
+            if args.sharding == "prefix":
+                command += ["--key-prefix", f"r{shard}"]
+            fleets.append(subprocess.Popen(command, stdout=subprocess.DEVNULL))
+
+        deadline = start_at + args.warmup + args.duration + 30
+        results = []
+        for name, result_path, child in children:
+            try:
+                child.wait(max(0.0, deadline - time.time()))
+            except subprocess.TimeoutExpired:
+                child.kill()
+                child.wait()
+            if os.path.exists(result_path):
+                with open(result_path) as file:
+                    results.append(json.load(file))
+            else:
+                results.append({"role": name, "error": f"exit code {child.returncode}"})
+        for fleet in fleets:
+            fleet.kill()
+            fleet.wait()
+
+    published = args.nodes // args.shards * args.shards / args.interval
+    print(f"{args.shards} shard(s), {args.sharding} sharding, {args.transport}, "
+          f"{args.nodes} nodes publishing {published:.0f} samples/s")
+    ingest = 0.0
+    for result in results:
+        if "error" in result:
+            print(f"  {result['role']}: failed ({result['error']})")
+        elif result["role"] == "region":
+            ingest += result["samples_per_s"]
+            print(f"  region {result['name']:>4}: {result['nodes']:>6} nodes  {result['samples_per_s']:>8.0f} samples/s  "
+                  f"{result['summaries_per_s']:>5.1f} summaries/s  CPU {result['cpu_percent']:.0f}%")
+        else:
+            print(f"  root       : {result['fleet_nodes']:>6} nodes  {result['summaries_per_s']:>8.1f} summaries/s  "
+                  f"{result['candidates']:>4} candidates  {result['tasks_completed_per_s']:.0f} tasks/s  "
+                  f"task p99 {result['task_p99_ms']:.1f} ms  CPU {result['cpu_percent']:.0f}%")
+    print(f"  total ingest: {ingest:.0f} samples/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    region = commands.add_parser("region", help="Run a regional aggregator for one shard")
+    region.add_argument("--name", required=True)
+    region.add_argument("--shard", type=int, help="Hash sharding: this region's shard index")
+    region.add_argument("--shards", type=int, default=1, help="Hash sharding: number of shards")
+    region.add_argument("--key-prefix", help="Prefix sharding (Zenoh): zenoh/node_metrics/<prefix>/**")
+    region.add_argument("--top-k", type=int, default=8, help="Candidates per summary")
+    region.add_argument("--summary-interval", type=float, default=0.25)
+    root = commands.add_parser("root", help="Run the root aggregator that merges the regional summaries")
+    root.add_argument("--task-rate", type=float, default=0.0, help="Submit this many tasks per second")
+    root.add_argument("--policy", default="argmin")
+    root.add_argument("--penalty", type=float, default=0.0, help="In-flight penalty per task")
+    local = commands.add_parser("local", help="Run a root, the regions and a simulated fleet on this machine")
+    local.add_argument("--shards", type=int, default=4)
+    local.add_argument("--sharding", choices=["hash", "prefix"], default="hash")
+    local.add_argument("--nodes", type=int, default=4000)
+    local.add_argument("--interval", type=float, default=1.0, help="Seconds between a node's publishes")
+    local.add_argument("--top-k", type=int, default=8)
+    local.add_argument("--task-rate", type=float, default=100.0)
+    local.add_argument("--startup", type=float, default=5.0, help="Seconds allowed for every process to start")
+    for command in (region, root, local):
+        command.add_argument("--transport", default="zenoh", choices=sorted(TRANSPORTS))
+        command.add_argument("--criteria", default="CPU", choices=["CPU", "Memory", "Battery", "Load", "ALL"])
+        command.add_argument("--warmup", type=float, default=3.0)
+        command.add_argument("--duration", type=float, default=10.0)
+    for command in (region, root):
+        command.add_argument("--report-interval", type=float, default=5.0, help="Seconds between stats lines")
+        # Internal: measure one window and write the result (see local)
+        command.add_argument("--start-at", type=float, help=argparse.SUPPRESS)
+        command.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    {"region": run_region, "root": run_root, "local": run_local}[args.command](args)
+
+if __name__ == "__main__":
+    main()
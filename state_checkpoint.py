@@ -0,0 +1,112 @@
+"""Memory-mapped checkpoint file of the aggregator state.
+
+A checkpoint is one file: a fixed prefix, a JSON header and the raw
+arrays, each starting on a 64-byte boundary:
+
+    b"AGGSTATE" | version (u4) | header length (u4) | header JSON | arrays
+
+The header holds the scalar state ("meta": criteria, weights, dispatch
+settings, ...) and the layout of every array ("arrays": name -> offset
+from the end of the header, dtype, shape). Strings such as node ids and
+task payloads are stored as a utf-8 blob plus an int64 offsets array (see
+pack_strings()).
+
+write_checkpoint() fills a new file through np.memmap and renames it over
+the previous checkpoint, so a crash mid-write leaves the old one intact.
+read_checkpoint() maps the file read-only and returns views of the arrays
+without parsing or copying them, so restoring a large registry costs a
+few array copies.
+
+Usage:
+    python state_checkpoint.py summary <checkpoint>
+"""
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"AGGSTATE"
+VERSION = 1
+PREFIX = struct.Struct("<8sII")
+ALIGNMENT = 64
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def pack_strings(strings):
+    """(offsets, blob): string i is blob[offsets[i]:offsets[i + 1]] in utf-8."""
+    encoded = [str(string).encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+def unpack_strings(offsets, blob):
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end].decode() for start, end in zip(bounds, bounds[1:])]
+
+def write_checkpoint(path, meta, arrays):
+    """Write meta (JSON-serializable) and arrays (name -> ndarray) to path; returns the file size."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = _align(offset)
+        layout[name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+        offset += array.nbytes
+    header = json.dumps({"meta": meta, "arrays": layout}).encode()
+    data_start = _align(PREFIX.size + len(header))
+    size = data_start + offset
+
+    temporary = path + ".tmp"
+    mapped = np.memmap(temporary, dtype=np.uint8, mode="w+", shape=(size,))
+    mapped[:PREFIX.size] = np.frombuffer(PREFIX.pack(MAGIC, VERSION, len(header)), dtype=np.uint8)
+    mapped[PREFIX.size:PREFIX.size + len(header)] = np.frombuffer(header, dtype=np.uint8)
+    for name, array in arrays.items():
+        start = data_start + layout[name]["offset"]
+        mapped[start:start + array.nbytes] = array.reshape(-1).view(np.uint8)
+    mapped.flush()
+    del mapped
+    os.replace(temporary, path)
+    return size
+
+def read_checkpoint(path):
+    """(meta, arrays) of a checkpoint; arrays are read-only views of the mapped file."""
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+    magic, version, header_length = PREFIX.unpack(mapped[:PREFIX.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an aggregator checkpoint")
+    if version != VERSION:
+        raise ValueError(f"{path} has checkpoint version {version}; expected {VERSION}")
+    header = json.loads(mapped[PREFIX.size:PREFIX.size + header_length].tobytes())
+    data_start = _align(PREFIX.size + header_length)
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        start = data_start + entry["offset"]
+        arrays[name] = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(entry["shape"])
+    return header["meta"], arrays
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect an aggregator state checkpoint")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="Print the checkpoint's settings and array sizes")
+    summary_parser.add_argument("path")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    meta, arrays = read_checkpoint(args.path)
+    elapsed = time.perf_counter() - started
+    print(f"{args.path}: {os.path.getsize(args.path)} bytes, mapped in {elapsed * 1000:.2f} ms")
+    print(f"saved {time.time() - meta['saved_at']:.1f} s ago")
+    for key, value in meta.items():
+        print(f"  {key}: {value}")
+    for name, array in arrays.items():
+        print(f"  {name:<20} {array.dtype.str:<5} {tuple(array.shape)}")
+
+if __name__ == "__main__":
+    main()
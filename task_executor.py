@@ -0,0 +1,111 @@
+"""Node-side task executor: a process pool with a bounded local queue.
+
+Tasks used to run inline on the node's task-listener thread, so a node
+could not take new work until the current task finished, and the GIL kept
+it on one core. NodeTaskExecutor hands at most max_workers tasks (default:
+one per core) to a process pool and queues up to max_queue more. A node is
+saturated when that queue is full; further submits are rejected so the
+node can report them back instead of silently piling up work.
+
+running_tasks, queue_length and task_capacity (max_workers + max_queue, the
+number of tasks the node accepts at once) are published in the node's
+metrics, and on_saturation_change lets the node publish as soon as it
+becomes saturated or frees up again instead of waiting for its next tick.
+"""
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+def simulate_load_task():
+    """Simulates a heavy load task by performing a mathematical operation in a loop."""
+    for _ in range(1000):
+        # Perform a dummy task that consumes CPU resources
+        result = sum([i * i for i in range(1000)])
+    return result
+
+def run_task(task_type):
+    """Run one task in a worker process; unknown task types are a no-op."""
+    if task_type == "load_task":
+        simulate_load_task()
+        return True
+    return False
+
+class NodeTaskExecutor:
+    def __init__(self, on_complete, max_workers=None, max_queue=None, on_saturation_change=None):
+        self.on_complete = on_complete  # on_complete(task_id, known_task_type)
+        self.on_saturation_change = on_saturation_change
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = 2 * self.max_workers if max_queue is None else max_queue
+        # spawn: forking a process that runs DDS/Zenoh threads is not safe
+        self.pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self.pending = deque()  # (task_id, task) waiting for a free worker
+        self.running = 0
+        self.lock = threading.RLock()
+        self._saturated = False
+
+        # Counters
+        self.completed = 0
+        self.rejected = 0
+
+    @property
+    def running_tasks(self):
+        return self.running
+
+    @property
+    def queue_length(self):
+        return len(self.pending)
+
+    @property
+    def task_capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def saturated(self):
+        return self._saturated
+
+    def submit(self, task_id, task):
+        """Run or queue a task; returns False if the queue is full."""
+        with self.lock:
+            if self.running < self.max_workers:
+                self._start(task_id, task)
+            elif len(self.pending) < self.max_queue:
+                self.pending.append((task_id, task))
+            else:
+                self.rejected += 1
+                return False
+            changed = self._update_saturation()
+        if changed:
+            self._notify()
+        return True
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, task_id, task):
+        self.running += 1
+        future = self.pool.submit(run_task, task)
+        future.add_done_callback(lambda done: self._done(task_id, done))
+
+    def _done(self, task_id, future):
+        with self.lock:
+            self.running -= 1
+            self.completed += 1
+            if self.pending:
+                self._start(*self.pending.popleft())
+            changed = self._update_saturation()
+        if changed:
+            self._notify()
+        known = not future.cancelled() and future.exception() is None and future.result()
+        self.on_complete(task_id, known)
+
+    def _update_saturation(self):
+        saturated = self.running >= self.max_workers and len(self.pending) >= self.max_queue
+        changed = saturated != self._saturated
+        self._saturated = saturated
+        return changed
+
+    def _notify(self):
+        if self.on_saturation_change is not None:
+            self.on_saturation_change(self._saturated)
@@ -0,0 +1,34 @@
+import os
+
+import csv_log_writer
+from csv_log_writer import BatchedCsvWriter
+
+def test_rows_are_written_and_rotated(tmp_path):
+    path = str(tmp_path / "log.csv")
+    writer = BatchedCsvWriter(path, batch_size=4, max_bytes=64, backup_count=2)
+    for i in range(40):
+        assert writer.submit(["node", i])
+    writer.close()
+    assert writer.rows_written == 40 and writer.dropped_rows == 0
+    assert writer.rotations > 0 and writer.rotation_errors == 0
+    rows = []
+    for name in (path + ".2", path + ".1", path):
+        if os.path.exists(name):
+            with open(name) as file:
+                rows.extend(line.strip() for line in file)
+    assert rows[-1] == "node,39" and len(rows) < 40  # The oldest backups were rotated away
+
+def test_failed_rotation_drops_no_rows(tmp_path, monkeypatch):
+    def replace(source, target):
+        raise OSError("read-only directory")
+    monkeypatch.setattr(csv_log_writer.os, "replace", replace)
+    path = str(tmp_path / "log.csv")
+    writer = BatchedCsvWriter(path, batch_size=4, max_bytes=16)
+    for i in range(12):
+        writer.submit(["node", i])
+        writer.flush()
+    writer.close()
+    assert writer.rows_written == 12 and writer.dropped_rows == 0
+    assert writer.rotation_errors > 0 and writer.rotations == 0
+    with open(path) as file:
+        assert len(file.readlines()) == 12
@@ -0,0 +1,31 @@
+import time
+
+from aggregator_core import AggregatorCore
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_dead_best_node_leaves_the_snapshot(tmp_path):
+    core = AggregatorCore(lambda node_id, tasks: None, str(tmp_path / "decisions.csv"), decision_task=None,
+                          score_interval=30.0)  # No scoring round republishes the snapshot meanwhile
+    core.start()
+    try:
+        now = time.time()
+        core.post_sample(("a", 5.0, 10.0, 90.0, 0.5, now))
+        core.post_sample(("b", 50.0, 10.0, 90.0, 0.5, now))
+        wait_until(lambda: core.snapshots.current.best_node is not None and len(core.node_metrics) == 2)
+        best = core.snapshots.current.best_node
+        other = "b" if best == "a" else "a"
+
+        core.post_liveliness_lost(best)
+        wait_until(lambda: core.snapshots.current.best_node == other)
+        assert core.call(core.liveness_stats)["dead"].keys() == {best}
+
+        # A fresh sample brings the node back into selection
+        core.post_sample((best, 5.0, 10.0, 90.0, 0.5, time.time()))
+        wait_until(lambda: not core.dead)
+    finally:
+        core.stop()
@@ -0,0 +1,43 @@
+import numpy as np
+
+import scoring
+from metric_forecast import MetricForecaster, forecast_series
+
+def make_series(seed=0, nodes=5, samples=200):
+    rng = np.random.default_rng(seed)
+    node_of = rng.integers(0, nodes, samples)
+    values = np.column_stack([rng.uniform(0, 100, samples), rng.uniform(0, 100, samples),
+                              rng.uniform(0, 100, samples), rng.uniform(0, 8, samples)])
+    return node_of, values
+
+def test_update_refit_and_forecast_series_agree():
+    node_of, values = make_series()
+    series = forecast_series(node_of, values)
+    forecaster = MetricForecaster(capacity=2, window=len(values))
+    for i, (slot, row) in enumerate(zip(node_of, values)):
+        assert np.array_equal(forecaster.update(int(slot), row), series[i])
+    incremental = forecaster.forecasts[:forecaster.node_count].copy()
+    forecaster.refit()
+    assert np.array_equal(forecaster.forecasts[:forecaster.node_count], incremental)
+
+def test_first_sample_is_its_own_forecast():
+    forecaster = MetricForecaster()
+    assert np.array_equal(forecaster.update(0, [10.0, 20.0, 30.0, 1.0]), [10.0, 20.0, 30.0, 1.0])
+
+def test_moving_load_scores_worse_than_steady_load():
+    # Same latest sample; node 1's CPU has been climbing, node 0's has not
+    steady, rising = [50.0, 50.0, 50.0, 1.0], [50.0, 50.0, 50.0, 1.0]
+    forecaster = MetricForecaster()
+    for cpu in (20.0, 30.0, 40.0):
+        forecaster.update(0, steady)
+        forecaster.update(1, [cpu, 50.0, 50.0, 1.0])
+    forecaster.update(0, steady)
+    forecaster.update(1, rising)
+    scores, best = scoring.score_fleet(forecaster.forecasts[:2], "CPU", scoring.DEFAULT_WEIGHTS)
+    assert scores[1] > scores[0] and best == 0
+
+def test_battery_is_scored_as_sampled():
+    forecaster = MetricForecaster()
+    for battery in (90.0, 70.0, 50.0):
+        forecast = forecaster.update(0, [10.0, 10.0, battery, 1.0])
+    assert forecast[2] == 50.0
@@ -0,0 +1,34 @@
+import numpy as np
+
+from node_registry import NodeRegistry
+
+def test_upsert_reuses_the_node_slot():
+    registry = NodeRegistry(capacity=4)
+    assert registry.upsert("a", 1, 2, 3, 4, 10.0) == 0
+    assert registry.upsert("b", 5, 6, 7, 8, 11.0) == 1
+    assert registry.upsert("a", 9, 9, 9, 9, 12.0) == 0
+    assert len(registry) == 2 and registry.node_ids == ["a", "b"]
+    assert registry.record("a") == ("a", 9.0, 9.0, 9.0, 9.0, 12.0)
+    assert registry.record("a").cpu_load == registry.record("a")["cpu_load"] == 9.0
+    assert registry.generations[:2].tolist() == [2, 1]
+    assert registry.record("missing") is None and "missing" not in registry
+
+def test_growth_keeps_every_row():
+    registry = NodeRegistry(capacity=2)
+    for i in range(100):
+        assert registry.upsert(f"n{i}", i, i + 1, i + 2, i + 3, float(i)) == i
+    assert registry.capacity >= 100 and registry.capacity & (registry.capacity - 1) == 0
+    assert np.array_equal(registry.values[:100, 0], np.arange(100))
+    assert np.array_equal(registry.timestamps[:100], np.arange(100))
+    assert [record.node_id for record in registry] == [f"n{i}" for i in range(100)]
+    # Existing slots survive the growth
+    assert registry.upsert("n0", 7, 7, 7, 7, 1.0) == 0 and registry.slots["n99"] == 99
+
+def test_load_replaces_the_contents():
+    registry = NodeRegistry(capacity=2)
+    registry.upsert("old", 1, 1, 1, 1, 1.0)
+    values = np.arange(20, dtype=np.float64).reshape(5, 4)
+    registry.load(["a", "b", "c", "d", "e"], values, np.arange(5.0), np.ones(5, dtype=np.uint64))
+    assert len(registry) == 5 and "old" not in registry and registry.slots["e"] == 4
+    assert registry.record("c") == ("c", 8.0, 9.0, 10.0, 11.0, 2.0)
+    assert registry.upsert("f", 0, 0, 0, 0, 0.0) == 5
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from node_registry import NodeRegistry
+from node_selector import BestNodeSelector, IndexedMinHeap
+
+def check_heap(heap):
+    for i, slot in enumerate(heap.heap):
+        assert heap.position[slot] == i
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(heap.heap):
+                assert not heap._less(heap.heap[child], slot)
+    assert set(heap.position) == set(heap.scores) == set(heap.heap)
+
+def test_update_and_remove_keep_the_minimum():
+    rng = random.Random(0)
+    heap = IndexedMinHeap()
+    scores = {}
+    for _ in range(2000):
+        slot = rng.randrange(64)
+        if rng.random() < 0.25:
+            heap.remove(slot)
+            scores.pop(slot, None)
+        else:
+            score = rng.choice([rng.random(), 0.5])  # Repeated scores exercise the slot tie-break
+            heap.update(slot, score)
+            scores[slot] = score
+        check_heap(heap)
+        expected = min(((score, slot) for slot, score in scores.items()), default=(float('inf'), None))
+        assert heap.peek() == (expected[1], expected[0])
+
+def test_ties_go_to_the_lowest_slot():
+    heap = IndexedMinHeap()
+    for slot in (3, 1, 2):
+        heap.update(slot, 1.0)
+    assert heap.peek() == (1, 1.0)
+    heap.remove(1)
+    heap.remove(1)  # Removing a missing slot is a no-op
+    assert heap.peek() == (2, 1.0)
+
+def test_rebuild_matches_incremental_updates():
+    scores = [0.3, 0.1, 0.3, 0.2, 0.1]
+    rebuilt, incremental = IndexedMinHeap(), IndexedMinHeap()
+    rebuilt.rebuild(scores)
+    for slot, score in enumerate(scores):
+        incremental.update(slot, score)
+    check_heap(rebuilt)
+    assert rebuilt.peek() == incremental.peek() == (1, 0.1)
+
+@pytest.fixture
+def selector():
+    registry = NodeRegistry()
+    for node_id, cpu_load in (("a", 30.0), ("b", 10.0), ("c", 20.0)):
+        registry.upsert(node_id, cpu_load, 0, 0, 0, 0.0)
+    selector = BestNodeSelector(registry, lambda record: record.cpu_load)
+    for slot in range(3):
+        selector.update(slot)
+    return selector
+
+def test_exclusion_keeps_the_score(selector):
+    assert selector.best() == ("b", 10.0)
+    selector.exclude(1)
+    assert selector.best() == ("c", 20.0) and 1 not in selector.heap
+    selector.registry.upsert("b", 5.0, 0, 0, 0, 1.0)
+    selector.update(1)  # Rescored while excluded; stays out of selection
+    assert selector.best() == ("c", 20.0)
+    selector.include(1)
+    assert selector.best() == ("b", 5.0)
+
+def test_offsets_add_up_per_source(selector):
+    selector.set_offset(1, 15.0)
+    assert selector.best() == ("c", 20.0)
+    selector.set_offset(2, 20.0, "staleness")
+    assert selector.best() == ("b", 25.0)
+    selector.set_offset(1, 0.0)
+    assert selector.best() == ("b", 10.0) and 1 not in selector.offsets
+    assert selector.offsets == {2: 20.0}
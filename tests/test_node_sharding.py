@@ -0,0 +1,24 @@
+import pytest
+
+from node_sharding import SHARD_BUCKETS, bucket_of, shard_buckets, shard_of
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 7, SHARD_BUCKETS])
+def test_each_node_is_in_its_shards_buckets_only(shards):
+    owners = {}
+    for shard in range(shards):
+        for bucket in shard_buckets(shard, shards):
+            assert bucket not in owners
+            owners[bucket] = shard
+    assert sorted(owners) == list(range(SHARD_BUCKETS))
+    for index in range(500):
+        node_id = f"node_{index}"
+        assert owners[bucket_of(node_id)] == shard_of(node_id, shards)
+
+def test_bucket_is_stable():
+    # crc32 of the utf-8 id, unlike hash(), which is salted per process
+    assert bucket_of("node_1") == bucket_of("node_1") == 251332395 % SHARD_BUCKETS
+
+@pytest.mark.parametrize("shard, shards", [(0, 0), (0, SHARD_BUCKETS + 1), (2, 2), (-1, 2)])
+def test_unsupported_shards_raise(shard, shards):
+    with pytest.raises(ValueError):
+        shard_buckets(shard, shards)
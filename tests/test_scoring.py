@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import scoring
+from node_registry import NodeRegistry
+
+WEIGHT_SETS = [scoring.DEFAULT_WEIGHTS, {"CPU": 0.4, "Memory": 0.2, "Battery": 0.3, "Load": 0.1}, {"CPU": 1.0}]
+
+def random_fleet(size, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.column_stack([rng.uniform(0, 100, size), rng.uniform(0, 100, size),
+                              rng.uniform(0, 100, size), rng.uniform(0, 8, size)]).astype(np.float32)
+    values[:4] = [[0, 0, 0, 0], [0, 0, 100, 0], [100, 100, 0, 8], [0, 0, 0, 0]]  # Edges and a tie
+    return values.astype(np.float64)
+
+@pytest.mark.parametrize("criteria", ["CPU", "Memory", "Battery", "Load", "ALL"])
+@pytest.mark.parametrize("weights", WEIGHT_SETS)
+def test_score_fleet_is_bit_identical_to_calculate_score(criteria, weights):
+    values = random_fleet(2000)
+    registry = NodeRegistry()
+    for i, row in enumerate(values.tolist()):
+        registry.upsert(f"n{i}", *row, 0.0)
+    expected = [scoring.calculate_score(record, criteria, weights) for record in registry]
+
+    scores, best = scoring.score_fleet(registry.values[:len(registry)], criteria, weights)
+    assert scores.tolist() == expected  # Exact, not approximate
+    # Same node as min() over the per-node scores: first lowest on ties
+    assert best == min(range(len(expected)), key=expected.__getitem__)
+
+def test_score_fleet_of_an_empty_fleet():
+    scores, best = scoring.score_fleet(np.zeros((0, 4)), "ALL", scoring.DEFAULT_WEIGHTS)
+    assert len(scores) == 0 and best is None
@@ -0,0 +1,38 @@
+import time
+
+from aggregator_core import AggregatorCore
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_root_merges_summaries_beyond_initial_capacity(tmp_path):
+    # 30 regions x 50 nodes: more nodes than the registry's and coalescer's initial 1024 slots
+    checkpoint = tmp_path / "state.ckpt"
+    core = AggregatorCore(lambda node_id, tasks: None, str(tmp_path / "decisions.csv"), decision_task=None,
+                          checkpoint_path=str(checkpoint))
+    core.start()
+    try:
+        now = time.time()
+        for region in range(30):
+            entries = [(f"r{region}_n{i}", float((region * 50 + i) % 97), 10.0, 90.0, 0.5, now, 0, 0, 0)
+                       for i in range(50)]
+            assert core.post_summary(f"r{region}", entries)
+        wait_until(lambda: core.summaries_merged.value == 30)
+        stats = core.call(core.region_stats)
+        assert len(stats) == 30 and all(region["candidates"] == 50 for region in stats.values())
+        assert len(core.node_metrics) == 1500
+        assert core.coalescer.scored_at.shape[0] >= 1500
+        assert core.best_node is not None
+        # Listing a region's nodes again withdraws the ones it dropped
+        core.post_summary("r0", [(f"r0_n{i}", 1.0, 10.0, 90.0, 0.5, time.time(), 0, 0, 0) for i in range(10)])
+        wait_until(lambda: core.summaries_merged.value == 31)
+        assert core.call(lambda: len(core.withdrawn)) == 40
+    finally:
+        core.stop()
+    # stop() wrote a checkpoint covering every slot
+    restored = AggregatorCore(lambda node_id, tasks: None, str(tmp_path / "restored.csv"), decision_task=None,
+                              checkpoint_path=str(checkpoint))
+    assert restored.restore_report["nodes"] == 1500
@@ -0,0 +1,44 @@
+import time
+
+from aggregator_core import AggregatorCore
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_late_acks_from_the_previous_node_are_ignored(tmp_path):
+    sent = []
+    core = AggregatorCore(lambda node_id, tasks: sent.append((node_id, [task_id for task_id, _ in tasks])),
+                          str(tmp_path / "decisions.csv"), decision_task=None)
+    core.start()
+    try:
+        now = time.time()
+        core.post_sample(("a", 5.0, 10.0, 90.0, 0.5, now, 0, 0, 4))
+        core.post_sample(("b", 50.0, 10.0, 90.0, 0.5, now, 0, 0, 4))
+        wait_until(lambda: len(core.node_selector.heap) == 2)
+        task_id = core.submit_task("job")
+        wait_until(lambda: sent)
+        first = sent[0][0]
+        second = "b" if first == "a" else "a"
+
+        # The first node dies and the task is requeued, under the same id, to the other one
+        core.post_liveliness_lost(first)
+        wait_until(lambda: len(sent) == 2)
+        assert sent[1] == (second, [task_id])
+
+        # Its late rejection and completion must not touch the new assignment
+        core.post_ack(first, [], rejected_ids=[task_id])
+        core.post_ack(first, [task_id])
+        wait_until(lambda: core.stale_acks.value == 2)
+        second_slot = core.node_metrics.slots[second]
+        assert core.outstanding[task_id].slot == second_slot
+        assert second_slot not in core.reported_full
+        assert len(sent) == 2 and core.tasks_completed.value == 0
+
+        core.post_ack(second, [task_id])
+        wait_until(lambda: core.tasks_completed.value == 1)
+        assert task_id not in core.outstanding
+    finally:
+        core.stop()
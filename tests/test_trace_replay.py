@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import trace_replay
+
+@pytest.mark.parametrize("contents", ["", "Node_ID,Score,CPU,Memory,Battery,Load\n"])
+@pytest.mark.parametrize("policy, penalty, scoring_mode", [
+    ("argmin", 0.0, "reactive"),      # vectorized path
+    ("p2c", 0.05, "reactive"),        # exact path
+    ("argmin", 0.0, "predictive"),
+])
+def test_empty_trace_replays_to_zeroed_result(tmp_path, contents, policy, penalty, scoring_mode):
+    path = tmp_path / "empty.csv"
+    path.write_text(contents)
+    trace = trace_replay.load_trace(str(path))
+    assert trace.node_ids == [] and len(trace.nodes) == 0
+
+    result = trace_replay.replay(trace, policy=policy, penalty=penalty, scoring_mode=scoring_mode)
+    assert result["samples"] == result["tasks"] == result["nodes"] == result["nodes_used"] == 0
+    for key in ("max_share", "entropy", "gini", "uniformity_score", "samples_per_s",
+                "latency_p50_ms", "latency_p99_ms", "latency_max_ms"):
+        assert result[key] == 0.0, key
+
+def test_argmin_fast_without_nodes():
+    empty = np.zeros(0, dtype=np.int64)
+    chosen, chosen_rows = trace_replay._argmin_fast(empty, np.zeros(0), empty, 0)
+    assert len(chosen) == len(chosen_rows) == 0
+
+def test_vectorized_argmin_matches_replay_exact():
+    rng = np.random.default_rng(0)
+    samples, node_count = 500, 12
+    # Nodes numbered by first appearance, like load_trace(); few CPU levels so scores tie often
+    slots = {}
+    nodes = np.array([slots.setdefault(node, len(slots)) for node in rng.integers(0, node_count, samples).tolist()])
+    values = np.column_stack([rng.integers(0, 5, samples), rng.uniform(0, 100, samples),
+                              rng.uniform(0, 100, samples), rng.uniform(0, 8, samples)]).astype(np.float64)
+    trace = trace_replay.Trace("synthetic", [f"n{i}" for i in range(node_count)], nodes, values,
+                               np.full(samples, np.nan))
+    weights = {"CPU": 1.0}
+    scores, _ = trace_replay.scoring.score_fleet(values, "CPU", weights)
+    fast, _ = trace_replay._argmin_fast(nodes, scores, np.arange(samples), node_count)
+    exact, _, _ = trace_replay.replay_exact(trace, values, np.zeros(samples), np.ones(samples, dtype=bool),
+                                            "CPU", weights, "argmin", 0.0, 0.04)
+    assert np.array_equal(fast, exact)
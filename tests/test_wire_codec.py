@@ -0,0 +1,63 @@
+import pytest
+
+import wire_codec
+
+METRICS = ("node_7", 12.5, 40.25, 88.0, 1.5, 1700000000.25, 2, 3, 8)
+
+@pytest.mark.parametrize("name", sorted(wire_codec.CODECS))
+def test_round_trips(name):
+    codec = wire_codec.get_codec(name)
+    assert wire_codec.decode_metrics(codec.encode_metrics(*METRICS)) == METRICS
+    tasks = [(1, "Perform task"), (2 ** 40, "load_task"), (3, "")]
+    assert wire_codec.decode_task_batch(codec.encode_task_batch("node_7", tasks)) == ("node_7", tasks)
+    ack = wire_codec.decode_task_ack(codec.encode_task_ack("node_7", [1, 2], 1700000000.5, [3]))
+    assert ack == ("node_7", [1, 2], 1700000000.5, [3])
+    entries = [METRICS, ("node_9", 0.0, 100.0, 5.5, 0.0, 1700000001.75, 0, 0, 0)]
+    summary = wire_codec.decode_region_summary(codec.encode_region_summary("r0", 1234, entries))
+    assert summary == ("r0", 1234, entries)
+    assert wire_codec.decode_region_summary(codec.encode_region_summary("r1", 0, [])) == ("r1", 0, [])
+
+def test_binary_metrics_without_executor_fields():
+    # Older nodes stop after the node id; the executor fields default to 0
+    payload = wire_codec.get_codec("binary").encode_metrics(*METRICS[:6])[:-6]
+    assert wire_codec.decode_metrics(payload) == METRICS[:6] + (0, 0, 0)
+
+def test_binary_round_trip_is_exact_for_float32_values():
+    decoded = wire_codec.decode_metrics(wire_codec.get_codec("binary").encode_metrics("n", 0.1, 0.2, 0.3, 0.4, 0.5))
+    assert decoded[1] != 0.1 and decoded[1] == pytest.approx(0.1)  # float32 on the wire
+    assert decoded[5] == 0.5
+
+@pytest.mark.parametrize("encode", [
+    lambda codec: codec.encode_metrics("n" * 256, 1, 1, 1, 1, 1),
+    lambda codec: codec.encode_task_batch("n" * 256, []),
+    lambda codec: codec.encode_task_batch("n", [(1, "t" * 65536)]),
+    lambda codec: codec.encode_task_batch("n", [(i, "t") for i in range(65536)]),
+    lambda codec: codec.encode_task_ack("n", list(range(65536)), 1.0),
+    lambda codec: codec.encode_task_ack("n", [], 1.0, list(range(65536))),
+    lambda codec: codec.encode_region_summary("r" * 256, 0, []),
+    lambda codec: codec.encode_region_summary("r", 0, [("n" * 256, 1, 1, 1, 1, 1, 0, 0, 0)]),
+    lambda codec: codec.encode_region_summary("r", 0, [METRICS] * 65536),
+])
+def test_binary_lengths_are_validated(encode):
+    with pytest.raises(ValueError, match="binary encoding allows at most"):
+        encode(wire_codec.get_codec("binary"))
+
+def test_binary_lengths_at_the_limit():
+    codec = wire_codec.get_codec("binary")
+    node_id = "é" * 127 + "n"  # 255 bytes of utf-8
+    assert wire_codec.decode_metrics(codec.encode_metrics(node_id, 1, 1, 1, 1, 1))[0] == node_id
+    assert wire_codec.decode_task_batch(codec.encode_task_batch("n", [(1, "t" * 65535)]))[1][0][1] == "t" * 65535
+
+def test_interned_node_ids_are_bounded(monkeypatch):
+    monkeypatch.setattr(wire_codec, "MAX_INTERNED_NODE_IDS", 8)
+    monkeypatch.setattr(wire_codec, "_node_ids", {})
+    codec = wire_codec.get_codec("binary")
+    for i in range(100):
+        assert wire_codec.decode_metrics(codec.encode_metrics(f"churn_{i}", 1, 1, 1, 1, 1))[0] == f"churn_{i}"
+        assert len(wire_codec._node_ids) <= 8
+    first = wire_codec.decode_metrics(codec.encode_metrics("same", 1, 1, 1, 1, 1))[0]
+    assert wire_codec.decode_metrics(codec.encode_metrics("same", 1, 1, 1, 1, 1))[0] is first
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        wire_codec.get_codec("protobuf")
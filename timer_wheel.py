@@ -0,0 +1,92 @@
+"""Hashed timer wheel: O(1) schedule and cancel for very many timers.
+
+A heap of timers costs O(log n) per schedule and per cancel, which adds up
+when every one of 10k+ nodes re-arms a timer each second. The wheel hashes
+a timer into one of `slots` buckets by its expiry tick (`tick` seconds
+long); advance(now) visits only the buckets of the ticks that elapsed and
+fires the timers in them whose deadline has passed. Timers more than one
+revolution out stay in their bucket until their round comes up.
+Cancelling only flags the timer; it is dropped when its bucket is visited.
+
+Timers fire at tick granularity, in the order they were scheduled within a
+tick. The wheel is not thread-safe: schedule, cancel and advance belong to
+the thread that drives it (run() or the caller's own loop). `clock` can be
+replaced, e.g. by a simulated clock for replays.
+"""
+import time
+
+class Timer:
+    __slots__ = ("deadline", "tick", "callback", "args", "cancelled")
+
+    def __init__(self, deadline, tick, callback, args):
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+class TimerWheel:
+    def __init__(self, tick=0.01, slots=512, clock=time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self.clock = clock
+        self.buckets = [[] for _ in range(slots)]
+        self.current = int(clock() / tick)  # Last tick processed
+        self.pending = 0
+
+        # Counters
+        self.fired = 0
+        self.cancelled = 0
+
+    def __len__(self):
+        return self.pending
+
+    def schedule(self, delay, callback, *args):
+        """Call callback(*args) after delay seconds; returns a Timer for cancel()."""
+        return self.schedule_at(self.clock() + delay, callback, *args)
+
+    def schedule_at(self, deadline, callback, *args):
+        # Never into a tick that has already been processed
+        tick = max(int(deadline / self.tick), self.current + 1)
+        timer = Timer(deadline, tick, callback, args)
+        self.buckets[tick % self.slots].append(timer)
+        self.pending += 1
+        return timer
+
+    def cancel(self, timer):
+        if timer is not None and not timer.cancelled:
+            timer.cancelled = True
+            self.pending -= 1
+            self.cancelled += 1
+
+    def advance(self, now=None):
+        """Fire every timer due by now; returns how many fired."""
+        target = int((self.clock() if now is None else now) / self.tick)
+        fired = 0
+        # After a long stall, one pass over all buckets covers every elapsed tick
+        first = max(self.current + 1, target - self.slots + 1)
+        for tick in range(first, target + 1):
+            self.current = tick
+            index = tick % self.slots
+            bucket = self.buckets[index]
+            if not bucket:
+                continue
+            # Timers scheduled by the callbacks below go into the fresh bucket
+            self.buckets[index] = waiting = []
+            for timer in bucket:
+                if timer.cancelled:
+                    continue
+                if timer.tick > target:
+                    waiting.append(timer)  # A later round
+                    continue
+                self.pending -= 1
+                fired += 1
+                timer.callback(*timer.args)
+        self.current = max(self.current, target)
+        self.fired += fired
+        return fired
+
+    def run(self, stop_event):
+        """Drive the wheel from the calling thread until stop_event is set."""
+        while not stop_event.wait(self.tick):
+            self.advance()
@@ -0,0 +1,253 @@
+"""Wire codecs for the Zenoh metrics, task and region summary payloads.
+
+Two encodings are supported:
+
+  json   - the original {"cpu_load": ..., "node_id": ...} text payloads
+  binary - fixed layout matching NodeMetricsModule.idl.i, little-endian:
+
+      metrics: magic u8 | kind u8 ('M') | cpu_load f32 | memory_usage f32 |
+               battery_level f32 | load_avg f32 | timestamp f64 |
+               node_id length u8 | node_id utf-8 |
+               running_tasks u16 | queue_length u16 | task_capacity u16
+      batch:   magic u8 | kind u8 ('B') | node_id length u8 | task count u16 |
+               node_id utf-8 | count x (task_id u64 | task length u16 | task utf-8)
+      ack:     magic u8 | kind u8 ('A') | node_id length u8 | completed count u16 |
+               rejected count u16 | completed_at f64 | node_id utf-8 |
+               completed x task_id u64 | rejected x task_id u64
+      summary: magic u8 | kind u8 ('S') | region length u8 | entry count u16 |
+               node_count u32 | region utf-8 | count x (cpu_load f32 |
+               memory_usage f32 | battery_level f32 | load_avg f32 |
+               timestamp f64 | node_id length u8 | node_id utf-8 |
+               running_tasks u16 | queue_length u16 | task_capacity u16)
+
+The executor fields at the end of a metrics payload are optional on decode
+(older nodes do not send them) and default to 0; task_capacity 0 means
+the node does not report its capacity. A region summary (see
+sharded_aggregation.py) carries a regional aggregator's top candidates as
+post_sample() tuples, with the same field types as a metrics payload.
+Encoding raises ValueError when a node id or region (255 bytes), a task
+(65535 bytes) or a count (65535) does not fit its length prefix.
+
+The module-level decode_*() functions detect the encoding from the first byte, so
+a receiver understands both binary senders and older JSON-only nodes.
+Decoding reads the fixed fields in place with struct.unpack_from and interns
+node ids, so a fleet's ids are only materialized once; the intern table is
+cleared once it holds MAX_INTERNED_NODE_IDS ids, so churning ids cannot grow
+it without bound. Decoding is not zero-copy end to end: Zenoh's ZBytes has
+no buffer protocol, so receivers copy each payload once with to_bytes().
+"""
+import json
+import struct
+
+MAGIC = 0xD5
+KIND_METRICS = ord("M")
+KIND_TASK_BATCH = ord("B")
+KIND_TASK_ACK = ord("A")
+KIND_REGION_SUMMARY = ord("S")
+
+_METRICS = struct.Struct("<BB4fdB")
+_EXECUTOR = struct.Struct("<HHH")
+_BATCH = struct.Struct("<BBBH")
+_BATCH_ENTRY = struct.Struct("<QH")
+_ACK = struct.Struct("<BBBHHd")
+_SUMMARY = struct.Struct("<BBBHI")
+_SUMMARY_ENTRY = struct.Struct("<4fdB")
+
+MAX_INTERNED_NODE_IDS = 1 << 16
+
+# Interned node ids, keyed by their encoded bytes
+_node_ids = {}
+
+def _check_length(what, length, limit):
+    if length > limit:
+        raise ValueError(f"{what} has length {length}; the binary encoding allows at most {limit}")
+
+def _encode_node_id(node_id):
+    raw_id = node_id.encode()
+    _check_length("node_id", len(raw_id), 0xFF)
+    return raw_id
+
+def _intern_node_id(raw):
+    node_id = _node_ids.get(raw)
+    if node_id is None:
+        if len(_node_ids) >= MAX_INTERNED_NODE_IDS:
+            # Mostly ids of nodes that left; live ones are interned again on their next message
+            _node_ids.clear()
+        node_id = _node_ids.setdefault(bytes(raw), str(raw, "utf-8"))
+    return node_id
+
+class JsonCodec:
+    name = "json"
+
+    def encode_metrics(self, node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+                       running_tasks=0, queue_length=0, task_capacity=0):
+        return json.dumps({
+            "cpu_load": cpu_load,
+            "memory_usage": memory_usage,
+            "battery_level": battery_level,
+            "load_avg": load_avg,
+            "node_id": node_id,
+            "timestamp": timestamp,
+            "running_tasks": running_tasks,
+            "queue_length": queue_length,
+            "task_capacity": task_capacity
+        }).encode()
+
+    def decode_metrics(self, buffer):
+        data = json.loads(bytes(buffer))
+        return (data["node_id"], data["cpu_load"], data["memory_usage"],
+                data["battery_level"], data["load_avg"], data["timestamp"],
+                data.get("running_tasks", 0), data.get("queue_length", 0), data.get("task_capacity", 0))
+
+    def encode_task_batch(self, node_id, tasks):
+        return json.dumps({"node_id": node_id,
+                           "tasks": [{"task_id": task_id, "task": task} for task_id, task in tasks]}).encode()
+
+    def decode_task_batch(self, buffer):
+        data = json.loads(bytes(buffer))
+        return data["node_id"], [(entry["task_id"], entry["task"]) for entry in data["tasks"]]
+
+    def encode_task_ack(self, node_id, task_ids, completed_at, rejected_ids=()):
+        return json.dumps({"node_id": node_id, "task_ids": list(task_ids), "completed_at": completed_at,
+                           "rejected_ids": list(rejected_ids)}).encode()
+
+    def decode_task_ack(self, buffer):
+        data = json.loads(bytes(buffer))
+        return data["node_id"], data["task_ids"], data["completed_at"], data.get("rejected_ids", [])
+
+    def encode_region_summary(self, region, node_count, entries):
+        return json.dumps({"region": region, "node_count": node_count, "entries": entries}).encode()
+
+    def decode_region_summary(self, buffer):
+        data = json.loads(bytes(buffer))
+        return data["region"], data["node_count"], [tuple(entry) for entry in data["entries"]]
+
+class BinaryCodec:
+    name = "binary"
+
+    def encode_metrics(self, node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+                       running_tasks=0, queue_length=0, task_capacity=0):
+        raw_id = _encode_node_id(node_id)
+        return (_METRICS.pack(MAGIC, KIND_METRICS, cpu_load, memory_usage, battery_level,
+                              load_avg, timestamp, len(raw_id)) + raw_id
+                + _EXECUTOR.pack(running_tasks, queue_length, task_capacity))
+
+    def decode_metrics(self, buffer):
+        magic, kind, cpu_load, memory_usage, battery_level, load_avg, timestamp, id_length = \
+            _METRICS.unpack_from(buffer)
+        if magic != MAGIC or kind != KIND_METRICS:
+            raise ValueError("Not a binary metrics payload")
+        start = _METRICS.size
+        node_id = _intern_node_id(buffer[start:start + id_length])
+        executor_start = start + id_length
+        if len(buffer) >= executor_start + _EXECUTOR.size:
+            running_tasks, queue_length, task_capacity = _EXECUTOR.unpack_from(buffer, executor_start)
+        else:
+            running_tasks = queue_length = task_capacity = 0
+        return (node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+                running_tasks, queue_length, task_capacity)
+
+    def encode_task_batch(self, node_id, tasks):
+        raw_id = _encode_node_id(node_id)
+        _check_length("Task batch", len(tasks), 0xFFFF)
+        parts = [_BATCH.pack(MAGIC, KIND_TASK_BATCH, len(raw_id), len(tasks)), raw_id]
+        for task_id, task in tasks:
+            raw_task = task.encode()
+            _check_length(f"Task {task_id}", len(raw_task), 0xFFFF)
+            parts.append(_BATCH_ENTRY.pack(task_id, len(raw_task)))
+            parts.append(raw_task)
+        return b"".join(parts)
+
+    def decode_task_batch(self, buffer):
+        magic, kind, id_length, count = _BATCH.unpack_from(buffer)
+        if magic != MAGIC or kind != KIND_TASK_BATCH:
+            raise ValueError("Not a binary task batch payload")
+        offset = _BATCH.size
+        node_id = _intern_node_id(buffer[offset:offset + id_length])
+        offset += id_length
+        tasks = []
+        for _ in range(count):
+            task_id, task_length = _BATCH_ENTRY.unpack_from(buffer, offset)
+            offset += _BATCH_ENTRY.size
+            tasks.append((task_id, str(buffer[offset:offset + task_length], "utf-8")))
+            offset += task_length
+        return node_id, tasks
+
+    def encode_task_ack(self, node_id, task_ids, completed_at, rejected_ids=()):
+        raw_id = _encode_node_id(node_id)
+        _check_length("Completed task ids", len(task_ids), 0xFFFF)
+        _check_length("Rejected task ids", len(rejected_ids), 0xFFFF)
+        ids = list(task_ids) + list(rejected_ids)
+        return (_ACK.pack(MAGIC, KIND_TASK_ACK, len(raw_id), len(task_ids), len(rejected_ids), completed_at)
+                + raw_id + struct.pack(f"<{len(ids)}Q", *ids))
+
+    def decode_task_ack(self, buffer):
+        magic, kind, id_length, completed, rejected, completed_at = _ACK.unpack_from(buffer)
+        if magic != MAGIC or kind != KIND_TASK_ACK:
+            raise ValueError("Not a binary task ack payload")
+        offset = _ACK.size
+        node_id = _intern_node_id(buffer[offset:offset + id_length])
+        ids = list(struct.unpack_from(f"<{completed + rejected}Q", buffer, offset + id_length))
+        return node_id, ids[:completed], completed_at, ids[completed:]
+
+    def encode_region_summary(self, region, node_count, entries):
+        raw_region = region.encode()
+        _check_length("region", len(raw_region), 0xFF)
+        _check_length("Region summary", len(entries), 0xFFFF)
+        parts = [_SUMMARY.pack(MAGIC, KIND_REGION_SUMMARY, len(raw_region), len(entries), node_count), raw_region]
+        for (node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+             running_tasks, queue_length, task_capacity) in entries:
+            raw_id = _encode_node_id(node_id)
+            parts.append(_SUMMARY_ENTRY.pack(cpu_load, memory_usage, battery_level, load_avg, timestamp, len(raw_id)))
+            parts.append(raw_id)
+            parts.append(_EXECUTOR.pack(running_tasks, queue_length, task_capacity))
+        return b"".join(parts)
+
+    def decode_region_summary(self, buffer):
+        magic, kind, region_length, count, node_count = _SUMMARY.unpack_from(buffer)
+        if magic != MAGIC or kind != KIND_REGION_SUMMARY:
+            raise ValueError("Not a binary region summary payload")
+        offset = _SUMMARY.size
+        region = str(buffer[offset:offset + region_length], "utf-8")
+        offset += region_length
+        entries = []
+        for _ in range(count):
+            cpu_load, memory_usage, battery_level, load_avg, timestamp, id_length = \
+                _SUMMARY_ENTRY.unpack_from(buffer, offset)
+            offset += _SUMMARY_ENTRY.size
+            node_id = _intern_node_id(buffer[offset:offset + id_length])
+            offset += id_length
+            entries.append((node_id, cpu_load, memory_usage, battery_level, load_avg, timestamp,
+                            *_EXECUTOR.unpack_from(buffer, offset)))
+            offset += _EXECUTOR.size
+        return region, node_count, entries
+
+CODECS = {"json": JsonCodec(), "binary": BinaryCodec()}
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec {name!r}, expected one of {sorted(CODECS)}") from None
+
+def detect_codec(buffer):
+    """Pick the codec a payload was encoded with from its first byte."""
+    return CODECS["binary"] if buffer[0] == MAGIC else CODECS["json"]
+
+def decode_metrics(buffer):
+    """Decode a metrics payload of either encoding into (node_id, cpu_load,
+    memory_usage, battery_level, load_avg, timestamp, running_tasks,
+    queue_length, task_capacity)."""
+    return detect_codec(buffer).decode_metrics(buffer)
+
+def decode_task_batch(buffer):
+    """Decode a task batch of either encoding into (node_id, [(task_id, task), ...])."""
+    return detect_codec(buffer).decode_task_batch(buffer)
+
+def decode_task_ack(buffer):
+    """Decode a task ack of either encoding into (node_id, task_ids, completed_at, rejected_ids)."""
+    return detect_codec(buffer).decode_task_ack(buffer)
+
+def decode_region_summary(buffer):
+    """Decode a region summary of either encoding into (region, node_count, [post_sample() tuple, ...])."""
+    return detect_codec(buffer).decode_region_summary(buffer)